@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Fetch every actress from the DMM ActressSearch API into an actress TSV with
+the columns of data/actress.tsv, which load_actress_data in
+video-actress-relation.py reads directly.
+
+The API is partitioned by the gojuon initial of the ruby (initial=あ, い,
+..., including the voiced kana), and the partitions are fetched
+concurrently through one session under a shared requests-per-second
+budget, so a full refresh takes about as long as the largest partition.
+Results are merged in gojuon order and deduplicated by dmm_id.
+
+The partitions only cover actresses whose ruby starts with a kana. The
+unpartitioned total is checked against the sum of the partitions, and
+--fill-gaps fetches the unpartitioned listing as well to pick up the rest.
+
+Every finished partition is written to <output>.parts/ so --resume only
+fetches the partitions that are missing.
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from dmm_fetch import DEFAULT_CONCURRENCY, DEFAULT_RATE, DmmFetcher, FetchError, credentials_from_env
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from http_cache import add_cache_arguments, cache_from_args
+
+ACTRESS_COLUMNS = ['id', 'name', 'dmm_id', 'display_name', 'ruby', 'bust', 'cup', 'waist', 'hip', 'height',
+                   'birthday', 'blood_type', 'hobby', 'prefectures']
+
+GOJUON_INITIALS = ('あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん'
+                   'がぎぐげござじずぜぞだぢづでどばびぶべぼぱぴぷぺぽゔ')
+
+# Partition name of the unpartitioned listing fetched by --fill-gaps
+ALL_PARTITION = 'all'
+
+DEFAULT_ACTRESS_HITS = 100
+DEFAULT_MAX_OFFSET = 50000
+DEFAULT_JOBS = 8
+
+def actress_to_row(actress: Dict[str, Any]) -> list:
+    """Map an ActressSearch record to ACTRESS_COLUMNS, without the id."""
+    def field(key: str) -> str:
+        value = actress.get(key)
+        return '' if value is None else str(value).strip()
+
+    return [
+        field('name'),
+        field('id'),
+        '',  # ActressSearch has no romanized name
+        field('ruby'),
+        field('bust'),
+        field('cup'),
+        field('waist'),
+        field('hip'),
+        field('height'),
+        field('birthday'),
+        field('blood_type'),
+        field('hobby'),
+        field('prefectures'),
+    ]
+
+class PartitionFetcher:
+    """Fetch ActressSearch partitions into part files."""
+
+    def __init__(self, fetcher: DmmFetcher, parts_dir: str, hits: int, max_offset: int):
+        """
+        Args:
+            fetcher: Shared fetcher; its rate limit covers every partition
+            parts_dir: Directory for the per-partition part files
+            hits: Page size
+            max_offset: Highest offset the API serves
+        """
+        self.fetcher = fetcher
+        self.parts_dir = parts_dir
+        self.hits = hits
+        # Items reachable with pages starting at 1, 1 + hits, ... up to max_offset
+        self.capacity = (max_offset - 1) // hits * hits + hits
+
+    def part_path(self, partition: str) -> str:
+        return os.path.join(self.parts_dir, f"{partition}.tsv")
+
+    def total_count(self, initial: Optional[str] = None) -> int:
+        """Return the number of actresses of a partition, or of all actresses."""
+        params = {'hits': 1, 'offset': 1, **({'initial': initial} if initial else {})}
+        return int(self.fetcher.request('ActressSearch', params).get('total_count') or 0)
+
+    def fetch(self, partition: str) -> int:
+        """
+        Fetch one partition into its part file, unless it is already there.
+
+        Returns:
+            Number of actresses in the part file
+        """
+        path = self.part_path(partition)
+        if os.path.exists(path):
+            METRICS.count('partitions', state='resumed')
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                return sum(1 for _ in csv.reader(file, delimiter='\t'))
+
+        params = {} if partition == ALL_PARTITION else {'initial': partition}
+        first = self.fetcher.request('ActressSearch', {**params, 'hits': self.hits, 'offset': 1})
+        total = int(first.get('total_count') or 0)
+        if total > self.capacity:
+            print(f"Warning: partition {partition} has {total} actresses, only the first {self.capacity} can be fetched")
+            first = {**first, 'total_count': self.capacity}
+
+        rows = 0
+        with open(f"{path}.tmp", 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter='\t', lineterminator='\n')
+            for _, actresses in self.fetcher.fetch_pages('ActressSearch', 'actress', params, hits=self.hits,
+                                                         first_result=first):
+                writer.writerows(actress_to_row(actress) for actress in actresses)
+                rows += len(actresses)
+        os.replace(f"{path}.tmp", path)
+
+        METRICS.count('partitions', state='fetched')
+        METRICS.count('actresses_fetched', rows)
+        print(f"Partition {partition}: fetched {rows} actresses")
+        return rows
+
+def merge_parts(part_paths: List[str], output_path: str) -> Dict[str, int]:
+    """
+    Concatenate part files into the numbered actress TSV, dropping repeated dmm_ids.
+
+    Returns:
+        Dictionary with the rows written and duplicates dropped
+    """
+    seen = set()
+    rows = duplicates = 0
+    dmm_id_index = ACTRESS_COLUMNS.index('dmm_id') - 1
+    with open(output_path, 'w', encoding='utf-8', newline='') as output_file:
+        writer = csv.writer(output_file, delimiter='\t', lineterminator='\n')
+        writer.writerow(ACTRESS_COLUMNS)
+        for part_path in part_paths:
+            with open(part_path, 'r', encoding='utf-8', newline='') as part_file:
+                for row in csv.reader(part_file, delimiter='\t'):
+                    if row[dmm_id_index] in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(row[dmm_id_index])
+                    rows += 1
+                    writer.writerow([rows] + row)
+    return {'rows': rows, 'duplicates': duplicates}
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch all actresses from the DMM ActressSearch API, partitioned by initial.')
+    parser.add_argument('output_path', help='Output actress TSV path')
+    parser.add_argument('--initials', default=GOJUON_INITIALS,
+                        help='Initials to partition by (default: the gojuon, including the voiced kana)')
+    parser.add_argument('--fill-gaps', action='store_true',
+                        help='Also fetch the unpartitioned listing for actresses no initial covers')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help=f'Partitions fetched at once (default: {DEFAULT_JOBS})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Pages in flight at once per partition (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Maximum requests per second across all partitions (default: {DEFAULT_RATE})')
+    parser.add_argument('--hits', type=int, default=DEFAULT_ACTRESS_HITS, help=f'Page size (default: {DEFAULT_ACTRESS_HITS})')
+    parser.add_argument('--max-offset', type=int, default=DEFAULT_MAX_OFFSET,
+                        help=f'Highest offset the API serves (default: {DEFAULT_MAX_OFFSET})')
+    parser.add_argument('--base-url', default=None, help='API base URL (default: DMM_API_BASE_URL or the public API)')
+    parser.add_argument('--resume', action='store_true', help='Keep the partitions fetched by an interrupted run')
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    try:
+        cache = cache_from_args(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    app_id, affiliate_id = credentials_from_env(required=not args.offline)
+
+    partitions = list(dict.fromkeys(args.initials))
+    if args.fill_gaps:
+        partitions.append(ALL_PARTITION)
+
+    parts_dir = f"{args.output_path}.parts"
+    if not args.resume and os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    print(f"Fetching {len(partitions)} partitions, {args.jobs} at a time...")
+    start = time.perf_counter()
+    with DmmFetcher(app_id, affiliate_id, base_url=args.base_url, concurrency=args.concurrency, rate=args.rate,
+                    pool_size=args.jobs * args.concurrency, cache=cache) as fetcher:
+        partition_fetcher = PartitionFetcher(fetcher, parts_dir, args.hits, args.max_offset)
+        try:
+            with METRICS.timer('fetch'), ThreadPoolExecutor(max_workers=args.jobs) as executor:
+                counts = dict(zip(partitions, executor.map(partition_fetcher.fetch, partitions)))
+            total = partition_fetcher.total_count()
+        except FetchError as e:
+            print(e)
+            print("Rerun with --resume to keep the partitions fetched so far.")
+            sys.exit(1)
+
+    with METRICS.timer('merge'):
+        result = merge_parts([partition_fetcher.part_path(partition) for partition in partitions], args.output_path)
+    shutil.rmtree(parts_dir)
+
+    METRICS.count('records_written', result['rows'])
+    METRICS.count('duplicates_dropped', result['duplicates'])
+    METRICS.add_file('written', args.output_path)
+
+    largest = max(counts, key=counts.get) if counts else None
+    print(f"\n{'='*60}")
+    print(f"FETCH RESULTS")
+    print(f"{'='*60}")
+    print(f"Partitions fetched: {len(partitions)} (largest: {largest} with {counts.get(largest, 0)} actresses)")
+    print(f"Actresses written: {result['rows']} ({result['duplicates']} duplicates dropped)")
+    if result['rows'] < total and not args.fill_gaps:
+        print(f"Warning: the API lists {total} actresses, {total - result['rows']} are not under any initial; "
+              f"rerun with --fill-gaps to include them")
+    elif result['rows'] < total:
+        print(f"Warning: the API lists {total} actresses, {total - result['rows']} are past the offset cap")
+    print(f"Output: {args.output_path} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Assign sequential IDs, project columns and convert delimiters in one
+streaming pass with constant memory.
+
+Replaces the per-table *-addid.py and series-nameonly.py scripts, e.g.:
+
+    python assign-ids.py --from '|' --to , .tmp/genre-raw.csv .tmp/genre.csv
+    python assign-ids.py --from '|' --no-ids --columns id,series_id,name .tmp/series.csv .tmp/series-nameonly.csv
+
+With --continue-from, new rows continue the ID sequence after the highest
+ID of an existing table, so appending to a table (--append) does not need
+a full rewrite.
+"""
+
+import argparse
+import sys
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from table_stream import assign_ids, exit_on_broken_pipe, max_id
+
+def parse_columns(value):
+    return [column.strip() for column in value.split(',') if column.strip()] if value else []
+
+def main():
+    parser = argparse.ArgumentParser(description='Assign sequential IDs, project columns and convert delimiters in one pass.')
+    parser.add_argument('input_file', help='Input table ("-" for stdin; .parquet/.arrow are read as tables)')
+    parser.add_argument('output_file', help='Output table ("-" for stdout; .parquet/.arrow are written as tables)')
+    parser.add_argument('--from', dest='from_delim', default=',', help='Input delimiter (default: ,)')
+    parser.add_argument('--to', dest='to_delim', default=None, help='Output delimiter (default: the input delimiter)')
+    parser.add_argument('--id-column', default='id', help='Column receiving the IDs (default: id)')
+    parser.add_argument('--no-ids', action='store_true', help='Keep the rows as they are and only project/convert')
+    parser.add_argument('--start-id', type=int, default=1, help='First ID to assign (default: 1)')
+    parser.add_argument('--continue-from', default=None, metavar='TABLE',
+                        help='Start after the highest ID in this existing table')
+    parser.add_argument('--continue-delimiter', default=None,
+                        help='Delimiter of the --continue-from table (default: the output delimiter)')
+    parser.add_argument('--columns', default=None, help='Comma-separated columns to keep, in output order')
+    parser.add_argument('--drop', default=None, help='Comma-separated columns to leave out')
+    parser.add_argument('--append', action='store_true', help='Append rows to the output table instead of replacing it')
+    parser.add_argument('--schema', default=None, help='Dataset schema for the column types of .parquet/.arrow output')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    from_delim = args.from_delim.encode().decode('unicode_escape')  # handle '\t'
+    to_delim = args.to_delim.encode().decode('unicode_escape') if args.to_delim else from_delim
+
+    start_id = args.start_id
+    if args.continue_from:
+        continue_delim = args.continue_delimiter.encode().decode('unicode_escape') if args.continue_delimiter else to_delim
+        try:
+            start_id = max_id(args.continue_from, args.id_column, continue_delim) + 1
+        except FileNotFoundError:
+            print(f"Error: Table '{args.continue_from}' not found.", file=sys.stderr)
+            sys.exit(1)
+        except (KeyError, ValueError) as e:
+            print(f"Error reading IDs from '{args.continue_from}': {e}", file=sys.stderr)
+            sys.exit(1)
+
+    METRICS.add_file('read', args.input_file)
+    try:
+        with METRICS.timer('assign'):
+            row_count = assign_ids(
+                args.input_file, args.output_file, from_delim, to_delim,
+                id_column=None if args.no_ids else args.id_column, start_id=start_id,
+                columns=parse_columns(args.columns), drop=parse_columns(args.drop),
+                append=args.append, schema=args.schema,
+            )
+    except BrokenPipeError:
+        exit_on_broken_pipe()
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.", file=sys.stderr)
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    METRICS.count('rows_written', row_count)
+    METRICS.add_file('written', args.output_file)
+
+    if args.output_file != '-':
+        ids = '' if args.no_ids or not row_count else f" (IDs {start_id}-{start_id + row_count - 1})"
+        print(f"Wrote {row_count} rows to {args.output_file}{ids}")
+
+if __name__ == '__main__':
+    main()
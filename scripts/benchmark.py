@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ETL scripts on inputs at several multiples of the data/*.tsv
+size and compare the results against a saved baseline.
+
+The inputs are generated from data/: the scraped video TSV that
+video-actress-relation.py reads is rebuilt by joining video.tsv with the
+relation files and the actress, genre and maker names, and every table is
+replicated with offset IDs and codes to reach each scale factor.
+
+Each stage runs as a subprocess. Its wall time, rows/sec and peak RSS (the
+VmHWM of the child) are recorded, and the scaling exponent of the wall time
+is fitted over the scale factors: about 1.0 means linear scaling, and anything well
+above it points at a stage that stops scaling as the catalogue grows.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SCALES = '1,10,100'
+DEFAULT_TOLERANCE = 0.25
+
+# Times below this are mostly interpreter startup and are not compared
+MIN_COMPARED_SECONDS = 0.5
+
+def read_tsv(path: str) -> Tuple[List[str], List[List[str]]]:
+    """Read a TSV file as (header, rows)."""
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file, delimiter='\t')
+        header = next(reader)
+        return header, list(reader)
+
+def write_scaled(path: str, header: List[str], rows: List[List[str]], scale: int, offsets: Dict[int, int],
+                 suffixes: Tuple[int, ...] = (), delimiter: str = '\t'):
+    """
+    Write `scale` copies of a table.
+
+    Copy n adds n * offsets[column] to the integer columns in `offsets` and
+    appends "-n" to the text columns in `suffixes`, so keys stay unique.
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+        writer.writerow(header)
+        for copy in range(scale):
+            for row in rows:
+                row = list(row) + [''] * (len(header) - len(row))
+                if copy:
+                    for column, offset in offsets.items():
+                        if row[column]:
+                            row[column] = str(int(row[column]) + copy * offset)
+                    for column in suffixes:
+                        if row[column]:
+                            row[column] = f"{row[column]}-{copy}"
+                writer.writerow(row)
+
+def build_raw_videos(data_dir: str) -> Tuple[List[str], List[List[str]]]:
+    """Rebuild the scraped video rows, with names instead of IDs, from data/."""
+    _, actresses = read_tsv(os.path.join(data_dir, 'actress.tsv'))
+    _, genres = read_tsv(os.path.join(data_dir, 'genre.tsv'))
+    _, makers = read_tsv(os.path.join(data_dir, 'maker.tsv'))
+    actress_names = {row[0]: row[1] for row in actresses}
+    genre_names = {row[0]: row[1] for row in genres}
+    maker_names = {row[0]: row[1] for row in makers}
+
+    video_actresses = defaultdict(list)
+    for video_id, actress_id in read_tsv(os.path.join(data_dir, 'video-actresses.tsv'))[1]:
+        video_actresses[video_id].append(actress_names.get(actress_id, ''))
+    video_genres = defaultdict(list)
+    for video_id, genre_id in read_tsv(os.path.join(data_dir, 'video-genres.tsv'))[1]:
+        video_genres[video_id].append(genre_names.get(genre_id, ''))
+
+    header, videos = read_tsv(os.path.join(data_dir, 'video.tsv'))
+    column = {name: index for index, name in enumerate(header)}
+    raw_header = ['id', 'display_id', 'title', 'dmm_id', 'actress', 'genre', 'makers', 'series',
+                  'release_date', 'length', 'label', 'description']
+    raw_rows = []
+    for row in videos:
+        row = row + [''] * (len(header) - len(row))
+        video_id = row[column['id']]
+        raw_rows.append([
+            video_id, row[column['code']], row[column['title']], row[column['dmm_id']],
+            ','.join(video_actresses[video_id]), ','.join(video_genres[video_id]),
+            maker_names.get(row[column['maker_id']], ''), '',
+            row[column['release_date']], row[column['length']], row[column['label']], row[column['description']],
+        ])
+    return raw_header, raw_rows
+
+def generate_inputs(data_dir: str, work_dir: str, scale: int) -> Dict[str, Tuple[str, int]]:
+    """
+    Generate the benchmark inputs for one scale factor.
+
+    Files are reused if they already exist for that scale.
+
+    Returns:
+        Dictionary mapping input names to (path, data rows)
+    """
+    scale_dir = os.path.join(work_dir, f'x{scale}')
+    manifest_path = os.path.join(scale_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return {name: tuple(value) for name, value in json.load(file).items()}
+
+    os.makedirs(scale_dir, exist_ok=True)
+    print(f"Generating {scale}x inputs in {scale_dir}...")
+    inputs = {}
+
+    def path(name: str) -> str:
+        return os.path.join(scale_dir, name)
+
+    # Name tables are read whole by the relation script and are not scaled
+    for name, delimiter in (('actress', ','), ('genre', ','), ('maker', ',')):
+        header, rows = read_tsv(os.path.join(data_dir, f'{name}.tsv'))
+        write_scaled(path(f'{name}.csv'), header, rows, 1, {}, delimiter=delimiter)
+        inputs[name] = (path(f'{name}.csv'), len(rows))
+    write_scaled(path('series.csv'), ['id', 'series_id', 'name', 'ruby'], [], 1, {}, delimiter='|')
+    inputs['series'] = (path('series.csv'), 0)
+
+    raw_header, raw_rows = build_raw_videos(data_dir)
+    video_count = len(raw_rows)
+    write_scaled(path('video-raw.tsv'), raw_header, raw_rows, scale, {0: video_count}, suffixes=(1, 3))
+    inputs['video-raw'] = (path('video-raw.tsv'), video_count * scale)
+
+    header, rows = read_tsv(os.path.join(data_dir, 'video.tsv'))
+    write_scaled(path('video.tsv'), header, rows, scale, {0: video_count}, suffixes=(1, 3))
+    inputs['video'] = (path('video.tsv'), len(rows) * scale)
+
+    header, rows = read_tsv(os.path.join(data_dir, 'video-actresses.tsv'))
+    write_scaled(path('video-actresses.tsv'), header, rows, scale, {0: video_count})
+    inputs['video-actresses'] = (path('video-actresses.tsv'), len(rows) * scale)
+
+    header, rows = read_tsv(os.path.join(data_dir, 'maker.tsv'))
+    column = {name: index for index, name in enumerate(header)}
+    with open(path('maker.ndjson'), 'w', encoding='utf-8') as file:
+        for copy in range(scale):
+            for row in rows:
+                row = row + [''] * (len(header) - len(row))
+                maker_id = int(row[column['dmm_id']] or 0) + copy * 1000000
+                file.write(json.dumps({
+                    'maker_id': str(maker_id), 'name': row[column['name']],
+                    'ruby': row[column['ruby']], 'list_url': '',
+                }, ensure_ascii=False) + '\n')
+    inputs['maker-ndjson'] = (path('maker.ndjson'), len(rows) * scale)
+
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(inputs, file, indent=2)
+    return inputs
+
+def stage_commands(inputs: Dict[str, Tuple[str, int]], output_dir: str) -> Dict[str, Tuple[List[str], int, Optional[str]]]:
+    """
+    Build the command of every benchmarked stage.
+
+    Returns:
+        Dictionary mapping stage names to (arguments, input rows, working directory)
+    """
+    def script(name: str) -> str:
+        return os.path.join(SCRIPTS_DIR, name)
+
+    def out(name: str) -> str:
+        return os.path.join(output_dir, name)
+
+    video_raw, video_raw_rows = inputs['video-raw']
+    video, video_rows = inputs['video']
+    relations, relation_rows = inputs['video-actresses']
+    maker_ndjson, maker_rows = inputs['maker-ndjson']
+    relation_args = [script('video-actress-relation.py'), os.path.abspath(video_raw)] + [
+        os.path.abspath(inputs[name][0]) for name in ('actress', 'genre', 'maker', 'series')
+    ] + ['--create-video-dataset']
+
+    # The relation script writes to .tmp/ relative to its working directory
+    return {
+        'video-actress-relation': (relation_args, video_raw_rows, output_dir),
+        'deduplicate': ([script('deduplicate.py'), '--columns', 'video_id,actress_id', '--delimiter', '\\t', relations],
+                        relation_rows, None),
+        'deduplicate-streaming': ([script('deduplicate.py'), '--columns', 'video_id,actress_id', '--delimiter', '\\t',
+                                   '--chunksize', '100000', relations], relation_rows, None),
+        'dsv-converter': ([script('dsv-converter.py'), '--from', '\\t', '--to', '|', video, out('video.psv')],
+                          video_rows, None),
+        'maker-json2csv': ([script('maker-json2csv.py'), maker_ndjson, out('maker.csv')], maker_rows, None),
+        'video-addid': ([script('video-addid.py'), video, out('video-id.tsv')], video_rows, None),
+    }
+
+# Seconds between reads of a running stage's peak RSS
+RSS_POLL_INTERVAL = 0.005
+
+def read_peak_rss_kb(pid: int) -> Optional[int]:
+    """Return the VmHWM of a running process in kB, or None where /proc has none."""
+    try:
+        with open(f'/proc/{pid}/status', 'r', encoding='ascii') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+class PeakRssMonitor(threading.Thread):
+    """
+    Follow the VmHWM of a child process until it exits.
+
+    The ru_maxrss that wait4 reports is no use here: exec carries the
+    high-water mark of the spawning process over to the child, so every
+    small stage would report the size of the benchmark process. VmHWM
+    belongs to the child's own address space. It only grows, so the last
+    read before exit is the peak, short of growth in the final poll interval.
+    """
+
+    def __init__(self, pid: int):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak_kb: Optional[int] = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            peak_kb = read_peak_rss_kb(self.pid)
+            if peak_kb is not None:
+                self.peak_kb = max(self.peak_kb or 0, peak_kb)
+            self.stopped.wait(RSS_POLL_INTERVAL)
+
+def run_stage(args: List[str], cwd: Optional[str]) -> Tuple[float, float]:
+    """
+    Run a stage script and measure it.
+
+    Returns:
+        Tuple of (wall seconds, peak RSS in MB)
+    """
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + args, cwd=cwd, stdout=subprocess.DEVNULL, stderr=stderr)
+        monitor = PeakRssMonitor(process.pid)
+        monitor.start()
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        monitor.stopped.set()
+        monitor.join()
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', errors='replace')[-2000:]
+            raise RuntimeError(f"{os.path.basename(args[0])} exited with {process.returncode}:\n{message}")
+
+    if monitor.peak_kb is not None:
+        return seconds, monitor.peak_kb / 1024
+
+    # Without /proc (macOS), fall back to ru_maxrss, which includes the
+    # benchmark's own high-water mark; ru_maxrss is in bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return seconds, usage.ru_maxrss / divisor
+
+def scaling_exponent(points: List[Tuple[int, float]]) -> Optional[float]:
+    """Fit the exponent k of seconds ~ rows^k with least squares on a log-log scale."""
+    points = [(rows, seconds) for rows, seconds in points if rows > 0 and seconds > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(rows) for rows, _ in points]
+    ys = [math.log(seconds) for _, seconds in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+def compare_to_baseline(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare results against a baseline.
+
+    Returns:
+        Descriptions of the wall times and peak RSS values that exceed the
+        baseline by more than the tolerance
+    """
+    baseline_results = {(result['stage'], result['scale']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result['stage'], result['scale']))
+        if not previous:
+            continue
+        label = f"{result['stage']} at {result['scale']}x"
+        if previous['seconds'] >= MIN_COMPARED_SECONDS and result['seconds'] > previous['seconds'] * (1 + tolerance):
+            regressions.append(f"{label}: {result['seconds']:.2f}s vs {previous['seconds']:.2f}s baseline")
+        if result['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{label}: {result['peak_rss_mb']:.1f} MB vs {previous['peak_rss_mb']:.1f} MB baseline peak RSS")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ETL scripts at several multiples of the data/ size.')
+    parser.add_argument('--data-dir', default='data', help='Directory with the TSV datasets (default: data)')
+    parser.add_argument('--work-dir', default='.tmp/benchmark', help='Directory for generated inputs and outputs (default: .tmp/benchmark)')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help=f'Comma-separated scale factors (default: {DEFAULT_SCALES})')
+    parser.add_argument('--stages', default=None, help='Comma-separated stages to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per stage and scale; the fastest is kept (default: 1)')
+    parser.add_argument('--output', default='.tmp/benchmark/results.json', help='Results JSON path (default: .tmp/benchmark/results.json)')
+    parser.add_argument('--baseline', default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--save-baseline', default=None, help='Also write the results to this baseline path')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed slowdown or memory growth over the baseline (default: {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    scales = sorted({int(scale) for scale in args.scales.split(',')})
+    output_dir = os.path.join(args.work_dir, 'outputs')
+    os.makedirs(os.path.join(output_dir, '.tmp'), exist_ok=True)
+
+    results = []
+    for scale in scales:
+        inputs = generate_inputs(args.data_dir, args.work_dir, scale)
+        commands = stage_commands(inputs, output_dir)
+        stages = args.stages.split(',') if args.stages else list(commands)
+        unknown = [stage for stage in stages if stage not in commands]
+        if unknown:
+            print(f"Error: Unknown stages {unknown}. Available stages: {list(commands)}")
+            sys.exit(1)
+
+        for stage in stages:
+            stage_args, rows, cwd = commands[stage]
+            try:
+                runs = [run_stage(stage_args, cwd) for _ in range(max(1, args.repeat))]
+            except RuntimeError as e:
+                print(f"Error: {stage} failed at {scale}x: {e}")
+                sys.exit(1)
+            seconds = min(run[0] for run in runs)
+            peak_rss_mb = max(run[1] for run in runs)
+            result = {
+                'stage': stage,
+                'scale': scale,
+                'rows': rows,
+                'seconds': round(seconds, 4),
+                'rows_per_sec': round(rows / seconds, 1),
+                'peak_rss_mb': round(peak_rss_mb, 1),
+            }
+            results.append(result)
+            print(f"{stage:<24} {scale:>4}x {rows:>10} rows {seconds:>8.2f}s "
+                  f"{result['rows_per_sec']:>12,.0f} rows/sec {peak_rss_mb:>8.1f} MB")
+
+    exponents = {}
+    for stage in dict.fromkeys(result['stage'] for result in results):
+        exponent = scaling_exponent([(result['rows'], result['seconds']) for result in results if result['stage'] == stage])
+        exponents[stage] = None if exponent is None else round(exponent, 3)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scales': scales,
+        'results': results,
+        'scaling_exponents': exponents,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"SCALING")
+    print(f"{'='*60}")
+    for stage, exponent in exponents.items():
+        print(f"{stage:<24} {'n/a' if exponent is None else f'time ~ rows^{exponent:.2f}'}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Check the data/*.tsv datasets against the database constraints before a load.
+
+Verifies the primary keys (including video-actresses and video-genres pair
+uniqueness), the unique columns and every foreign key of the TypeORM
+migrations, e.g. that each actress_id in video-actresses.tsv exists in
+actress.tsv and each maker_id/series_id in video.tsv resolves. See
+integrity.py for the checks. Without the optional series.tsv, which
+load-postgres.py does not load either, the foreign keys to series are
+reported as skipped.
+
+Every violating row is written to a TSV report with its file line number.
+The exit status is 1 when there are violations, so the check can gate
+load-postgres.py (which runs it itself with --check).
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from integrity import check_datasets
+
+def main():
+    parser = argparse.ArgumentParser(description='Check datasets for broken foreign keys and duplicate keys before loading.')
+    parser.add_argument('--data-dir', default='data', help='Directory with the TSV datasets (default: data)')
+    parser.add_argument('--output', default='.tmp/integrity-violations.tsv',
+                        help='Violations report (default: .tmp/integrity-violations.tsv)')
+    parser.add_argument('--samples', type=int, default=5, help='Violating values to print per check (default: 5)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    start = time.perf_counter()
+    try:
+        with METRICS.timer('check'):
+            results, notes = check_datasets(args.data_dir)
+    except FileNotFoundError as e:
+        print(f"Error: Data file '{e.filename}' not found.")
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error reading datasets: {e}")
+        sys.exit(1)
+    seconds = time.perf_counter() - start
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter='\t', lineterminator='\n')
+        writer.writerow(['check', 'dataset', 'column', 'line', 'value'])
+        for result in results:
+            writer.writerows(result.violations)
+
+    total = 0
+    print(f"{'='*60}")
+    print(f"INTEGRITY RESULTS")
+    print(f"{'='*60}")
+    for result in results:
+        count = len(result.violations)
+        total += count
+        METRICS.count('violations', count, check=result.check, dataset=result.dataset, column=result.column)
+        if result.skipped:
+            status = f'skipped ({result.skipped})'
+        else:
+            status = 'OK' if not count else f'{count} violations'
+        print(f"{result.dataset:<16} {result.column:<20} {result.check:<22} {result.rows:>8} rows  {status}")
+        if count:
+            samples = ', '.join(f"line {violation.line}: {violation.value or 'NULL'}"
+                                for violation in result.violations[:args.samples])
+            print(f"    {samples}{', ...' if count > args.samples else ''}")
+    for note in notes:
+        print(f"Note: {note}")
+
+    skipped = sum(1 for result in results if result.skipped)
+    print(f"\nChecked {len(results) - skipped} constraints in {seconds:.2f}s, {total} violations"
+          f"{f', {skipped} skipped' if skipped else ''}")
+    print(f"Violations written to {args.output}")
+    if total:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Column dtypes of the TSV datasets, shared by the pandas-based scripts.
+
+Declaring the dtypes skips pandas' type inference, keeps nullable ID columns
+such as video.series_id as integers instead of promoting them to float, and
+stores low-cardinality text columns as categories.
+"""
+
+import os
+from collections import defaultdict
+from typing import Dict, Optional
+
+ID = 'Int32'
+TEXT = 'string'
+CATEGORY = 'category'
+MEASUREMENT = 'Float32'
+
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    'video': {
+        'id': ID,
+        'code': TEXT,
+        'title': TEXT,
+        'dmm_id': TEXT,
+        'description': TEXT,
+        'release_date': TEXT,
+        'length': ID,
+        'label': TEXT,
+        'series_id': ID,
+        'maker_id': ID,
+    },
+    'actress': {
+        'id': ID,
+        'name': TEXT,
+        'dmm_id': TEXT,
+        'display_name': TEXT,
+        'ruby': TEXT,
+        'bust': MEASUREMENT,
+        'cup': CATEGORY,
+        'waist': MEASUREMENT,
+        'hip': MEASUREMENT,
+        'height': MEASUREMENT,
+        'birthday': TEXT,
+        'blood_type': CATEGORY,
+        'hobby': TEXT,
+        'prefectures': CATEGORY,
+    },
+    'genre': {
+        'id': ID,
+        'name': TEXT,
+        'ruby': TEXT,
+        'display_name': TEXT,
+        'dmm_id': ID,
+    },
+    'maker': {
+        'id': ID,
+        'name': TEXT,
+        'dmm_id': ID,
+        'ruby': TEXT,
+    },
+    'series': {
+        'id': ID,
+        'series_id': ID,
+        'name': TEXT,
+        'ruby': TEXT,
+        'dmm_id': ID,
+    },
+    'video-actresses': {'video_id': ID, 'actress_id': ID},
+    'video-genres': {'video_id': ID, 'genre_id': ID},
+    'video-maker': {'video_id': ID, 'maker_id': ID},
+    'video-series': {'video_id': ID, 'series_id': ID},
+}
+
+# Other file names used for the same datasets in .tmp/
+FILE_ALIASES = {
+    'videos': 'video',
+    'video-actress': 'video-actresses',
+    'video-genre': 'video-genres',
+    'video-makers': 'video-maker',
+}
+
+# Keeps whole measurements such as 88 from being written back as 88.0
+FLOAT_FORMAT = '%g'
+
+def detect_schema(path: str) -> Optional[str]:
+    """
+    Find the dataset schema for a file from its name, e.g. data/video.tsv -> "video".
+
+    Returns:
+        Schema name, or None if the file is not a known dataset
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stem = FILE_ALIASES.get(stem, stem)
+    return stem if stem in SCHEMAS else None
+
+def read_dataset(path_or_buffer, schema: str, delimiter: str = '\t', **kwargs):
+    """
+    Read a dataset with the declared column dtypes.
+
+    Only empty fields are treated as missing, so text such as "NA" is kept
+    as is. Columns that the schema does not declare are read as text.
+
+    Args:
+        path_or_buffer: File path or buffer
+        schema: Schema name from SCHEMAS
+        delimiter: Delimiter used in the file
+        **kwargs: Extra pd.read_csv arguments, e.g. chunksize
+
+    Returns:
+        DataFrame, or an iterator of DataFrames if chunksize is given
+    """
+    # Imported here so scripts that only need SCHEMAS (via tabular_io) start fast
+    import pandas as pd
+
+    return pd.read_csv(
+        path_or_buffer,
+        delimiter=delimiter,
+        dtype=defaultdict(lambda: TEXT, SCHEMAS[schema]),
+        keep_default_na=False,
+        na_values=[''],
+        **kwargs
+    )
@@ -3,6 +3,12 @@
 import argparse
 import pandas as pd
 import sys
+import time
+
+from dataset_schema import FLOAT_FORMAT, SCHEMAS, detect_schema, read_dataset
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+
+EXAMPLE_ROWS = 5
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Remove duplicates from a delimited file based on specified columns.")
@@ -10,16 +16,139 @@ def parse_args():
     parser.add_argument('--delimiter', default=',', help='Delimiter used in the file (default: ,). Use \"\\t\" for tab.')
     parser.add_argument('--prune', action='store_true', help='Remove all duplicates and keep no record.')
     parser.add_argument('--show-removed', action='store_true', help='Output only the removed duplicate records.')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='Stream the file in chunks of N rows with bounded memory. '
+                             'Values are kept as text; --prune reads the file twice.')
+    parser.add_argument('--schema', default='auto', choices=['auto', 'none'] + sorted(SCHEMAS),
+                        help='Dataset schema for column dtypes (default: auto, detected from the file name).')
     parser.add_argument('file', help='Input file (CSV/TSV/etc).')
+    add_metrics_arguments(parser)
     return parser.parse_args()
 
+def hash_keys(chunk: pd.DataFrame, columns) -> list:
+    """Hash the compound key of every row to a 64-bit integer."""
+    return pd.util.hash_pandas_object(chunk[columns], index=False).tolist()
+
+def read_file(file, delimiter, schema, **kwargs):
+    """
+    Read the file with the dtypes of its dataset schema.
+
+    Without a schema, values are read as text when streaming so keys and IDs
+    round-trip exactly, and inferred otherwise.
+    """
+    if schema:
+        return read_dataset(file, schema, delimiter, **kwargs)
+    if 'chunksize' in kwargs:
+        return pd.read_csv(file, delimiter=delimiter, dtype=str, keep_default_na=False, **kwargs)
+    return pd.read_csv(file, delimiter=delimiter, **kwargs)
+
+def find_duplicate_hashes(file, delimiter, columns, chunksize, schema) -> set:
+    """First pass for --prune: return the hashes of keys that occur more than once."""
+    seen = set()
+    duplicates = set()
+    for chunk in read_file(file, delimiter, schema, chunksize=chunksize):
+        for key_hash in hash_keys(chunk, columns):
+            if key_hash in seen:
+                duplicates.add(key_hash)
+            else:
+                seen.add(key_hash)
+    return duplicates
+
+def deduplicate_streaming(args, columns, delimiter, schema):
+    """
+    Remove duplicates while streaming the file in chunks.
+
+    Only 64-bit hashes of the compound keys are kept in memory instead of the
+    rows themselves. Kept or removed rows are written as each chunk is read.
+    For --prune a first pass collects the keys that occur more than once.
+    """
+    duplicate_hashes = None
+    if args.prune:
+        duplicate_hashes = find_duplicate_hashes(args.file, delimiter, columns, args.chunksize, schema)
+
+    seen = set()
+    total_rows = 0
+    removed_count = 0
+    examples = []
+    header = True
+
+    chunks = read_file(args.file, delimiter, schema, chunksize=args.chunksize)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        METRICS.add_time('read', time.perf_counter() - start)
+
+        if total_rows == 0:
+            missing_columns = [col for col in columns if col not in chunk.columns]
+            if missing_columns:
+                print(f"Error: Columns {missing_columns} not found in file. Available columns: {list(chunk.columns)}", file=sys.stderr)
+                sys.exit(1)
+
+            print(f"Checking for compound duplicates in columns: {columns}", file=sys.stderr)
+            print(f"Sample data:", file=sys.stderr)
+            print(chunk[columns].head(10).to_string(index=False), file=sys.stderr)
+
+        start = time.perf_counter()
+        is_removed = []
+        for key_hash in hash_keys(chunk, columns):
+            if duplicate_hashes is not None:
+                # For prune mode: remove ALL rows that have duplicates (including first occurrence)
+                is_removed.append(key_hash in duplicate_hashes)
+            elif key_hash in seen:
+                is_removed.append(True)
+            else:
+                seen.add(key_hash)
+                is_removed.append(False)
+
+        is_removed = pd.Series(is_removed, index=chunk.index)
+        removed_rows = chunk[is_removed]
+        output_rows = removed_rows if args.show_removed else chunk[~is_removed]
+        METRICS.add_time('deduplicate', time.perf_counter() - start)
+
+        with METRICS.timer('write'):
+            output_rows.to_csv(sys.stdout, sep=delimiter, index=False, header=header, lineterminator='\n', float_format=FLOAT_FORMAT)
+        header = False
+
+        total_rows += len(chunk)
+        removed_count += len(removed_rows)
+        if len(examples) < EXAMPLE_ROWS and not removed_rows.empty:
+            examples.append(removed_rows[columns].head(EXAMPLE_ROWS - len(examples)))
+
+    if args.prune:
+        print(f"Found {removed_count} rows with compound duplicates", file=sys.stderr)
+
+    METRICS.count('rows_read', total_rows)
+    METRICS.count('rows_removed', removed_count)
+    print(f"Total rows: {total_rows}", file=sys.stderr)
+    print(f"Removed rows: {removed_count}", file=sys.stderr)
+    print(f"Kept rows: {total_rows - removed_count}", file=sys.stderr)
+
+    if examples:
+        print(f"Examples of removed compound duplicates:", file=sys.stderr)
+        print(pd.concat(examples).to_string(index=False), file=sys.stderr)
+
 def main():
     args = parse_args()
+    start_instrumentation(args.metrics, args.profile)
+    METRICS.add_file('read', args.file)
     columns = [col.strip() for col in args.columns.split(',')]
     delimiter = args.delimiter.encode().decode('unicode_escape')  # handle '\t'
 
+    schema = detect_schema(args.file) if args.schema == 'auto' else args.schema
+    if schema == 'none':
+        schema = None
+    if schema:
+        print(f"Using {schema} schema", file=sys.stderr)
+
     try:
-        df = pd.read_csv(args.file, delimiter=delimiter)
+        if args.chunksize:
+            deduplicate_streaming(args, columns, delimiter, schema)
+            return
+
+        with METRICS.timer('read'):
+            df = read_file(args.file, delimiter, schema)
 
         missing_columns = [col for col in columns if col not in df.columns]
         if missing_columns:
@@ -30,32 +159,41 @@ def main():
         print(f"Sample data:", file=sys.stderr)
         print(df[columns].head(10).to_string(index=False), file=sys.stderr)
 
-        compound_duplicates = df.duplicated(subset=columns, keep=False)
-        total_compound_duplicates = compound_duplicates.sum()
-        print(f"Found {total_compound_duplicates} rows with compound duplicates", file=sys.stderr)
-
-        is_duplicate = df.duplicated(subset=columns, keep='first')
-
-        removed_rows = df[is_duplicate].copy()
-
-        output_rows = df[~is_duplicate].copy()
-
-        if args.prune:
-            # For prune mode: remove ALL rows that have duplicates (including first occurrence)
-            output_rows = df[~compound_duplicates].copy()
-            removed_rows = df[compound_duplicates].copy()
-
-        if args.show_removed:
-            if not removed_rows.empty:
-                removed_rows.to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n')
+        with METRICS.timer('deduplicate'):
+            compound_duplicates = df.duplicated(subset=columns, keep=False)
+            total_compound_duplicates = compound_duplicates.sum()
+            print(f"Found {total_compound_duplicates} rows with compound duplicates", file=sys.stderr)
+
+            is_duplicate = df.duplicated(subset=columns, keep='first')
+
+            removed_rows = df[is_duplicate].copy()
+
+            output_rows = df[~is_duplicate].copy()
+
+            if args.prune:
+                # For prune mode: remove ALL rows that have duplicates (including first occurrence)
+                output_rows = df[~compound_duplicates].copy()
+                removed_rows = df[compound_duplicates].copy()
+
+        with METRICS.timer('write'):
+            if args.show_removed:
+                if not removed_rows.empty and schema:
+                    removed_rows.to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n', float_format=FLOAT_FORMAT)
+                elif not removed_rows.empty:
+                    removed_rows.to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n')
+                else:
+                    pd.DataFrame(columns=df.columns).to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n')
+            elif schema:
+                # Typed IDs are written as integers, no float round-trip needed
+                output_rows.to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n', float_format=FLOAT_FORMAT)
             else:
-                pd.DataFrame(columns=df.columns).to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n')
-        else:
-            output_rows.to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n', float_format='%.0f')
+                output_rows.to_csv(sys.stdout, sep=delimiter, index=False, lineterminator='\n', float_format='%.0f')
 
         total_rows = len(df)
         removed_count = len(removed_rows)
         kept_count = len(output_rows)
+        METRICS.count('rows_read', total_rows)
+        METRICS.count('rows_removed', removed_count)
 
         print(f"Total rows: {total_rows}", file=sys.stderr)
         print(f"Removed rows: {removed_count}", file=sys.stderr)
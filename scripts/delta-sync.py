@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Compare a new DMM fetch against the existing snapshot table (e.g. data/maker.tsv)
+and emit only the inserted, updated and deleted rows.
+
+Records are matched by their DMM ID, so surrogate IDs of existing rows are
+preserved and new rows continue the sequence after the snapshot's max ID.
+Columns that are not part of the fetch (e.g. the display_name of genres)
+are carried over from the snapshot.
+
+A fetch that was interrupted (its NDJSON checkpoint is not complete) is
+refused, since every snapshot row it did not reach would be deleted.
+--allow-partial applies its inserts and updates and deletes nothing.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from ndjson_io import has_interrupted_fetch, iter_records
+
+# Per entity: fetcher result key, DMM ID field in the fetched records,
+# and fetched field -> snapshot column for the compared values.
+ENTITY_SPECS = {
+    'maker': {
+        'result_key': 'maker',
+        'source_key': 'maker_id',
+        'columns': {'name': 'name', 'ruby': 'ruby'},
+    },
+    'series': {
+        'result_key': 'series',
+        'source_key': 'series_id',
+        'columns': {'name': 'name', 'ruby': 'ruby'},
+    },
+    'genre': {
+        'result_key': 'genre',
+        'source_key': 'genre_id',
+        'columns': {'name': 'name', 'ruby': 'ruby'},
+    },
+}
+
+def load_snapshot(snapshot_path: str, key_column: str, delimiter: str) -> Tuple[List[str], List[Dict[str, str]], Dict[str, int]]:
+    """
+    Load the existing snapshot table.
+
+    Args:
+        snapshot_path: Path to the snapshot TSV file
+        key_column: Column holding the DMM ID
+        delimiter: Delimiter used in the snapshot file
+
+    Returns:
+        Tuple of (field names, rows, mapping from DMM ID to row index)
+    """
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8', newline='') as file:
+            reader = csv.DictReader(file, delimiter=delimiter)
+            fieldnames = list(reader.fieldnames or [])
+            rows = list(reader)
+    except FileNotFoundError:
+        print(f"Error: Snapshot file '{snapshot_path}' not found.")
+        sys.exit(1)
+
+    for column in ('id', key_column):
+        if column not in fieldnames:
+            print(f"Error: Column '{column}' not found in snapshot. Available columns: {fieldnames}")
+            sys.exit(1)
+
+    key_index = {}
+    for index, row in enumerate(rows):
+        key = (row[key_column] or '').strip()
+        if key:
+            key_index.setdefault(key, index)
+
+    print(f"Loaded {len(rows)} snapshot rows ({len(key_index)} with a DMM ID)")
+    return fieldnames, rows, key_index
+
+def compute_delta(
+    records,
+    spec: Dict,
+    fieldnames: List[str],
+    rows: List[Dict[str, str]],
+    key_index: Dict[str, int],
+    key_column: str
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Compare fetched records against the snapshot.
+
+    Args:
+        records: Iterable of fetched records
+        spec: Entity spec from ENTITY_SPECS
+        fieldnames: Snapshot field names
+        rows: Snapshot rows
+        key_index: Mapping from DMM ID to snapshot row index
+        key_column: Snapshot column holding the DMM ID
+
+    Returns:
+        Tuple of (inserted rows, updated rows, deleted rows)
+    """
+    next_id = max((int(row['id']) for row in rows if row['id']), default=0) + 1
+    inserted, updated = [], []
+    seen = set()
+
+    for record in records:
+        key = str(record.get(spec['source_key']) or '').strip()
+        if not key:
+            continue
+        if key in seen:
+            print(f"Warning: Duplicate {spec['source_key']} '{key}' in fetch, keeping the first record")
+            continue
+        seen.add(key)
+
+        values = {column: str(record.get(field) or '').strip() for field, column in spec['columns'].items()}
+
+        index = key_index.get(key)
+        if index is None:
+            row = {column: '' for column in fieldnames}
+            row.update(values)
+            row['id'] = str(next_id)
+            row[key_column] = key
+            next_id += 1
+            inserted.append(row)
+            continue
+
+        existing = rows[index]
+        if any((existing.get(column) or '').strip() != value for column, value in values.items() if column in existing):
+            row = dict(existing)
+            row.update({column: value for column, value in values.items() if column in existing})
+            updated.append(row)
+
+    deleted = [rows[index] for key, index in key_index.items() if key not in seen]
+    return inserted, updated, deleted
+
+def write_rows(rows: List[Dict[str, str]], fieldnames: List[str], output_path: str, delimiter: str):
+    """Write rows with a header to a delimited file."""
+    with open(output_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames, delimiter=delimiter, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_merged(
+    output_path: str,
+    fieldnames: List[str],
+    rows: List[Dict[str, str]],
+    inserted: List[Dict[str, str]],
+    updated: List[Dict[str, str]],
+    deleted: List[Dict[str, str]],
+    delimiter: str
+):
+    """Write the full table with the delta applied, keeping snapshot row order."""
+    updated_by_id = {row['id']: row for row in updated}
+    deleted_ids = {row['id'] for row in deleted}
+
+    merged = [updated_by_id.get(row['id'], row) for row in rows if row['id'] not in deleted_ids]
+    write_rows(merged + inserted, fieldnames, output_path, delimiter)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute inserted/updated/deleted rows between a new fetch and an existing snapshot.')
+    parser.add_argument('--entity', required=True, choices=sorted(ENTITY_SPECS), help='Entity type of the fetch')
+    parser.add_argument('--snapshot', required=True, help='Existing table, e.g. data/maker.tsv')
+    parser.add_argument('--fetched', required=True, help='Fetcher output (NDJSON or JSON)')
+    parser.add_argument('--output-dir', required=True, help='Directory for inserted.tsv, updated.tsv and deleted.tsv')
+    parser.add_argument('--key-column', default='dmm_id', help='Snapshot column holding the DMM ID (default: dmm_id)')
+    parser.add_argument('--delimiter', default='\\t', help='Delimiter of the snapshot and output files (default: \\t)')
+    parser.add_argument('--merged', default=None, help='Optional path for the full table with the delta applied')
+    parser.add_argument('--allow-partial', action='store_true',
+                        help='Accept an interrupted fetch, applying its inserts and updates without deleting any rows')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    spec = ENTITY_SPECS[args.entity]
+    delimiter = args.delimiter.encode().decode('unicode_escape')  # handle '\t'
+
+    partial = has_interrupted_fetch(args.fetched)
+    if partial and not args.allow_partial:
+        print(f"Error: '{args.fetched}' is from an interrupted fetch, so rows it did not reach would be deleted. "
+              f"Resume the fetch, or pass --allow-partial to sync it without deletions.")
+        sys.exit(1)
+
+    with METRICS.timer('load'):
+        fieldnames, rows, key_index = load_snapshot(args.snapshot, args.key_column, delimiter)
+    METRICS.add_file('read', args.snapshot)
+
+    try:
+        records = iter_records(args.fetched, spec['result_key'])
+        with METRICS.timer('diff'):
+            inserted, updated, deleted = compute_delta(records, spec, fieldnames, rows, key_index, args.key_column)
+        METRICS.add_file('read', args.fetched)
+    except FileNotFoundError:
+        print(f"Error: Fetched file '{args.fetched}' not found.")
+        sys.exit(1)
+
+    if partial:
+        print(f"Partial fetch: {len(deleted)} snapshot rows not in it are kept, not deleted")
+        deleted = []
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, delta_rows in (('inserted', inserted), ('updated', updated), ('deleted', deleted)):
+        with METRICS.timer('write'):
+            write_rows(delta_rows, fieldnames, os.path.join(args.output_dir, f"{name}.tsv"), delimiter)
+        METRICS.count('delta_rows', len(delta_rows), change=name)
+
+    print(f"Inserted rows: {len(inserted)}")
+    print(f"Updated rows: {len(updated)}")
+    print(f"Deleted rows: {len(deleted)}")
+    print(f"Delta written to {args.output_dir}")
+
+    if args.merged:
+        write_merged(args.merged, fieldnames, rows, inserted, updated, deleted, delimiter)
+        print(f"Merged table written to {args.merged}")
+
+if __name__ == '__main__':
+    main()
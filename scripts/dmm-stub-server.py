@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the DMM affiliate API, for testing the fetchers offline.
+
+Serves a deterministic synthetic catalogue (the same --seed gives the same
+items) from the ItemList, ActressSearch, MakerSearch, SeriesSearch and
+GenreSearch endpoints with the API's pagination rules: hits up to 100 (500
+for the maker/series/genre searches), offsets up to --max-offset, ItemList
+filtering by gte_date/lte_date, newest first, and ActressSearch filtering
+by the initial of the ruby. --error-rate makes a share of requests
+fail with 429 or 503 to exercise the retries.
+
+    python dmm-stub-server.py --port 8089 --videos 20000 --max-offset 2000
+    DMM_API_BASE_URL=http://127.0.0.1:8089/affiliate/v3 APP_ID=x AFFILIATE_ID=y \\
+        python video-fetch.py .tmp/video.tsv --start-date 2015-01-01 --max-offset 2000
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ITEM_HITS_LIMIT = 100
+SEARCH_HITS_LIMIT = 500
+
+LABEL_PREFIXES = ['abp', 'ipx', 'ssis', 'mide', 'pred', 'jul', 'meyd', 'hnd', 'cawd', 'stars', 'mdbk', 'cead']
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# First characters of the actress rubies; a few start with a latin letter,
+# which no gojuon initial covers
+RUBY_INITIALS = ('あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわ'
+                 'がぎぐげござじずぜぞだでどばびぶべぼぱぴぷぺぽa')
+
+CUPS = 'ABCDEFGHIJ'
+BLOOD_TYPES = ('A', 'B', 'O', 'AB', None)
+PREFECTURES = ('東京都', '大阪府', '北海道', '福岡県', '愛知県', '神奈川県', None)
+
+class ApiError(Exception):
+    """Error returned to the client with an HTTP status and a DMM-style error body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class Catalogue:
+    """Synthetic makers, series, genres, actresses and videos."""
+
+    def __init__(self, videos: int, actresses: int, seed: int, start: datetime, end: datetime):
+        rng = random.Random(seed)
+        self.makers = [{'maker_id': str(40000 + i), 'name': f'メーカー{i}', 'ruby': f'めーかー{i}'} for i in range(1, 301)]
+        self.series = [{'series_id': str(10000 + i), 'name': f'シリーズ{i}', 'ruby': f'しりーず{i}'} for i in range(1, 1001)]
+        self.genres = [{'genre_id': str(1000 + i), 'name': f'ジャンル{i}', 'ruby': f'じゃんる{i}'} for i in range(1, 201)]
+        self.actresses = [self.actress(rng, i) for i in range(1, actresses + 1)]
+
+        span = int((end - start).total_seconds())
+        self.items: List[Dict[str, Any]] = []
+        for i in range(1, videos + 1):
+            prefix = LABEL_PREFIXES[i % len(LABEL_PREFIXES)]
+            content_id = f"{prefix}{i:05d}"
+            date = start + timedelta(seconds=rng.randrange(span))
+            maker = rng.choice(self.makers)
+            iteminfo = {
+                'genre': [{'id': int(genre['genre_id']), 'name': genre['name']} for genre in rng.sample(self.genres, rng.randint(1, 6))],
+                'maker': [{'id': int(maker['maker_id']), 'name': maker['name']}],
+                'actress': [{'id': int(actress['id']), 'name': actress['name'], 'ruby': actress['ruby']}
+                            for actress in rng.sample(self.actresses, rng.choice((0, 1, 1, 1, 2, 3)))],
+                'label': [{'id': 2000 + i % 50, 'name': f'レーベル{i % 50}'}],
+            }
+            if rng.random() < 0.6:
+                series = rng.choice(self.series)
+                iteminfo['series'] = [{'id': int(series['series_id']), 'name': series['name']}]
+            self.items.append({
+                'service_code': 'digital',
+                'floor_code': 'videoa',
+                'content_id': content_id,
+                'product_id': content_id,
+                'title': f'タイトル{i}',
+                'volume': str(rng.choice((60, 90, 120, 150, 240))),
+                'URL': f'https://video.dmm.co.jp/av/content/?id={content_id}',
+                'date': date.strftime('%Y-%m-%d %H:%M:%S'),
+                'iteminfo': iteminfo,
+            })
+        # Newest first, as sort=date returns them
+        self.items.sort(key=lambda item: (item['date'], item['content_id']), reverse=True)
+
+    @staticmethod
+    def actress(rng: random.Random, i: int) -> Dict[str, Any]:
+        """One ActressSearch record; measurements and profile fields are often missing."""
+        measured = rng.random() < 0.7
+        return {
+            'id': str(100000 + i),
+            'name': f'女優{i}',
+            'ruby': f'{rng.choice(RUBY_INITIALS)}ゆう{i}',
+            'bust': str(rng.randint(75, 100)) if measured else None,
+            'cup': rng.choice(CUPS) if measured else None,
+            'waist': str(rng.randint(52, 65)) if measured else None,
+            'hip': str(rng.randint(78, 95)) if measured else None,
+            'height': str(rng.randint(145, 175)) if measured else None,
+            'birthday': f'{rng.randint(1975, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}' if measured else None,
+            'blood_type': rng.choice(BLOOD_TYPES),
+            'hobby': rng.choice(('読書', '映画鑑賞、料理', 'ゲーム', None)),
+            'prefectures': rng.choice(PREFECTURES),
+            'imageURL': {'small': f'https://pics.dmm.co.jp/mono/actjpgs/thumbnail/{i}.jpg',
+                         'large': f'https://pics.dmm.co.jp/mono/actjpgs/{i}.jpg'},
+        }
+
+def page(params: Dict[str, str], items: list, hits_limit: int, max_offset: int) -> Tuple[list, int]:
+    """Apply hits/offset to a result list, validating them like the API."""
+    try:
+        hits = int(params.get('hits', 20))
+        offset = int(params.get('offset', 1))
+    except ValueError:
+        raise ApiError(400, 'hits and offset must be integers')
+    if not 1 <= hits <= hits_limit:
+        raise ApiError(400, f'hits must be between 1 and {hits_limit}')
+    if not 1 <= offset <= max_offset:
+        raise ApiError(400, f'offset must be between 1 and {max_offset}')
+    return items[offset - 1:offset - 1 + hits], offset
+
+def parse_date(value: str) -> str:
+    """Validate a gte_date/lte_date value and return it in the items' date format."""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise ApiError(400, f'invalid date {value!r}, expected {DATE_FORMAT}')
+
+def item_list(catalogue: Catalogue, params: Dict[str, str], max_offset: int) -> Dict[str, Any]:
+    items = catalogue.items
+    if 'gte_date' in params:
+        gte = parse_date(params['gte_date'])
+        items = [item for item in items if item['date'] >= gte]
+    if 'lte_date' in params:
+        lte = parse_date(params['lte_date'])
+        items = [item for item in items if item['date'] <= lte]
+    found, offset = page(params, items, ITEM_HITS_LIMIT, max_offset)
+    return {'result_count': len(found), 'total_count': len(items), 'first_position': offset, 'items': found}
+
+def actress_search(catalogue: Catalogue, params: Dict[str, str], max_offset: int) -> Dict[str, Any]:
+    actresses = catalogue.actresses
+    if params.get('initial'):
+        actresses = [actress for actress in actresses if actress['ruby'].startswith(params['initial'])]
+    found, offset = page(params, actresses, ITEM_HITS_LIMIT, max_offset)
+    return {'result_count': len(found), 'total_count': str(len(actresses)), 'first_position': offset, 'actress': found}
+
+def search(key: str, catalogue_items: list):
+    def handler(catalogue: Catalogue, params: Dict[str, str], max_offset: int) -> Dict[str, Any]:
+        found, offset = page(params, catalogue_items(catalogue), SEARCH_HITS_LIMIT, max_offset)
+        return {'result_count': len(found), 'total_count': str(len(catalogue_items(catalogue))),
+                'first_position': offset, key: found}
+    return handler
+
+# Endpoint -> handler(catalogue, query parameters, max offset) returning the "result" object
+ENDPOINTS = {
+    'ItemList': item_list,
+    'ActressSearch': actress_search,
+    'MakerSearch': search('maker', lambda catalogue: catalogue.makers),
+    'SeriesSearch': search('series', lambda catalogue: catalogue.series),
+    'GenreSearch': search('genre', lambda catalogue: catalogue.genres),
+}
+
+def make_handler(catalogue: Catalogue, args):
+    request_lock = threading.Lock()
+    counts = {'requests': 0, 'errors': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *_):
+            pass
+
+        def send_json(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+            with request_lock:
+                counts['requests'] += 1
+
+            if args.latency:
+                time.sleep(args.latency)
+            if random.random() < args.error_rate:
+                with request_lock:
+                    counts['errors'] += 1
+                self.send_response(429 if random.random() < 0.5 else 503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            handler = ENDPOINTS.get(endpoint)
+            try:
+                if handler is None:
+                    raise ApiError(404, f'unknown endpoint {endpoint}')
+                if not params.get('api_id') or not params.get('affiliate_id'):
+                    raise ApiError(400, 'api_id and affiliate_id are required')
+                result = handler(catalogue, params, args.max_offset)
+            except ApiError as e:
+                self.send_json(e.status, {'result': {'status': e.status, 'message': str(e)}})
+                return
+
+            self.send_json(200, {'request': {'parameters': params}, 'result': {'status': 200, **result}})
+
+    return Handler, counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic DMM affiliate API for testing the fetchers.')
+    parser.add_argument('--host', default='127.0.0.1', help='Listen address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8089, help='Listen port (default: 8089)')
+    parser.add_argument('--videos', type=int, default=20000, help='Number of ItemList items (default: 20000)')
+    parser.add_argument('--actresses', type=int, default=3000, help='Number of ActressSearch records (default: 3000)')
+    parser.add_argument('--start-date', default='2010-01-01', help='Earliest release date (default: 2010-01-01)')
+    parser.add_argument('--end-date', default='2025-12-31', help='Latest release date (default: 2025-12-31)')
+    parser.add_argument('--max-offset', type=int, default=50000, help='Highest allowed offset (default: 50000)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 429/503 (default: 0)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response (default: 0)')
+    parser.add_argument('--seed', type=int, default=1, help='Catalogue random seed (default: 1)')
+    args = parser.parse_args()
+
+    catalogue = Catalogue(args.videos, args.actresses, args.seed, datetime.fromisoformat(args.start_date),
+                          datetime.fromisoformat(args.end_date) + timedelta(days=1))
+    handler, counts = make_handler(catalogue, args)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving {len(catalogue.items)} items and {len(catalogue.actresses)} actresses at http://{args.host}:{args.port}/affiliate/v3", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {counts['requests']} requests ({counts['errors']} injected errors)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Shared fetch engine for the DMM affiliate API search endpoints
+(MakerSearch, SeriesSearch, ...).
+
+Pages are requested through one pooled session, several offsets at a time,
+under a requests-per-second budget. 429 and 5xx responses, and 200 responses
+whose body is not JSON, are retried with exponential backoff and jitter. With
+a ResponseCache (http_cache.py), cached pages are answered without a request
+and without waiting on the rate limit.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from etl_metrics import METRICS
+from http_cache import ResponseCache, normalize_url
+
+DEFAULT_BASE_URL = "https://api.dmm.com/affiliate/v3"
+DEFAULT_HITS = 500
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 5.0
+DEFAULT_RETRIES = 5
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    """Raised when a page cannot be fetched after all retries."""
+
+class RateLimiter:
+    """Thread-safe limiter that spaces requests to a requests-per-second budget."""
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Maximum requests per second (0 or less disables the limit)
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next request is allowed."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            METRICS.count("rate_limit_wait_seconds", wait_time)
+            time.sleep(wait_time)
+
+def credentials_from_env(required: bool = True) -> Tuple[str, str]:
+    """
+    Read the DMM API credentials from the APP_ID and AFFILIATE_ID environment variables.
+
+    Exits with an error message if either one is missing, unless not
+    required (e.g. when replaying from the response cache offline).
+    """
+    app_id = os.getenv("APP_ID", "")
+    affiliate_id = os.getenv("AFFILIATE_ID", "")
+
+    if required and (not app_id or not affiliate_id):
+        print("Please set the APP_ID and AFFILIATE_ID environment variables.")
+        sys.exit(1)
+
+    return app_id, affiliate_id
+
+class DmmFetcher:
+    """
+    Fetch paginated results from a DMM affiliate API search endpoint.
+    """
+
+    def __init__(
+        self,
+        app_id: str,
+        affiliate_id: str,
+        base_url: Optional[str] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = 1.0,
+        timeout: float = 30.0,
+        pool_size: Optional[int] = None,
+        cache: Optional[ResponseCache] = None
+    ):
+        """
+        Args:
+            app_id: DMM API ID
+            affiliate_id: DMM affiliate ID
+            base_url: API base URL (default: DMM_API_BASE_URL or the public API)
+            concurrency: Maximum number of pages in flight at once
+            rate: Maximum requests per second across all threads
+            retries: Number of retries for 429/5xx responses, invalid JSON and
+                connection errors
+            backoff: Base delay in seconds for exponential backoff
+            timeout: Request timeout in seconds
+            pool_size: Pooled connections, for callers that run several
+                fetch_pages at once (default: concurrency)
+            cache: Response cache to answer from and store into
+        """
+        self.app_id = app_id
+        self.affiliate_id = affiliate_id
+        self.base_url = (base_url or os.getenv("DMM_API_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.concurrency = max(concurrency, 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate)
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size or 0, self.concurrency))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """Close the pooled session and the response cache."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Request one page from an endpoint, retrying on 429/5xx, invalid JSON and connection errors.
+
+        Args:
+            endpoint: Endpoint name, e.g. "MakerSearch"
+            params: Query parameters, without the credentials
+
+        Returns:
+            The "result" object of the JSON response
+
+        Raises:
+            FetchError: If the request still fails after all retries, or
+                misses the cache in offline mode
+        """
+        url = f"{self.base_url}/{endpoint}"
+        query = {"api_id": self.app_id, "affiliate_id": self.affiliate_id, "output": "json", **params}
+
+        if self.cache is not None:
+            cache_url = normalize_url(url, query)
+            body = self.cache.get(endpoint, cache_url)
+            if body is not None:
+                return json.loads(body).get("result", {})
+            if self.cache.offline:
+                raise FetchError(f"Error fetching {endpoint} offset={params.get('offset')}: not in the cache (offline)")
+
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                with METRICS.timer("request", endpoint=endpoint):
+                    response = self.session.get(url, params=query, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = f"{type(e).__name__}: {e}"
+                METRICS.count("http_requests", endpoint=endpoint, status=type(e).__name__)
+            else:
+                METRICS.count("http_requests", endpoint=endpoint, status=response.status_code)
+                METRICS.count("bytes_received", len(response.content), endpoint=endpoint)
+                if response.status_code == 200:
+                    try:
+                        result = response.json().get("result", {})
+                    except ValueError:
+                        # Truncated body or an HTML error page served with 200
+                        error = "invalid JSON in HTTP 200 response"
+                        METRICS.count("invalid_responses", endpoint=endpoint)
+                    else:
+                        if self.cache is not None:
+                            self.cache.put(endpoint, cache_url, response.content)
+                        return result
+                else:
+                    error = f"HTTP {response.status_code}"
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        break
+
+            if attempt < self.retries:
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                METRICS.count("http_retries", endpoint=endpoint)
+                print(f"Retrying {endpoint} offset={params.get('offset')} after {error} ({attempt + 1}/{self.retries})...")
+                time.sleep(delay)
+
+        raise FetchError(f"Error fetching {endpoint} offset={params.get('offset')}: {error}")
+
+    def fetch_pages(
+        self,
+        endpoint: str,
+        result_key: str,
+        params: Optional[Dict[str, Any]] = None,
+        hits: int = DEFAULT_HITS,
+        start_offset: int = 1,
+        first_result: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Fetch every page of an endpoint, yielding pages in offset order.
+
+        The first page is fetched alone to learn total_count; the remaining
+        offsets are then fetched concurrently. If the response carries no
+        total_count, pages are fetched in speculative batches until an empty
+        page is returned.
+
+        Args:
+            endpoint: Endpoint name, e.g. "MakerSearch"
+            result_key: Key of the item list in the result, e.g. "maker"
+            params: Extra query parameters, e.g. {"floor_id": 43}
+            hits: Page size
+            start_offset: 1-based offset of the first page to fetch
+            first_result: Already fetched result of the first page, e.g.
+                from probing total_count
+
+        Yields:
+            Tuple of (offset, items) for each non-empty page
+        """
+        params = dict(params or {})
+
+        def fetch(offset: int) -> Dict[str, Any]:
+            return self.request(endpoint, {**params, "hits": hits, "offset": offset})
+
+        first = first_result if first_result is not None else fetch(start_offset)
+        items = first.get(result_key, [])
+        if not items:
+            return
+        yield start_offset, items
+
+        total_count = first.get("total_count")
+        next_offset = start_offset + hits
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            if total_count is not None:
+                offsets = range(next_offset, int(total_count) + 1, hits)
+                for offset, result in zip(offsets, executor.map(fetch, offsets)):
+                    items = result.get(result_key, [])
+                    if not items:
+                        return
+                    yield offset, items
+                return
+
+            while True:
+                offsets = range(next_offset, next_offset + hits * self.concurrency, hits)
+                for offset, result in zip(offsets, executor.map(fetch, offsets)):
+                    items = result.get(result_key, [])
+                    if not items:
+                        return
+                    yield offset, items
+                next_offset = offsets[-1] + hits
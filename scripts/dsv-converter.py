@@ -1,23 +1,197 @@
 import argparse
 import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from table_stream import exit_on_broken_pipe
+from tabular_io import TableReader, TableWriter, format_for_path
+
+BUFFER_SIZE = 1 << 20
+
+# Lines are read in blocks of about this many characters
+BLOCK_SIZE = 1 << 22
+
+DELIMITER_EXTENSIONS = {'\t': '.tsv', ',': '.csv', '|': '.csv'}
+
+def open_text(path: str, mode: str):
+    """Open a file, or stdin/stdout for "-", as UTF-8 text with large buffers."""
+    if path == '-':
+        stream = sys.stdin if mode == 'r' else sys.stdout
+        return open(stream.fileno(), mode, encoding='utf-8', newline='', buffering=BUFFER_SIZE, closefd=False)
+    return open(path, mode, encoding='utf-8', newline='', buffering=BUFFER_SIZE)
+
+def iter_blocks(infile) -> Iterator[List[str]]:
+    """Read whole lines in blocks of about BLOCK_SIZE characters."""
+    while True:
+        lines = infile.readlines(BLOCK_SIZE)
+        if not lines:
+            return
+        yield lines
+
+def convert_text(infile, outfile, from_delim: str, to_delim: str) -> int:
+    """
+    Re-delimit a text file.
+
+    Blocks without quote characters, carriage returns or the output
+    delimiter are converted with a plain string replace, which gives the
+    same output as parsing and rewriting them with csv. From the first block
+    that needs quoting on, the rest of the file goes through csv.reader and
+    csv.writer.writerows.
+
+    Returns:
+        Number of rows written
+    """
+    row_count = 0
+    blocks = iter_blocks(infile)
+    for lines in blocks:
+        block = ''.join(lines)
+        if '"' in block or '\r' in block or (to_delim != from_delim and to_delim in block):
+            remaining = (line for lines in blocks for line in lines)
+            return row_count + convert_rows(iter_lines(lines, remaining), outfile, from_delim, to_delim)
+
+        if not block.endswith('\n'):
+            block += '\n'
+        outfile.write(block.replace(from_delim, to_delim))
+        row_count += len(lines)
+
+    return row_count
+
+def iter_lines(first: List[str], remaining: Iterator[str]) -> Iterator[str]:
+    yield from first
+    yield from remaining
+
+def convert_rows(lines: Iterator[str], outfile, from_delim: str, to_delim: str) -> int:
+    """Re-delimit lines with full CSV parsing, writing rows in batches."""
+    reader = csv.reader(lines, delimiter=from_delim)
+    writer = csv.writer(outfile, delimiter=to_delim, lineterminator='\n')
+    row_count = 0
+    while True:
+        rows = list(zip(range(10000), reader))
+        if not rows:
+            return row_count
+        writer.writerows(row for _, row in rows)
+        row_count += len(rows)
+
+def convert_file(task: Tuple[str, str, str, str, str]) -> Tuple[str, int]:
+    """
+    Convert one file between delimiters or table formats.
+
+    Args:
+        task: Tuple of (input path, output path, input delimiter, output
+            delimiter, dataset schema or "")
+
+    Returns:
+        Tuple of (output path, rows written)
+    """
+    input_path, output_path, from_delim, to_delim, schema = task
+
+    if format_for_path(input_path) != 'tsv' or format_for_path(output_path) != 'tsv':
+        reader = TableReader(input_path, delimiter=from_delim)
+        with TableWriter(output_path, reader.fieldnames, schema=schema or None,
+                         delimiter=to_delim, lineterminator='\n') as writer:
+            for row in reader:
+                writer.writerow(row)
+        return output_path, writer.rows_written
+
+    with open_text(input_path, 'r') as infile, open_text(output_path, 'w') as outfile:
+        return output_path, convert_text(infile, outfile, from_delim, to_delim)
+
+def batch_output_path(input_path: str, output_dir: str, to_delim: str) -> str:
+    """Output path of a batch conversion; the extension follows the output delimiter."""
+    stem, extension = os.path.splitext(os.path.basename(input_path))
+    if format_for_path(input_path) == 'tsv':
+        extension = DELIMITER_EXTENSIONS.get(to_delim, extension)
+    return os.path.join(output_dir, stem + extension)
+
+def same_file(first: str, second: str) -> bool:
+    """Whether two paths name the same file, through links or not."""
+    if os.path.realpath(first) == os.path.realpath(second):
+        return True
+    try:
+        return os.path.samefile(first, second)
+    except OSError:
+        return False
+
+def path_conflicts(tasks: List[Tuple[str, str, str, str, str]]) -> List[str]:
+    """
+    Find outputs that would overwrite an input or another output.
+
+    Outputs are truncated before their input is read, so both have to be
+    caught before anything is written.
+
+    Returns:
+        Description of each conflict
+    """
+    conflicts = []
+    inputs = [task[0] for task in tasks if task[0] != '-']
+    outputs: List[Tuple[str, str]] = []
+    for input_path, output_path, _, _, _ in tasks:
+        if output_path == '-':
+            continue
+        for other_input in inputs:
+            if same_file(output_path, other_input):
+                conflicts.append(f"output {output_path} would overwrite the input {other_input}")
+        for other_input, other_output in outputs:
+            if same_file(output_path, other_output):
+                conflicts.append(f"{input_path} and {other_input} would both be written to {output_path}")
+        outputs.append((input_path, output_path))
+    return conflicts
 
 def main():
     parser = argparse.ArgumentParser(description="Convert a delimiter-separated value file to another delimiter.")
-    parser.add_argument('--from', dest='from_delim', required=True, help='Input delimiter (e.g., "," or "\\t")')
-    parser.add_argument('--to', dest='to_delim', required=True, help='Output delimiter (e.g., "," or "\\t")')
-    parser.add_argument('input_file', help='Input file path')
-    parser.add_argument('output_file', help='Output file path')
+    parser.add_argument('--from', dest='from_delim', required=True, help='Input delimiter (e.g., "," or "\\t"), ignored for .parquet/.arrow input')
+    parser.add_argument('--to', dest='to_delim', required=True, help='Output delimiter (e.g., "," or "\\t"), ignored for .parquet/.arrow output')
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help='Input and output file paths ("-" for stdin/stdout), or with --output-dir any number of input files. '
+                             '.parquet and .arrow files are read and written as tables')
+    parser.add_argument('--output-dir', default=None,
+                        help='Batch mode: convert every input file into this directory, with the extension of the output delimiter')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Files converted in parallel in batch mode (default: CPU count)')
+    parser.add_argument('--schema', default=None, help='Dataset schema for the column types of .parquet/.arrow output, e.g. video')
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
 
     from_delim = bytes(args.from_delim, "utf-8").decode("unicode_escape")
     to_delim = bytes(args.to_delim, "utf-8").decode("unicode_escape")
 
-    with open(args.input_file, newline='', encoding='utf-8') as infile, \
-         open(args.output_file, 'w', newline='', encoding='utf-8') as outfile:
-        reader = csv.reader(infile, delimiter=from_delim)
-        writer = csv.writer(outfile, delimiter=to_delim, lineterminator='\n')
-        for row in reader:
-            writer.writerow(row)
+    if args.output_dir:
+        tasks = [(path, batch_output_path(path, args.output_dir, to_delim), from_delim, to_delim, args.schema or '')
+                 for path in args.paths]
+    elif len(args.paths) == 2:
+        tasks = [(args.paths[0], args.paths[1], from_delim, to_delim, args.schema or '')]
+    else:
+        parser.error("expected an input and an output path, or --output-dir with input paths")
+
+    conflicts = path_conflicts(tasks)
+    if conflicts:
+        for conflict in conflicts:
+            print(f"Error: {conflict}", file=sys.stderr)
+        sys.exit(1)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    try:
+        if len(tasks) > 1 and args.jobs > 1:
+            with ProcessPoolExecutor(max_workers=min(args.jobs, len(tasks))) as executor:
+                results = list(executor.map(convert_file, tasks))
+        else:
+            results = [convert_file(task) for task in tasks]
+    except BrokenPipeError:
+        exit_on_broken_pipe()
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    for (input_path, _, _, _, _), (output_path, row_count) in zip(tasks, results):
+        METRICS.add_file('read', input_path)
+        METRICS.add_file('written', output_path)
+        METRICS.count('rows_written', row_count)
+        if args.output_dir:
+            print(f"Converted {input_path} to {output_path} ({row_count} rows)")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,216 @@
+"""
+Shared metrics for the ETL scripts: phase timers, counters, bytes read and
+written, and an optional profiler hook.
+
+Scripts record into the METRICS registry and call start_instrumentation()
+once at startup. When a metrics path is configured, the registry is written
+when the script exits, as JSON or as Prometheus text format (.prom/.txt), so
+a scheduler can graph throughput across runs.
+
+The metrics path and profiler can be set per script (--metrics, --profile)
+or for every script at once with the ETL_METRICS and ETL_PROFILE
+environment variables. ETL_METRICS may name a directory, in which case each
+script writes <directory>/<script>.json (or .prom with
+ETL_METRICS_FORMAT=prometheus).
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+PROMETHEUS_EXTENSIONS = ('.prom', '.txt')
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def script_name() -> str:
+    """Name of the running script without its extension, e.g. "deduplicate"."""
+    return os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and phase timers.
+
+    Every sample has a name and a set of labels. Counters accumulate, gauges
+    keep the last value, and timers accumulate seconds and calls per phase.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.timers: Dict[Labels, list] = {}
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+
+    def count(self, name: str, value: float = 1, **labels):
+        """Add to a counter, e.g. count('rows_written', 100, entity='maker')."""
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, **labels):
+        """Set a gauge to its current value."""
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    @contextmanager
+    def timer(self, phase: str, **labels):
+        """Time a block and add it to the phase, e.g. with METRICS.timer('load', entity='actress')."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start, **labels)
+
+    def add_time(self, phase: str, seconds: float, **labels):
+        """Add seconds measured elsewhere to a phase timer."""
+        key = _labels(dict(labels, phase=phase))
+        with self.lock:
+            total = self.timers.setdefault(key, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def add_file(self, direction: str, path: str, **labels):
+        """Count the size of a file as bytes "read" or "written"."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self.count(f'bytes_{direction}', size, file=os.path.basename(path), **labels)
+
+    def to_dict(self) -> Dict:
+        """Return the metrics as a JSON-serializable dictionary."""
+        with self.lock:
+            return {
+                'script': script_name(),
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                'timers': [{'labels': dict(labels), 'seconds': round(seconds, 6), 'calls': calls}
+                           for labels, (seconds, calls) in sorted(self.timers.items())],
+            }
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in Prometheus text exposition format."""
+        script = (('script', script_name()),)
+
+        def sample(name: str, labels: Labels, value: float) -> str:
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in script + labels)
+            text = str(int(value)) if float(value).is_integer() else repr(float(value))
+            return f"etl_{name}{{{label_text}}} {text}"
+
+        lines = []
+        with self.lock:
+            for kind, samples, suffix in (('counter', self.counters, '_total'), ('gauge', self.gauges, '')):
+                for name in sorted({name for name, _ in samples}):
+                    lines.append(f"# TYPE etl_{name}{suffix} {kind}")
+                    lines.extend(sample(f"{name}{suffix}", labels, value)
+                                 for (sample_name, labels), value in sorted(samples.items()) if sample_name == name)
+            if self.timers:
+                lines.append("# TYPE etl_phase_seconds summary")
+                for labels, (seconds, calls) in sorted(self.timers.items()):
+                    lines.append(sample('phase_seconds_sum', labels, seconds))
+                    lines.append(sample('phase_seconds_count', labels, calls))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Write the metrics file; the extension picks JSON or Prometheus text."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            if path.endswith(PROMETHEUS_EXTENSIONS):
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), file, indent=2, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+METRICS = Metrics()
+
+def add_metrics_arguments(parser):
+    """Add the --metrics and --profile options to an argument parser."""
+    parser.add_argument('--metrics', default=None,
+                        help='Write metrics to this JSON or .prom file, or directory (default: ETL_METRICS)')
+    parser.add_argument('--profile', default=None, choices=PROFILERS,
+                        help='Profile the run with cProfile or pyinstrument (default: ETL_PROFILE)')
+
+def resolve_metrics_path(path: Optional[str]) -> Optional[str]:
+    """Expand a metrics directory to the file path of the running script."""
+    if not path:
+        return None
+    if path.endswith(os.sep) or os.path.isdir(path):
+        extension = '.prom' if os.getenv('ETL_METRICS_FORMAT') == 'prometheus' else '.json'
+        return os.path.join(path, f"{script_name()}{extension}")
+    return path
+
+def start_instrumentation(metrics_path: Optional[str] = None, profile: Optional[str] = None):
+    """
+    Start recording for the running script.
+
+    The wall time and peak RSS are recorded and the metrics file written at
+    exit, including exits through sys.exit() on errors. With a profiler, its
+    report is written to .tmp/profiles/<script>.prof (cProfile, for pstats
+    or snakeviz) or .html (pyinstrument).
+
+    Args:
+        metrics_path: Metrics file or directory (default: ETL_METRICS)
+        profile: "cprofile" or "pyinstrument" (default: ETL_PROFILE)
+    """
+    metrics_path = resolve_metrics_path(metrics_path or os.getenv('ETL_METRICS'))
+    profile = profile or os.getenv('ETL_PROFILE')
+
+    profiler = None
+    if profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Warning: pyinstrument is not installed (pip install pyinstrument), profiling disabled", file=sys.stderr)
+        else:
+            profiler = Profiler()
+            profiler.start()
+    elif profile:
+        print(f"Warning: Unknown profiler '{profile}', expected one of {PROFILERS}", file=sys.stderr)
+
+    def finish():
+        if profiler is not None:
+            os.makedirs(os.path.join('.tmp', 'profiles'), exist_ok=True)
+            if profile == 'cprofile':
+                profiler.disable()
+                profile_path = os.path.join('.tmp', 'profiles', f"{script_name()}.prof")
+                profiler.dump_stats(profile_path)
+            else:
+                profiler.stop()
+                profile_path = os.path.join('.tmp', 'profiles', f"{script_name()}.html")
+                with open(profile_path, 'w', encoding='utf-8') as file:
+                    file.write(profiler.output_html())
+            print(f"Profile written to {profile_path}", file=sys.stderr)
+
+        if metrics_path:
+            METRICS.add_time('total', time.perf_counter() - METRICS.start)
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            METRICS.gauge('peak_rss_bytes', peak_rss if sys.platform == 'darwin' else peak_rss * 1024)
+            METRICS.write(metrics_path)
+
+    atexit.register(finish)
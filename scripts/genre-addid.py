@@ -1,31 +1,29 @@
 """Add sequential IDs to genre CSV and save
 """
 
-import csv
 import sys
 
+from etl_metrics import METRICS, start_instrumentation
+from table_stream import assign_ids
+
 if len(sys.argv) != 3:
     print("Usage: python genre-addid.py <input_csv_path> <output_csv_path>")
+    print("Equivalent to: python assign-ids.py --from ',' <input_csv_path> <output_csv_path>")
     sys.exit(1)
-    
+
 input_path = sys.argv[1]
 output_path = sys.argv[2]
 
-with open(input_path, "r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
-    
-    if not rows:
-        print("No data found in the input CSV.")
-        sys.exit(0)
-    
-    fields = ["id"] + reader.fieldnames
-    with open(output_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        for i, row in enumerate(rows, 1):
-            row["id"] = i  # Add sequential ID
-            writer.writerow(row)
-            
-print(f"CSV with IDs written to {output_path}")
+start_instrumentation()  # Configured with ETL_METRICS and ETL_PROFILE
+METRICS.add_file("read", input_path)
+
+row_count = assign_ids(input_path, output_path, from_delim=",", schema="genre", lineterminator="\r\n")
 
+if not row_count:
+    print("No data found in the input CSV.")
+    sys.exit(0)
+
+METRICS.count("rows_written", row_count)
+METRICS.add_file("written", output_path)
+
+print(f"CSV with IDs written to {output_path}")
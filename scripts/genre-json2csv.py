@@ -1,30 +1,35 @@
-import json
-import csv
+import itertools
 import sys
 
+from etl_metrics import METRICS, start_instrumentation
+from ndjson_io import iter_records
+from tabular_io import TableWriter
+
 if len(sys.argv) != 3:
-    print("Usage: python genre-json2csv.py <input_json_path> <output_csv_path>")
+    print("Usage: python genre-json2csv.py <input_ndjson_or_json_path> <output_csv_or_parquet_path>")
     sys.exit(1)
 
 input_path = sys.argv[1]
 output_path = sys.argv[2]
 
-with open(input_path, "r", encoding="utf-8") as f:
-    data = json.load(f)
+start_instrumentation()  # Configured with ETL_METRICS and ETL_PROFILE
+METRICS.add_file("read", input_path)
 
-genres = data.get("genre", [])
+records = iter_records(input_path, "genre")
+first = next(records, None)
 
-if not genres:
+if first is None:
     print("No genres found in the input JSON.")
     sys.exit(0)
 
-fields = [k for k in genres[0].keys() if k != "list_url"]
+fields = [k for k in first.keys() if k != "list_url"]
 
-with open(output_path, "w", encoding="utf-8", newline="") as f:
-    writer = csv.DictWriter(f, fieldnames=fields, delimiter="|")
-    writer.writeheader()
-    for genre in genres:
+with TableWriter(output_path, fields, schema="genre", delimiter="|") as writer:
+    for genre in itertools.chain([first], records):
         row = {k: v for k, v in genre.items() if k in fields}
         writer.writerow(row)
 
-print(f"CSV written to {output_path}")
+METRICS.count("rows_written", writer.rows_written)
+METRICS.add_file("written", output_path)
+
+print(f"Table written to {output_path}")
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Load test the GraphQL endpoint of the Nest service with a query mix built
+from the IDs in data/*.tsv.
+
+The hot path is the videos query (VideoService.findAllConnection), so most
+query shapes exercise its filters and cursor pagination:
+
+    first-page      videos(first: 20)
+    deep-cursor     videos after a cursor in the second half of the id range
+    actress         videos of one actress, picked in proportion to her videos
+    actress-and     videos with all of 2-3 co-stars of one video
+    genre-and       videos with all of 2-3 genres of one video
+    actress-count   videos with exactly n actresses, after a cursor
+    combined        one genre, an actress count and a cursor together
+    actresses-page  actresses after a cursor
+    actress-by-id   actress(id)
+
+Multi-ID filters are taken from one video, so the AND filters return rows
+instead of hitting the empty-result shortcut. Cursors are base64 video or
+actress IDs, as the service encodes them.
+
+Requests are sent open-loop at the target rate: each one is scheduled at
+start + n / rps and its latency is measured from that scheduled time, so a
+slow service shows up as latency instead of a lower send rate. Latency
+percentiles and error rates are reported per query shape.
+
+To run against a local instance with the docker-compose Postgres:
+
+    docker compose up -d db
+    python3 scripts/load-postgres.py
+    npm run build && npm run start:prod
+    python3 scripts/graphql-load.py --rps 50 --duration 60
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+VIDEO_FIELDS = """
+fragment VideoFields on Video {
+  id code dmmId title releaseDate length label
+  actresses { id name }
+  genres { id name }
+  maker { id name }
+  series { id name }
+}
+"""
+
+QUERIES = {
+    'videos': """
+query Videos($options: VideoQueryOptionsInput) {
+  videos(options: $options) {
+    totalCount
+    pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+    edges { cursor node { ...VideoFields } }
+  }
+}
+""" + VIDEO_FIELDS,
+    'actresses': """
+query Actresses($options: ActressQueryOptionsInput) {
+  actresses(options: $options) {
+    totalCount
+    pageInfo { hasNextPage endCursor }
+    edges { cursor node { id name ruby cup height birthday images { url attribute } } }
+  }
+}
+""",
+    'actress': """
+query Actress($id: Int!) {
+  actress(id: $id) { id name dmmId ruby bust cup waist hip height birthday images { url attribute } }
+}
+""",
+}
+
+# Relative weight of each query shape
+DEFAULT_MIX = {
+    'first-page': 2,
+    'deep-cursor': 2,
+    'actress': 3,
+    'actress-and': 2,
+    'genre-and': 2,
+    'actress-count': 1,
+    'combined': 1,
+    'actresses-page': 1,
+    'actress-by-id': 1,
+}
+
+DEFAULT_RPS = 20.0
+DEFAULT_DURATION = 30.0
+DEFAULT_WARMUP = 5.0
+DEFAULT_MAX_IN_FLIGHT = 100
+DEFAULT_PAGE_SIZE = 20
+PERCENTILES = (50, 95, 99)
+
+def default_url() -> str:
+    """GraphQL URL of a local instance, from the PORT and GRAPHQL_PATH variables of the Nest app."""
+    return f"http://localhost:{os.getenv('PORT', '3000')}{os.getenv('GRAPHQL_PATH', '/graphql/v1')}"
+
+def encode_cursor(id: int) -> str:
+    """Encode an ID as a connection cursor, as the Nest services do."""
+    return base64.b64encode(str(id).encode('ascii')).decode('ascii')
+
+def read_column_pairs(path: str, first: str, second: str) -> List[Tuple[int, int]]:
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return [(int(row[first]), int(row[second])) for row in csv.DictReader(file, delimiter='\t')]
+
+def read_ids(path: str) -> List[int]:
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return sorted(int(row['id']) for row in csv.DictReader(file, delimiter='\t'))
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse SHAPE=WEIGHT,... overrides of DEFAULT_MIX; weight 0 disables a shape.
+
+    Raises:
+        ValueError: If a shape is unknown or a value is not SHAPE=WEIGHT
+    """
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (value or '').split(',')):
+        shape, separator, weight = item.partition('=')
+        if not separator or shape not in DEFAULT_MIX:
+            raise ValueError(f"'{item}' is not SHAPE=WEIGHT with a shape of {list(DEFAULT_MIX)}")
+        mix[shape] = float(weight)
+    mix = {shape: weight for shape, weight in mix.items() if weight > 0}
+    if not mix:
+        raise ValueError("every query shape has weight 0")
+    return mix
+
+class QueryPool:
+    """Builds the (query, variables) of each query shape from the dataset IDs."""
+
+    def __init__(self, data_dir: str, seed: Optional[int] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        """
+        Args:
+            data_dir: Directory with video.tsv, actress.tsv and the relation TSVs
+            seed: Random seed, for a repeatable query sequence
+            page_size: first of the paginated queries
+
+        Raises:
+            FileNotFoundError: If a dataset is missing
+        """
+        self.random = random.Random(seed)
+        self.page_size = page_size
+        self.video_ids = read_ids(os.path.join(data_dir, 'video.tsv'))
+        self.actress_ids = read_ids(os.path.join(data_dir, 'actress.tsv'))
+
+        self.video_actresses = defaultdict(list)
+        for video_id, actress_id in read_column_pairs(os.path.join(data_dir, 'video-actresses.tsv'),
+                                                      'video_id', 'actress_id'):
+            self.video_actresses[video_id].append(actress_id)
+        self.video_genres = defaultdict(list)
+        for video_id, genre_id in read_column_pairs(os.path.join(data_dir, 'video-genres.tsv'),
+                                                    'video_id', 'genre_id'):
+            self.video_genres[video_id].append(genre_id)
+
+        # One entry per appearance, so popular actresses are picked more often
+        self.actress_appearances = [actress_id for actress_ids in self.video_actresses.values()
+                                    for actress_id in actress_ids]
+        self.costar_videos = [video_id for video_id, ids in self.video_actresses.items() if len(ids) >= 2]
+        self.multi_genre_videos = [video_id for video_id, ids in self.video_genres.items() if len(ids) >= 2]
+        self.genre_videos = list(self.video_genres)
+        self.actress_counts = [len(self.video_actresses.get(video_id, ())) for video_id in self.video_ids]
+
+        if not self.video_ids or not self.actress_ids or not self.costar_videos or not self.multi_genre_videos:
+            raise ValueError(f"{data_dir} has too few videos, actresses or relations to build the query mix")
+
+    def deep_cursor(self) -> str:
+        """Cursor of a video in the second half of the id range."""
+        return encode_cursor(self.random.choice(self.video_ids[len(self.video_ids) // 2:]))
+
+    def subset(self, ids: List[int]) -> List[str]:
+        return [str(id) for id in self.random.sample(ids, self.random.randint(2, min(3, len(ids))))]
+
+    def videos(self, **options) -> Tuple[str, Dict[str, Any]]:
+        return 'videos', {'options': {'first': self.page_size, **options}}
+
+    def build(self, shape: str) -> Tuple[str, Dict[str, Any]]:
+        """Return the (query name, variables) of one request of a shape."""
+        if shape == 'first-page':
+            return self.videos()
+        if shape == 'deep-cursor':
+            return self.videos(after=self.deep_cursor())
+        if shape == 'actress':
+            return self.videos(actressIds=[str(self.random.choice(self.actress_appearances))])
+        if shape == 'actress-and':
+            return self.videos(actressIds=self.subset(self.video_actresses[self.random.choice(self.costar_videos)]))
+        if shape == 'genre-and':
+            return self.videos(genreIds=self.subset(self.video_genres[self.random.choice(self.multi_genre_videos)]))
+        if shape == 'actress-count':
+            return self.videos(actressCount=self.random.choice(self.actress_counts), after=self.deep_cursor())
+        if shape == 'combined':
+            video_id = self.random.choice(self.genre_videos)
+            return self.videos(genreIds=[str(self.random.choice(self.video_genres[video_id]))],
+                               actressCount=len(self.video_actresses.get(video_id, ())),
+                               after=encode_cursor(self.random.choice(self.video_ids[:len(self.video_ids) // 2])))
+        if shape == 'actresses-page':
+            return 'actresses', {'options': {'first': self.page_size,
+                                             'after': encode_cursor(self.random.choice(self.actress_ids))}}
+        if shape == 'actress-by-id':
+            return 'actress', {'id': self.random.choice(self.actress_ids)}
+        raise ValueError(f"Unknown query shape '{shape}'")
+
+class ShapeStats:
+    """Latencies and errors of one query shape."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        summary = {
+            'requests': self.requests,
+            'errors': sum(self.errors.values()),
+            'error_rate': round(sum(self.errors.values()) / self.requests, 4) if self.requests else 0.0,
+            'error_kinds': dict(self.errors),
+        }
+        for percentile in PERCENTILES:
+            summary[f'p{percentile}_ms'] = round(nearest_rank(latencies, percentile) * 1000, 2) if latencies else None
+        summary['max_ms'] = round(latencies[-1] * 1000, 2) if latencies else None
+        return summary
+
+def nearest_rank(sorted_values: List[float], percentile: float) -> float:
+    index = max(0, -(-len(sorted_values) * percentile // 100) - 1)
+    return sorted_values[int(index)]
+
+async def send(session: aiohttp.ClientSession, url: str, query_name: str, variables: Dict[str, Any],
+               scheduled: float, stats: Optional[ShapeStats], semaphore: asyncio.Semaphore):
+    """Send one request and record its latency from the scheduled time, or its error."""
+    error = None
+    async with semaphore:
+        try:
+            async with session.post(url, json={'query': QUERIES[query_name], 'variables': variables}) as response:
+                body = await response.read()
+                if response.status != 200:
+                    error = f"HTTP {response.status}"
+                else:
+                    errors = json.loads(body).get('errors')
+                    if errors:
+                        error = errors[0].get('extensions', {}).get('code') or 'GRAPHQL_ERROR'
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except (aiohttp.ClientError, ValueError) as e:
+            error = type(e).__name__
+    latency = asyncio.get_running_loop().time() - scheduled
+    if stats is None:
+        return
+    if error:
+        stats.errors[error] += 1
+    else:
+        stats.latencies.append(latency)
+
+async def run_load(url: str, pool: QueryPool, mix: Dict[str, float], rps: float, duration: float, warmup: float,
+                   max_in_flight: int, timeout: float) -> Tuple[Dict[str, ShapeStats], float]:
+    """
+    Send requests open-loop at rps for warmup + duration seconds.
+
+    Returns:
+        Tuple of (stats per shape, measured seconds); requests scheduled
+        during the warmup are not recorded
+    """
+    stats = {shape: ShapeStats() for shape in mix}
+    shapes, weights = list(mix), list(mix.values())
+    semaphore = asyncio.Semaphore(max_in_flight)
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    tasks = set()
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = loop.time()
+        for n in range(int((warmup + duration) * rps)):
+            scheduled = start + n / rps
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            shape = pool.random.choices(shapes, weights)[0]
+            query_name, variables = pool.build(shape)
+            recorded = stats[shape] if n >= warmup * rps else None
+            task = asyncio.create_task(send(session, url, query_name, variables, scheduled, recorded, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    return stats, loop.time() - start - warmup
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the GraphQL video and actress queries at a target request rate.')
+    parser.add_argument('--url', default=default_url(), help='GraphQL endpoint (default: localhost with PORT and GRAPHQL_PATH)')
+    parser.add_argument('--data-dir', default='data', help='Directory with the TSV datasets (default: data)')
+    parser.add_argument('--rps', type=float, default=DEFAULT_RPS, help=f'Target requests per second (default: {DEFAULT_RPS})')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help=f'Measured seconds (default: {DEFAULT_DURATION})')
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP,
+                        help=f'Seconds of unrecorded requests before measuring (default: {DEFAULT_WARMUP})')
+    parser.add_argument('--mix', default=None,
+                        help='Comma-separated SHAPE=WEIGHT overrides of the query mix, 0 disables a shape '
+                             '(default: ' + ','.join(f'{shape}={weight}' for shape, weight in DEFAULT_MIX.items()) + ')')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help=f'first of the paginated queries (default: {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help=f'Maximum concurrent requests; later ones wait and count as latency (default: {DEFAULT_MAX_IN_FLIGHT})')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Request timeout in seconds (default: 30)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable query sequence')
+    parser.add_argument('--output', default=None, help='Also write the results to this JSON path')
+    args = parser.parse_args()
+
+    if args.rps <= 0 or args.duration <= 0 or args.warmup < 0 or args.max_in_flight < 1:
+        parser.error("expected positive --rps, --duration and --max-in-flight and a non-negative --warmup")
+
+    try:
+        mix = parse_mix(args.mix)
+        pool = QueryPool(args.data_dir, args.seed, args.page_size)
+    except FileNotFoundError as e:
+        print(f"Error: Data file '{e.filename}' not found.")
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Sending {args.rps:g} requests/sec to {args.url} for {args.warmup:g}s warmup + {args.duration:g}s...")
+    stats, seconds = asyncio.run(run_load(args.url, pool, mix, args.rps, args.duration, args.warmup,
+                                          args.max_in_flight, args.timeout))
+
+    total = ShapeStats()
+    for shape_stats in stats.values():
+        total.latencies.extend(shape_stats.latencies)
+        total.errors.update(shape_stats.errors)
+    summaries = {shape: shape_stats.summary() for shape, shape_stats in stats.items()}
+    summaries['total'] = total.summary()
+
+    def ms(value: Optional[float]) -> str:
+        return 'n/a' if value is None else f"{value:.1f}"
+
+    print(f"\n{'='*60}")
+    print(f"LOAD TEST RESULTS")
+    print(f"{'='*60}")
+    print(f"{'shape':<16} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for shape, summary in summaries.items():
+        if shape == 'total':
+            print('-' * 60)
+        print(f"{shape:<16} {summary['requests']:>8} {summary['error_rate']:>7.1%} {ms(summary['p50_ms']):>8} "
+              f"{ms(summary['p95_ms']):>8} {ms(summary['p99_ms']):>8} {ms(summary['max_ms']):>8}")
+        if summary['error_kinds']:
+            print(f"    {', '.join(f'{kind}: {count}' for kind, count in summary['error_kinds'].items())}")
+    achieved = summaries['total']['requests'] / seconds if seconds > 0 else 0.0
+    print(f"\nAchieved {achieved:.1f} requests/sec of {args.rps:g} targeted over {seconds:.1f}s")
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'url': args.url,
+            'target_rps': args.rps,
+            'achieved_rps': round(achieved, 2),
+            'duration': args.duration,
+            'mix': mix,
+            'shapes': summaries,
+        }
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
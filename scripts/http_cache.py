@@ -0,0 +1,237 @@
+"""
+On-disk cache of DMM API responses, so development reruns of the fetch
+scripts replay pages instead of spending API quota.
+
+Responses are keyed by their normalized URL: the query parameters sorted
+and the credentials (api_id, affiliate_id) stripped. The API echoes the
+request parameters in every response, so they are stripped from the stored
+bodies as well: no credentials are written to disk and the cache works
+across accounts. Bodies are stored content-addressed under
+objects/<sha256>, so a page refetched after its TTL with unchanged content
+keeps its file. An SQLite index maps each URL to its body, fetch time and
+last access.
+
+Entries expire after a per-endpoint TTL and the least recently used ones
+are evicted once the bodies exceed the size bound. In offline mode every
+request is answered from the cache, expired or not, and a miss is an error.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+from etl_metrics import METRICS
+
+# Query parameters left out of the cache key
+CREDENTIAL_PARAMS = ('api_id', 'affiliate_id')
+
+DAY = 24 * 60 * 60
+
+# Seconds before a cached response of an endpoint is refetched
+DEFAULT_TTLS = {
+    'ItemList': DAY,
+    'ActressSearch': 7 * DAY,
+    'MakerSearch': 7 * DAY,
+    'SeriesSearch': 7 * DAY,
+    'AuthorSearch': 7 * DAY,
+    'GenreSearch': 30 * DAY,
+    'FloorList': 30 * DAY,
+}
+DEFAULT_TTL = DAY
+
+DEFAULT_MAX_SIZE_MB = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+def normalize_url(url: str, params: Dict[str, Any]) -> str:
+    """
+    Return the cache URL of a request: lowercase scheme and host, no
+    trailing slash, credentials removed and the query sorted.
+    """
+    parts = urlsplit(url)
+    query = sorted((key, str(value)) for key, value in params.items() if key not in CREDENTIAL_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), urlencode(query), ''))
+
+def strip_credentials(body: bytes) -> bytes:
+    """Remove the credentials from the request parameters echoed in a JSON response."""
+    payload = json.loads(body)
+    parameters = payload.get('request', {}).get('parameters')
+    if not isinstance(parameters, dict) or not any(key in parameters for key in CREDENTIAL_PARAMS):
+        return body
+    for key in CREDENTIAL_PARAMS:
+        parameters.pop(key, None)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def parse_ttls(values: Iterable[str]) -> Dict[str, float]:
+    """
+    Parse ENDPOINT=SECONDS overrides into a TTL dictionary.
+
+    Raises:
+        ValueError: If a value is not ENDPOINT=SECONDS
+    """
+    ttls = dict(DEFAULT_TTLS)
+    for value in values:
+        endpoint, separator, seconds = value.partition('=')
+        if not separator or not endpoint:
+            raise ValueError(f"TTL '{value}' is not ENDPOINT=SECONDS")
+        ttls[endpoint] = float(seconds)
+    return ttls
+
+class ResponseCache:
+    """Content-addressed response store with per-endpoint TTLs and LRU eviction."""
+
+    def __init__(self, directory: str, ttls: Optional[Dict[str, float]] = None,
+                 max_size: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024, offline: bool = False):
+        """
+        Args:
+            directory: Cache directory, created if missing
+            ttls: Seconds to keep the responses of each endpoint (default: DEFAULT_TTLS)
+            max_size: Bytes of response bodies kept before evicting
+            offline: Serve expired entries and never expect a network fetch
+        """
+        self.directory = directory
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_size = max_size
+        self.offline = offline
+
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        # One connection shared by the fetch threads; SQLite locks across processes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), timeout=30, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self.size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+        # Apply a lowered max_size right away
+        self._evict()
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def ttl(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest[2:])
+
+    def get(self, endpoint: str, url: str) -> Optional[bytes]:
+        """
+        Return the cached body of a normalized URL, or None when it is
+        missing or, unless offline, expired.
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT digest, fetched_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                METRICS.count('cache_requests', endpoint=endpoint, result='miss')
+                return None
+            digest, fetched_at = row
+            if not self.offline and now - fetched_at > self.ttl(endpoint):
+                METRICS.count('cache_requests', endpoint=endpoint, result='expired')
+                return None
+            try:
+                with open(self._object_path(digest), 'rb') as file:
+                    body = file.read()
+            except FileNotFoundError:
+                METRICS.count('cache_requests', endpoint=endpoint, result='miss')
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        METRICS.count('cache_requests', endpoint=endpoint, result='hit')
+        return body
+
+    def put(self, endpoint: str, url: str, body: bytes):
+        """Store the body of a normalized URL and evict down to the size bound."""
+        body = strip_credentials(body)
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        path = self._object_path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(f"{path}.tmp", 'wb') as file:
+                    file.write(body)
+                os.replace(f"{path}.tmp", path)
+            if self._db.execute("INSERT OR IGNORE INTO bodies (digest, size) VALUES (?, ?)",
+                                (digest, len(body))).rowcount:
+                self.size += len(body)
+            previous = self._db.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO entries (key, endpoint, url, digest, fetched_at, accessed_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", (key, endpoint, url, digest, now, now))
+            if previous and previous[0] != digest:
+                self._drop_unreferenced(previous[0])
+            self._evict()
+            self._db.commit()
+
+    def _drop_unreferenced(self, digest: str):
+        if self._db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        row = self._db.execute("SELECT size FROM bodies WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+        self.size -= row[0]
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Remove the least recently used entries until the bodies fit max_size."""
+        while self.size > self.max_size:
+            oldest = self._db.execute("SELECT key, digest FROM entries ORDER BY accessed_at LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, digest in oldest:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._drop_unreferenced(digest)
+                METRICS.count('cache_evictions')
+                if self.size <= self.max_size:
+                    break
+
+def add_cache_arguments(parser):
+    """Add the response cache options to an argument parser."""
+    parser.add_argument('--cache-dir', default=os.getenv('DMM_CACHE_DIR'),
+                        help='Cache API responses in this directory (default: DMM_CACHE_DIR, or no cache)')
+    parser.add_argument('--cache-ttl', action='append', default=[], metavar='ENDPOINT=SECONDS',
+                        help='Override the cache TTL of an endpoint, may be repeated (default: 1 day for ItemList, '
+                             '7 days for the search endpoints)')
+    parser.add_argument('--cache-max-size', type=int, default=DEFAULT_MAX_SIZE_MB,
+                        help=f'Cache size in MB before the least recently used responses are evicted '
+                             f'(default: {DEFAULT_MAX_SIZE_MB})')
+    parser.add_argument('--offline', action='store_true',
+                        help='Answer every request from the cache and fail on a miss')
+
+def cache_from_args(args) -> Optional[ResponseCache]:
+    """
+    Open the response cache configured by add_cache_arguments, or return None.
+
+    Raises:
+        ValueError: If the options are invalid
+    """
+    if not args.cache_dir:
+        if args.offline:
+            raise ValueError("--offline needs a --cache-dir (or DMM_CACHE_DIR)")
+        return None
+    return ResponseCache(args.cache_dir, parse_ttls(args.cache_ttl), args.cache_max_size * 1024 * 1024, args.offline)
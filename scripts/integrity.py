@@ -0,0 +1,220 @@
+"""
+Referential-integrity and duplicate checks for the data/*.tsv datasets.
+
+Mirrors the constraints of the TypeORM migrations, so a dataset that passes
+loads without the primary key, unique or foreign key constraints rejecting
+it halfway through. Each dataset is read once, with only the columns the
+checks need and integer dtypes for the ID columns. Foreign keys are checked
+against a boolean bitmap indexed by the parent IDs, and duplicate keys by
+sorting the (packed) key array and comparing neighbors.
+"""
+
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Dataset -> data file, as in load-postgres.py
+DATASET_FILES = {
+    'actress': 'actress.tsv',
+    'genre': 'genre.tsv',
+    'maker': 'maker.tsv',
+    'series': 'series.tsv',
+    'video': 'video.tsv',
+    'video-actresses': 'video-actresses.tsv',
+    'video-genres': 'video-genres.tsv',
+}
+
+# Datasets whose data file may be missing (data/ has no series.tsv yet)
+OPTIONAL_DATASETS = {'series'}
+
+# Dataset -> key columns that must be unique and not null
+PRIMARY_KEYS: Dict[str, Tuple[str, ...]] = {
+    'actress': ('id',),
+    'genre': ('id',),
+    'maker': ('id',),
+    'series': ('id',),
+    'video': ('id',),
+    'video-actresses': ('video_id', 'actress_id'),
+    'video-genres': ('video_id', 'genre_id'),
+}
+
+# Dataset -> columns that must be unique where not null
+UNIQUE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'genre': ('dmm_id',),
+    'maker': ('dmm_id',),
+    'series': ('dmm_id',),
+    'video': ('code', 'dmm_id'),
+}
+
+# (dataset, column, referenced dataset); the referenced column is always id
+FOREIGN_KEYS: List[Tuple[str, str, str]] = [
+    ('video', 'maker_id', 'maker'),
+    ('video', 'series_id', 'series'),
+    ('video-actresses', 'video_id', 'video'),
+    ('video-actresses', 'actress_id', 'actress'),
+    ('video-genres', 'video_id', 'video'),
+    ('video-genres', 'genre_id', 'genre'),
+]
+
+class Violation(NamedTuple):
+    """One row that breaks a constraint."""
+    check: str
+    dataset: str
+    column: str
+    line: int
+    value: str
+
+class CheckResult(NamedTuple):
+    """Outcome of one constraint check; skipped gives the reason it was not run."""
+    check: str
+    dataset: str
+    column: str
+    rows: int
+    violations: List[Violation]
+    skipped: str = ''
+
+def required_columns(dataset: str) -> List[str]:
+    """Columns of a dataset that the checks read."""
+    columns = list(PRIMARY_KEYS.get(dataset, ())) + list(UNIQUE_COLUMNS.get(dataset, ()))
+    columns += [column for child, column, _ in FOREIGN_KEYS if child == dataset]
+    return list(dict.fromkeys(columns))
+
+def read_columns(path: str, dataset: str):
+    """Read the checked columns of a dataset, ignoring the ones the file lacks."""
+    from dataset_schema import read_dataset
+    wanted = set(required_columns(dataset))
+    return read_dataset(path, dataset, usecols=lambda column: column in wanted)
+
+def line_numbers(rows: np.ndarray) -> np.ndarray:
+    """File line numbers of 0-based data rows, counting the header as line 1."""
+    return rows + 2
+
+def id_array(frame, column: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split a nullable integer column into its values and a null mask.
+
+    Returns:
+        Tuple of (int64 values with nulls as -1, null mask)
+    """
+    series = frame[column]
+    nulls = series.isna().to_numpy()
+    return series.fillna(-1).to_numpy(dtype=np.int64), nulls
+
+def duplicate_rows(keys: np.ndarray) -> np.ndarray:
+    """Return the row positions of every repeat of a key after its first occurrence."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    repeats = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1]) + 1
+    return np.sort(order[repeats])
+
+def check_primary_key(dataset: str, frame, columns: Tuple[str, ...]) -> CheckResult:
+    """Check that the key columns are not null and their combination is unique."""
+    arrays = [id_array(frame, column) for column in columns]
+    null_rows = np.flatnonzero(np.logical_or.reduce([nulls for _, nulls in arrays]))
+
+    if len(arrays) == 1:
+        keys = arrays[0][0]
+    else:
+        # Pack the pair into one int64 so uniqueness is a single sort
+        keys = (arrays[0][0] << 32) | (arrays[1][0] & 0xFFFFFFFF)
+    valid = np.flatnonzero(~np.logical_or.reduce([nulls for _, nulls in arrays]))
+    duplicates = valid[duplicate_rows(keys[valid])]
+
+    column_label = ','.join(columns)
+    violations = [Violation('not_null', dataset, column_label, int(line), '') for line in line_numbers(null_rows)]
+    violations += [
+        Violation('primary_key', dataset, column_label, int(line),
+                  ','.join(str(int(values[row])) for values, _ in arrays))
+        for row, line in zip(duplicates, line_numbers(duplicates))
+    ]
+    return CheckResult('primary_key', dataset, column_label, len(frame), violations)
+
+def check_unique(dataset: str, frame, column: str) -> Optional[CheckResult]:
+    """Check that the non-null values of a column are unique, or None if the file lacks it."""
+    if column not in frame.columns:
+        return None
+    series = frame[column]
+    present = np.flatnonzero(series.notna().to_numpy())
+    duplicated = present[series.iloc[present].duplicated().to_numpy()]
+    values = series.to_numpy(dtype=object)
+    violations = [Violation('unique', dataset, column, int(line), str(values[row]))
+                  for row, line in zip(duplicated, line_numbers(duplicated))]
+    return CheckResult('unique', dataset, column, len(frame), violations)
+
+def id_bitmap(ids: np.ndarray) -> np.ndarray:
+    """Boolean array with True at every ID in ids."""
+    bitmap = np.zeros(int(ids.max()) + 1 if len(ids) else 0, dtype=bool)
+    bitmap[ids[ids >= 0]] = True
+    return bitmap
+
+def check_foreign_key(dataset: str, frame, column: str, parent: str, bitmap: np.ndarray) -> Optional[CheckResult]:
+    """
+    Check that every value of a column is an ID of the parent dataset.
+
+    Nulls pass, as in Postgres; key columns get their not-null check from
+    check_primary_key.
+    """
+    if column not in frame.columns:
+        return None
+    values, nulls = id_array(frame, column)
+    in_range = (values >= 0) & (values < len(bitmap))
+    found = np.zeros(len(values), dtype=bool)
+    found[in_range] = bitmap[values[in_range]]
+    missing = np.flatnonzero(~found & ~nulls)
+
+    violations = [Violation(f'foreign_key:{parent}', dataset, column, int(line), str(int(values[row])))
+                  for row, line in zip(missing, line_numbers(missing))]
+    return CheckResult(f'foreign_key:{parent}', dataset, column, len(frame), violations)
+
+def check_datasets(data_dir: str) -> Tuple[List[CheckResult], List[str]]:
+    """
+    Run every check on the datasets of a directory.
+
+    Args:
+        data_dir: Directory with the TSV datasets
+
+    Returns:
+        Tuple of (check results, notes about skipped checks)
+
+    Raises:
+        FileNotFoundError: If a required data file is missing
+    """
+    frames = {}
+    notes = []
+    for dataset, filename in DATASET_FILES.items():
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            if dataset in OPTIONAL_DATASETS:
+                notes.append(f"{path} not found, {dataset} and the foreign keys to it are not checked")
+                continue
+            raise FileNotFoundError(2, 'No such file', path)
+        frames[dataset] = read_columns(path, dataset)
+
+    results = []
+    for dataset, columns in PRIMARY_KEYS.items():
+        if dataset in frames:
+            results.append(check_primary_key(dataset, frames[dataset], columns))
+
+    for dataset, columns in UNIQUE_COLUMNS.items():
+        for column in columns:
+            result = check_unique(dataset, frames[dataset], column) if dataset in frames else None
+            if result is not None:
+                results.append(result)
+
+    bitmaps = {}
+    for dataset, column, parent in FOREIGN_KEYS:
+        if parent not in frames:
+            # Without its file an optional parent is not loaded, so its IDs are unknown
+            results.append(CheckResult(f'foreign_key:{parent}', dataset, column, len(frames[dataset]), [],
+                                       skipped=f"{DATASET_FILES[parent]} missing"))
+            continue
+        if parent not in bitmaps:
+            bitmaps[parent] = id_bitmap(id_array(frames[parent], 'id')[0])
+        result = check_foreign_key(dataset, frames[dataset], column, parent, bitmaps[parent])
+        if result is None:
+            notes.append(f"{dataset} has no {column} column, foreign key to {parent} not checked")
+        else:
+            results.append(result)
+
+    return results, notes
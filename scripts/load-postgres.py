@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Bulk load the data/*.tsv datasets into the TypeORM-managed Postgres tables
+with COPY FROM STDIN.
+
+Tables are loaded in dependency order inside a single transaction. Foreign
+keys and secondary indexes on the loaded tables are dropped before the load
+and recreated afterwards, and the id sequences are moved past the loaded IDs
+so the Nest service can keep inserting rows.
+
+Connection settings are read from the same DB_* environment variables as
+the Nest app (see .env.example).
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import psycopg2
+from psycopg2 import sql
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from integrity import check_datasets
+
+# (table, data file, has serial id) in dependency order
+LOAD_ORDER = [
+    ('actress', 'actress.tsv', True),
+    ('genre', 'genre.tsv', True),
+    ('maker', 'maker.tsv', True),
+    ('series', 'series.tsv', True),
+    ('video', 'video.tsv', True),
+    ('video_actresses', 'video-actresses.tsv', False),
+    ('video_genres', 'video-genres.tsv', False),
+]
+
+# Tables whose data file may be missing (data/ has no series.tsv yet)
+OPTIONAL_TABLES = {'series'}
+
+COPY_BUFFER_SIZE = 1 << 20
+
+def connect():
+    """Connect to Postgres using the DB_* environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', '55432')),
+        user=os.getenv('DB_USERNAME', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres'),
+        dbname=os.getenv('DB_NAME', 'javdb'),
+    )
+
+class CopyInputStream:
+    """
+    File-like object that streams a TSV file as COPY input.
+
+    Rows with trailing fields left out (as in data/actress.tsv) are padded
+    with empty fields up to the header width, since COPY rejects short rows.
+    """
+
+    def __init__(self, file, width: int):
+        self.rows = csv.reader(file, delimiter='\t')
+        self.width = width
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, delimiter='\t', lineterminator='\n')
+        self.pending = ''
+        self.exhausted = False
+
+    def read(self, size: int = -1) -> str:
+        while not self.exhausted and (size < 0 or len(self.pending) < size):
+            rows = list(itertools.islice(self.rows, 1000))
+            if not rows:
+                self.exhausted = True
+                break
+            self.writer.writerows(row + [''] * (self.width - len(row)) for row in rows)
+            self.pending += self.buffer.getvalue()
+            self.buffer.seek(0)
+            self.buffer.truncate()
+
+        if size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+def drop_foreign_keys(cursor, tables: List[str]) -> List[Tuple[str, str, str]]:
+    """
+    Drop every foreign key on or referencing the given tables.
+
+    Returns:
+        List of (table, constraint name, constraint definition) to recreate
+    """
+    cursor.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f'
+          AND (conrelid::regclass::text = ANY(%s) OR confrelid::regclass::text = ANY(%s))
+        ORDER BY conname
+    """, (tables, tables))
+    foreign_keys = cursor.fetchall()
+
+    for table, name, _ in foreign_keys:
+        cursor.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.SQL(table), sql.Identifier(name)))
+
+    return foreign_keys
+
+def drop_indexes(cursor, tables: List[str]) -> List[Tuple[str, str]]:
+    """
+    Drop the secondary indexes of the given tables.
+
+    Indexes that back a primary key or unique constraint are kept.
+
+    Returns:
+        List of (index name, index definition) to recreate
+    """
+    cursor.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index AS i
+        WHERE i.indrelid::regclass::text = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint AS c WHERE c.conindid = i.indexrelid)
+        ORDER BY 1
+    """, (tables,))
+    indexes = cursor.fetchall()
+
+    for name, _ in indexes:
+        cursor.execute(sql.SQL("DROP INDEX {}").format(sql.SQL(name)))
+
+    return indexes
+
+def copy_table(cursor, table: str, path: str) -> Tuple[int, float]:
+    """
+    Stream a TSV file into a table with COPY FROM STDIN.
+
+    Empty fields are loaded as NULL.
+
+    Returns:
+        Tuple of (rows loaded, seconds taken)
+    """
+    start = time.perf_counter()
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        columns = next(csv.reader([file.readline()], delimiter='\t'))
+        statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t')").format(
+            sql.Identifier(table),
+            sql.SQL(', ').join(sql.Identifier(column) for column in columns),
+        )
+        cursor.copy_expert(statement.as_string(cursor), CopyInputStream(file, len(columns)), size=COPY_BUFFER_SIZE)
+    return cursor.rowcount, time.perf_counter() - start
+
+def reset_sequence(cursor, table: str):
+    """Move the id sequence of a table past its highest loaded ID."""
+    cursor.execute(sql.SQL(
+        "SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {}"
+    ).format(sql.Identifier(table)), (table,))
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk load data/*.tsv into Postgres with COPY.')
+    parser.add_argument('--data-dir', default='data', help='Directory with the TSV datasets (default: data)')
+    parser.add_argument('--no-truncate', action='store_true',
+                        help='Append to the tables instead of replacing their contents')
+    parser.add_argument('--check', action='store_true',
+                        help='Check foreign keys and duplicate keys first (see check-integrity.py) and abort on violations')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    tables: List[Tuple[str, str, bool]] = []
+    for table, filename, has_serial_id in LOAD_ORDER:
+        path = os.path.join(args.data_dir, filename)
+        if os.path.exists(path):
+            tables.append((table, path, has_serial_id))
+        elif table not in OPTIONAL_TABLES:
+            print(f"Error: Data file '{path}' not found.")
+            sys.exit(1)
+
+    if args.check:
+        print("Checking dataset integrity...")
+        with METRICS.timer('check'):
+            results, _ = check_datasets(args.data_dir)
+        for result in results:
+            if result.skipped:
+                print(f"{result.dataset}.{result.column}: {result.check} skipped ({result.skipped})")
+        failed = [result for result in results if result.violations]
+        for result in failed:
+            print(f"{result.dataset}.{result.column}: {len(result.violations)} {result.check} violations "
+                  f"(first at line {min(violation.line for violation in result.violations)})")
+        if failed:
+            print("Error: Datasets violate the table constraints, run check-integrity.py for the full report.")
+            sys.exit(1)
+
+    table_names = [table for table, _, _ in tables]
+    stats: Dict[str, Tuple[int, float]] = {}
+
+    try:
+        connection = connect()
+    except psycopg2.Error as e:
+        print(f"Error connecting to Postgres: {e}")
+        sys.exit(1)
+
+    total_start = time.perf_counter()
+    try:
+        with connection:
+            with connection.cursor() as cursor:
+                print("Dropping foreign keys and indexes...")
+                foreign_keys = drop_foreign_keys(cursor, table_names)
+                indexes = drop_indexes(cursor, table_names)
+                print(f"Dropped {len(foreign_keys)} foreign keys and {len(indexes)} indexes")
+
+                if not args.no_truncate:
+                    cursor.execute(sql.SQL("TRUNCATE {}").format(
+                        sql.SQL(', ').join(sql.Identifier(table) for table in table_names)
+                    ))
+
+                for table, path, has_serial_id in tables:
+                    print(f"Loading {table} from {path}...")
+                    rows, seconds = copy_table(cursor, table, path)
+                    stats[table] = (rows, seconds)
+                    METRICS.add_time('copy', seconds, table=table)
+                    METRICS.count('rows_loaded', rows, table=table)
+                    METRICS.add_file('read', path)
+                    if has_serial_id:
+                        reset_sequence(cursor, table)
+                    print(f"Loaded {rows} rows into {table} in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)")
+
+                print("Rebuilding indexes...")
+                with METRICS.timer('rebuild_indexes'):
+                    for _, definition in indexes:
+                        cursor.execute(definition)
+
+                print("Rebuilding foreign keys...")
+                with METRICS.timer('rebuild_foreign_keys'):
+                    for table, name, definition in foreign_keys:
+                        cursor.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+                            sql.SQL(table), sql.Identifier(name), sql.SQL(definition)
+                        ))
+
+        # ANALYZE after commit so the planner sees the new table statistics
+        connection.autocommit = True
+        with connection.cursor() as cursor, METRICS.timer('analyze'):
+            for table in table_names:
+                cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+
+    except psycopg2.Error as e:
+        print(f"Error loading data, transaction rolled back: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    total_seconds = time.perf_counter() - total_start
+    total_rows = sum(rows for rows, _ in stats.values())
+
+    print(f"\n{'='*60}")
+    print(f"LOAD RESULTS")
+    print(f"{'='*60}")
+    for table, (rows, seconds) in stats.items():
+        print(f"{table:<16} {rows:>8} rows {seconds:>8.2f}s {rows / max(seconds, 1e-9):>12,.0f} rows/sec")
+    print(f"Total: {total_rows} rows in {total_seconds:.2f}s")
+
+if __name__ == '__main__':
+    main()
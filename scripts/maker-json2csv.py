@@ -1,31 +1,36 @@
-import json
-import csv
+import itertools
 import sys
 
+from etl_metrics import METRICS, start_instrumentation
+from ndjson_io import iter_records
+from tabular_io import TableWriter
+
 if len(sys.argv) != 3:
-    print("Usage: python maker-json2csv.py <input_json_path> <output_csv_path>")
+    print("Usage: python maker-json2csv.py <input_ndjson_or_json_path> <output_csv_or_parquet_path>")
     sys.exit(1)
 
 input_path = sys.argv[1]
 output_path = sys.argv[2]
 
-with open(input_path, "r", encoding="utf-8") as f:
-    data = json.load(f)
+start_instrumentation()  # Configured with ETL_METRICS and ETL_PROFILE
+METRICS.add_file("read", input_path)
 
-makers = data.get("maker", [])
+records = iter_records(input_path, "maker")
+first = next(records, None)
 
-if not makers:
+if first is None:
     print("No makers found in the input JSON.")
     sys.exit(0)
 
-fields = ["id"] + [k for k in makers[0].keys() if k != "list_url"]
+fields = ["id"] + [k for k in first.keys() if k != "list_url"]
 
-with open(output_path, "w", encoding="utf-8", newline="") as f:
-    writer = csv.DictWriter(f, fieldnames=fields)
-    writer.writeheader()
-    for i, maker in enumerate(makers, 1):
+with TableWriter(output_path, fields, schema="maker") as writer:
+    for i, maker in enumerate(itertools.chain([first], records), 1):
         row = {k: v for k, v in maker.items() if k in fields[1:]}  # Skip 'id' from original data
         row["id"] = i  # Add sequential ID
         writer.writerow(row)
 
-print(f"CSV written to {output_path}")
+METRICS.count("rows_written", writer.rows_written)
+METRICS.add_file("written", output_path)
+
+print(f"Table written to {output_path}")
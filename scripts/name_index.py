@@ -0,0 +1,131 @@
+"""
+Character n-gram index for finding the known names closest to an
+unresolved name.
+
+Names are normalized (NFKC, casefolded, katakana folded to hiragana,
+whitespace removed) and split into overlapping character n-grams with
+boundary markers, which works for kana and kanji as well as latin names
+without a tokenizer. The inverted index maps each n-gram to the names that
+contain it, so a query only touches names that share at least one n-gram
+with it instead of comparing against every known name.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set
+
+DEFAULT_NGRAM = 2
+
+WHITESPACE = re.compile(r'\s+')
+
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+class Candidate(NamedTuple):
+    """A known item suggested for an unresolved name."""
+    item_id: int
+    name: str
+    field: str
+    score: float
+
+def normalize_name(name: str) -> str:
+    """Normalize a name for matching, e.g. "ハタノ ユイ" and "はたのゆい" become equal."""
+    name = unicodedata.normalize('NFKC', name).casefold()
+    name = name.translate(KATAKANA_TO_HIRAGANA)
+    return WHITESPACE.sub('', name)
+
+def name_ngrams(name: str, n: int = DEFAULT_NGRAM) -> Set[str]:
+    """Return the set of character n-grams of a normalized name, with boundary markers."""
+    padded = f"\x02{name}\x03"
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class NgramIndex:
+    """
+    Inverted n-gram index over the known names of one entity type.
+
+    Every name variant of an item (name, ruby, display_name, ...) is indexed
+    separately and the best scoring variant represents the item. Scores are
+    the Dice coefficient of the n-gram sets, from 0 to 1.
+    """
+
+    def __init__(self, n: int = DEFAULT_NGRAM):
+        """
+        Args:
+            n: N-gram length; 2 suits short Japanese names
+        """
+        self.n = n
+        self.entries: List[tuple] = []  # (item_id, name, field, n-gram count)
+        self.postings: Dict[str, List[int]] = {}
+        self.canonical_names: Dict[int, str] = {}
+        self._seen: Set[tuple] = set()
+
+    def add(self, item_id: int, name: str, field: str = 'name'):
+        """
+        Index one name variant of an item.
+
+        The first "name" field added for an item becomes its canonical name.
+
+        Args:
+            item_id: ID of the item
+            name: Name variant as written in the source table
+            field: Source column of the variant, e.g. "ruby"
+        """
+        name = name.strip()
+        normalized = normalize_name(name)
+        if not normalized or (item_id, normalized) in self._seen:
+            return
+        self._seen.add((item_id, normalized))
+
+        if field == 'name':
+            self.canonical_names.setdefault(item_id, name)
+
+        grams = name_ngrams(normalized, self.n)
+        entry = len(self.entries)
+        self.entries.append((item_id, name, field, len(grams)))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, name: str, top_k: int = 5, min_score: float = 0.0) -> List[Candidate]:
+        """
+        Find the items whose names are closest to a name.
+
+        Args:
+            name: Unresolved name
+            top_k: Maximum number of items to return
+            min_score: Minimum Dice score of a returned item
+
+        Returns:
+            Candidates ordered by descending score, one per item
+        """
+        grams = name_ngrams(normalize_name(name), self.n)
+        if not grams:
+            return []
+
+        # Count shared n-grams per indexed name from the postings lists
+        overlaps = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings:
+                overlaps.update(postings)
+
+        best: Dict[int, Candidate] = {}
+        query_size = len(grams)
+        for entry, shared in overlaps.items():
+            item_id, entry_name, field, entry_size = self.entries[entry]
+            score = 2.0 * shared / (query_size + entry_size)
+            if score < min_score:
+                continue
+            current = best.get(item_id)
+            if current is None or score > current.score:
+                best[item_id] = Candidate(item_id, entry_name, field, score)
+
+        return sorted(best.values(), key=lambda candidate: (-candidate.score, candidate.item_id))[:top_k]
+
+    def canonical_name(self, item_id: int) -> Optional[str]:
+        """Return the canonical name of an item, as used in the alias tables."""
+        return self.canonical_names.get(item_id)
@@ -0,0 +1,138 @@
+"""
+Newline-delimited JSON (NDJSON) output for the fetchers, with a checkpoint
+of the last completed page so an interrupted fetch can be resumed, and a
+streaming reader for the *-json2csv.py converters.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, List
+
+def has_interrupted_fetch(output_path: str) -> bool:
+    """Whether an NDJSON output has the checkpoint of a fetch that did not finish."""
+    checkpoint_path = f"{output_path}.checkpoint"
+    if not os.path.exists(checkpoint_path) or not os.path.exists(output_path):
+        return False
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return not json.load(f).get("complete", False)
+    except ValueError:
+        return False
+
+class NdjsonCheckpointWriter:
+    """
+    Append fetched pages to an NDJSON file and checkpoint after every page.
+
+    The checkpoint is stored next to the output as <output_path>.checkpoint
+    and records the next offset to fetch and the output size at that point.
+    On resume the output is truncated back to that size, so a page that was
+    only partly written before a crash is fetched and written again.
+    """
+
+    def __init__(self, output_path: str, hits: int, resume: bool = False):
+        """
+        Args:
+            output_path: Path to the NDJSON output file
+            hits: Page size, which must match the checkpoint when resuming
+            resume: Whether to continue from an existing checkpoint
+        """
+        self.output_path = output_path
+        self.checkpoint_path = f"{output_path}.checkpoint"
+        self.state: Dict[str, Any] = {"hits": hits, "next_offset": 1, "bytes": 0, "records": 0, "complete": False}
+
+        if resume and os.path.exists(self.checkpoint_path) and os.path.exists(output_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("hits") != hits:
+                raise ValueError(f"Checkpoint was written with hits={state.get('hits')}, not hits={hits}")
+            self.state = state
+            self.file = open(output_path, "r+b")
+            self.file.truncate(self.state["bytes"])
+            self.file.seek(self.state["bytes"])
+        else:
+            self.file = open(output_path, "wb")
+            self._save_checkpoint()
+
+    @property
+    def next_offset(self) -> int:
+        """1-based offset of the next page to fetch."""
+        return self.state["next_offset"]
+
+    @property
+    def records(self) -> int:
+        """Number of records written so far, including earlier runs."""
+        return self.state["records"]
+
+    @property
+    def complete(self) -> bool:
+        """Whether the fetch already finished."""
+        return self.state["complete"]
+
+    def _save_checkpoint(self):
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def write_page(self, offset: int, items: List[Dict[str, Any]]):
+        """
+        Write one page of records and checkpoint the offset after it.
+
+        Args:
+            offset: 1-based offset of the page
+            items: Records of the page
+        """
+        self.file.write(b"".join(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n" for item in items))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        self.state["next_offset"] = offset + self.state["hits"]
+        self.state["bytes"] = self.file.tell()
+        self.state["records"] += len(items)
+        self._save_checkpoint()
+
+    def finish(self):
+        """Mark the fetch as complete and close the output file."""
+        self.state["complete"] = True
+        self._save_checkpoint()
+        self.close()
+
+    def close(self):
+        """Close the output file without marking the fetch complete."""
+        self.file.close()
+
+def iter_records(input_path: str, key: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the records of a fetcher output file.
+
+    NDJSON files are streamed one line at a time. Legacy JSON files of the
+    form {"<key>": [...]} are still accepted, but are loaded whole.
+
+    Args:
+        input_path: Path to the NDJSON or JSON file
+        key: Key of the record list in legacy JSON files, e.g. "maker"
+
+    Yields:
+        One record dictionary at a time
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        first_line = f.readline()
+        if not first_line.strip():
+            return
+
+        try:
+            first = json.loads(first_line)
+        except ValueError:
+            first = None
+
+        if isinstance(first, dict) and not isinstance(first.get(key), list):
+            yield first
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        f.seek(0)
+        data = json.load(f)
+
+    yield from data.get(key, [])
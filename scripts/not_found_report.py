@@ -0,0 +1,227 @@
+"""
+Bounded-memory tracking of the names that video-actress-relation.py could
+not resolve.
+
+By default every video of every unresolved name is kept, as the not-found
+TSVs have always listed them. With a sample size the tracker instead keeps,
+per name, an exact occurrence count and a fixed-size sample of its videos,
+and caps the number of names it tracks. A Space-Saving sketch follows the
+heaviest offenders over all occurrences, including those of names past the
+cap, so memory stays flat however noisy the scrape is.
+
+The video sample is a bottom-k sample: each (name, video) pair gets a CRC32
+key and the k smallest keys are kept. That is a uniform sample for a well
+mixed hash, it does not depend on the order rows arrive in, and two samples
+merge by keeping the k smallest keys of both, so sharded runs report the
+same videos as serial ones.
+"""
+
+import heapq
+import itertools
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_NAMES = 100000
+
+DEFAULT_TOP_K = 20
+
+# Space-Saving counters per reported heavy hitter
+SKETCH_FACTOR = 10
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter sketch (Metwally et al.) over a fixed number of counters.
+
+    Every item with a true count above total / capacity is tracked, and each
+    count overestimates the true count by at most its error.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = {}  # item -> [count, error]
+        self.heap: List[Tuple[int, str]] = []     # (count, item), refreshed lazily
+
+    def add(self, item: str, count: int = 1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+            heapq.heappush(self.heap, (count, item))
+            return
+
+        # Evict the smallest counter; heap entries of grown counters are stale
+        while True:
+            minimum, evicted = heapq.heappop(self.heap)
+            current = self.counters[evicted][0]
+            if current == minimum:
+                break
+            heapq.heappush(self.heap, (current, evicted))
+        del self.counters[evicted]
+        self.counters[item] = [minimum + count, minimum]
+        heapq.heappush(self.heap, (minimum + count, item))
+
+    def minimum(self) -> int:
+        """Upper bound on the count of an untracked item: the smallest counter once full, else 0."""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other: 'SpaceSaving'):
+        """
+        Add another sketch's counters and keep the largest (Agarwal et al.).
+
+        An item that only one sketch tracks may have been evicted from the
+        other, so it gets the other sketch's minimum added to both its count
+        and its error, which keeps every count an overestimate.
+        """
+        own_minimum, other_minimum = self.minimum(), other.minimum()
+        merged = {}
+        for item in itertools.chain(self.counters, (item for item in other.counters if item not in self.counters)):
+            count, error = self.counters.get(item, (own_minimum, own_minimum))
+            other_count, other_error = other.counters.get(item, (other_minimum, other_minimum))
+            merged[item] = [count + other_count, error + other_error]
+        self.counters = merged
+        if len(self.counters) > self.capacity:
+            kept = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))[:self.capacity]
+            self.counters = dict(kept)
+        self.heap = [(count, item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self.heap)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """Return the k largest (item, count, error) counters."""
+        return sorted(((item, count, error) for item, (count, error) in self.counters.items()),
+                      key=lambda entry: (-entry[1], entry[0]))[:k]
+
+def sample_key(name: str, video: str) -> int:
+    return zlib.crc32(f"{name}\t{video}".encode('utf-8'))
+
+class NotFoundTracker:
+    """
+    Unresolved names of one relation type and the videos they appear in.
+
+    Without sample_size every video is kept in order of appearance. With
+    it, see the module docstring.
+    """
+
+    def __init__(self, sample_size: Optional[int] = None, max_names: int = DEFAULT_MAX_NAMES,
+                 top_k: int = DEFAULT_TOP_K):
+        """
+        Args:
+            sample_size: Videos kept per name, or None to keep all
+            max_names: Names tracked with exact counts in sampled mode
+            top_k: Heavy hitters reported in sampled mode
+        """
+        self.sample_size = sample_size
+        self.max_names = max_names
+        self.top_k = top_k
+        # Exact mode: name -> videos; sampled mode: name -> [count, heap of (-key, video)]
+        self.items: Dict[str, Any] = {}
+        self.occurrences = 0
+        self.overflow_occurrences = 0
+        self.heavy_hitters = SpaceSaving(top_k * SKETCH_FACTOR) if sample_size is not None else None
+
+    @property
+    def sampled(self) -> bool:
+        return self.sample_size is not None
+
+    def empty_copy(self) -> 'NotFoundTracker':
+        """Return an empty tracker with the same settings, e.g. for a shard worker."""
+        return NotFoundTracker(self.sample_size, self.max_names, self.top_k)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, name: str, video: str):
+        """Record that a name could not be resolved in a video."""
+        self.occurrences += 1
+        if not self.sampled:
+            self.items.setdefault(name, []).append(video)
+            return
+
+        self.heavy_hitters.add(name)
+        entry = self.items.get(name)
+        if entry is None:
+            if len(self.items) >= self.max_names:
+                self.overflow_occurrences += 1
+                return
+            entry = self.items[name] = [0, []]
+        entry[0] += 1
+        self._sample(entry[1], (-sample_key(name, video), video))
+
+    def _sample(self, heap: list, item: Tuple[int, str]):
+        if len(heap) < self.sample_size:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def merge(self, other: 'NotFoundTracker'):
+        """Add the names of another tracker, e.g. of a later shard."""
+        self.occurrences += other.occurrences
+        self.overflow_occurrences += other.overflow_occurrences
+        if not self.sampled:
+            for name, videos in other.items.items():
+                self.items.setdefault(name, []).extend(videos)
+            return
+
+        self.heavy_hitters.merge(other.heavy_hitters)
+        for name, (count, heap) in other.items.items():
+            entry = self.items.get(name)
+            if entry is None:
+                if len(self.items) >= self.max_names:
+                    self.overflow_occurrences += count
+                    continue
+                entry = self.items[name] = [0, []]
+            entry[0] += count
+            for item in heap:
+                self._sample(entry[1], item)
+
+    def rows(self) -> List[Tuple[str, int, List[str]]]:
+        """
+        Return (name, occurrences, videos) by descending occurrences.
+
+        Ties keep their order of first appearance. In sampled mode the
+        videos are the sample, sorted.
+        """
+        if not self.sampled:
+            rows = [(name, len(videos), videos) for name, videos in self.items.items()]
+        else:
+            rows = [(name, count, sorted(video for _, video in heap)) for name, (count, heap) in self.items.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def top_offenders(self) -> List[Tuple[str, int, int]]:
+        """
+        Return the top_k (name, count, max overcount) of a sampled tracker.
+
+        Tracked names have exact counts. Only when names were past the cap
+        do the sketch's estimates fill in for the names it saw untracked;
+        offenders are ranked by their guaranteed count, count - overcount.
+        """
+        if not self.overflow_occurrences:
+            candidates = [(name, entry[0], 0) for name, entry in self.items.items()]
+        else:
+            candidates = [(name, self.items[name][0], 0) if name in self.items else (name, count, error)
+                          for name, count, error in self.heavy_hitters.top(self.heavy_hitters.capacity)]
+        return sorted(candidates, key=lambda candidate: (candidate[2] - candidate[1], candidate[0]))[:self.top_k]
+
+    def summary(self, item_type: str) -> Dict[str, Any]:
+        """Return the JSON summary of a sampled tracker."""
+        return {
+            'type': item_type,
+            'occurrences': self.occurrences,
+            'names_tracked': len(self.items),
+            'names_complete': self.overflow_occurrences == 0,
+            'untracked_occurrences': self.overflow_occurrences,
+            'sample_size': self.sample_size,
+            'top_offenders': [
+                {
+                    'name': name,
+                    'count': count,
+                    'exact': name in self.items,
+                    'max_overcount': error,
+                    'sample_videos': sorted(video for _, video in self.items[name][1]) if name in self.items else [],
+                }
+                for name, count, error in self.top_offenders()
+            ],
+        }
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Run the ETL scripts as a DAG of stages, skipping stages whose outputs are
+still valid.
+
+Every stage declares its input and output files. A stage's fingerprint is a
+SHA-256 over its script, the helper modules it imports directly or through
+other helpers, its arguments and the contents of its inputs. A stage is
+skipped when its fingerprint matches the last successful run and its
+outputs still have the recorded contents. When a rerun stage writes the
+same outputs as before, the stages downstream of it are skipped as well.
+
+Independent branches (maker, series, genre, video) run in parallel. Stage
+output is written to <work-dir>/logs/<stage>.log and the run state to
+<work-dir>/.pipeline-state.json.
+
+The fetch stages only run with --fetch, since their inputs live on the DMM
+API. Without it their NDJSON outputs are used as source files. A fetch
+resumes from its checkpoint only when the last one was interrupted; after
+a complete fetch it starts over, so every --fetch run refreshes the data.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from ndjson_io import has_interrupted_fetch
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STATE_FILE = '.pipeline-state.json'
+
+HASH_BLOCK_SIZE = 1 << 20
+
+class Stage:
+    """One script run of the pipeline with its input and output files."""
+
+    def __init__(
+        self,
+        name: str,
+        script: str,
+        args: List[str],
+        inputs: List[str],
+        outputs: List[str],
+        stdout: Optional[str] = None,
+        fetch: bool = False
+    ):
+        """
+        Args:
+            name: Stage name, e.g. "maker-json2csv"
+            script: Script file name in scripts/
+            args: Script arguments
+            inputs: Files the stage reads
+            outputs: Files the stage writes
+            stdout: Optional output file that receives the script's stdout
+            fetch: Whether the stage downloads from the DMM API
+        """
+        self.name = name
+        self.script = script
+        self.args = args
+        self.inputs = inputs
+        self.outputs = outputs + ([stdout] if stdout else [])
+        self.stdout = stdout
+        self.fetch = fetch
+
+    def command(self) -> List[str]:
+        return [sys.executable, os.path.join(SCRIPTS_DIR, self.script)] + self.args
+
+def build_stages(args) -> List[Stage]:
+    """
+    Declare the pipeline stages.
+
+    Alias tables are only passed to the relation stage when they exist, so
+    editing one only invalidates that stage.
+    """
+    work = args.work_dir
+
+    def tmp(name: str) -> str:
+        return os.path.join(work, name)
+
+    def fetch_args(output_path: str) -> List[str]:
+        # Resuming a complete checkpoint would download nothing
+        return [output_path] + (['--resume'] if has_interrupted_fetch(output_path) else [])
+
+    stages = [
+        Stage('maker-fetch', 'maker-fetch.py', fetch_args(args.maker_source),
+              [], [args.maker_source], fetch=True),
+        Stage('series-fetch', 'series-fetch.py', fetch_args(args.series_source),
+              [], [args.series_source], fetch=True),
+
+        Stage('maker-json2csv', 'maker-json2csv.py', [args.maker_source, tmp('maker.csv')],
+              [args.maker_source], [tmp('maker.csv')]),
+
+        Stage('series-json2csv', 'series-json2csv.py', [args.series_source, tmp('series.csv')],
+              [args.series_source], [tmp('series.csv')]),
+
+        Stage('genre-json2csv', 'genre-json2csv.py', [args.genre_source, tmp('genre-raw.csv')],
+              [args.genre_source], [tmp('genre-raw.csv')]),
+        Stage('genre-addid', 'assign-ids.py', ['--from', '|', '--to', ',', tmp('genre-raw.csv'), tmp('genre.csv')],
+              [tmp('genre-raw.csv')], [tmp('genre.csv')]),
+
+        Stage('video-deduplicate', 'deduplicate.py', ['--columns', 'display_id', '--delimiter', '\\t', '--schema', 'none', '--chunksize', '100000', args.video_source],
+              [args.video_source], [], stdout=tmp('video-dedup.tsv')),
+        Stage('video-addid', 'video-addid.py', [tmp('video-dedup.tsv'), tmp('video-id.tsv')],
+              [tmp('video-dedup.tsv')], [tmp('video-id.tsv')]),
+    ]
+
+    relation_args = [tmp('video-id.tsv'), args.actress_source, tmp('genre.csv'), tmp('maker.csv'), tmp('series.csv'),
+                     '--create-video-dataset', '--video-output', tmp('videos.tsv'), '--workers', str(args.workers)]
+    relation_inputs = [tmp('video-id.tsv'), args.actress_source, tmp('genre.csv'), tmp('maker.csv'), tmp('series.csv')]
+    for relation_type in ('maker', 'genre', 'series'):
+        alias_path = getattr(args, f'{relation_type}_alias')
+        if os.path.exists(alias_path):
+            relation_args += [f'--{relation_type}-alias', alias_path]
+            relation_inputs.append(alias_path)
+
+    # The relation script writes its relation and not-found files to fixed .tmp/ paths
+    relation_outputs = [tmp('videos.tsv')] + [
+        os.path.join('.tmp', name) for name in (
+            'video-actress.tsv', 'video-genre.tsv', 'video-maker.tsv', 'video-series.tsv',
+            'video_actresses_not_found.tsv', 'video_genres_not_found.tsv',
+            'video_makers_not_found.tsv', 'video_series_not_found.tsv',
+        )
+    ]
+    stages.append(Stage('video-actress-relation', 'video-actress-relation.py', relation_args,
+                        relation_inputs, relation_outputs))
+
+    if not args.fetch:
+        stages = [stage for stage in stages if not stage.fetch]
+    return stages
+
+def imported_modules(script_path: str) -> List[str]:
+    """Return the top-level names of the modules a script imports, including in functions."""
+    with open(script_path, 'r', encoding='utf-8') as file:
+        tree = ast.parse(file.read(), script_path)
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules += [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module.split('.')[0])
+    return modules
+
+def local_imports(script_path: str) -> List[str]:
+    """
+    Return the paths of the scripts/ helper modules a script depends on.
+
+    Helpers imported by other helpers are followed too, e.g. dataset_schema
+    through tabular_io, so editing any of them changes the fingerprint.
+    """
+    found = set()
+    pending = [script_path]
+    while pending:
+        for module in imported_modules(pending.pop()):
+            path = os.path.join(SCRIPTS_DIR, f'{module}.py')
+            if path not in found and os.path.exists(path):
+                found.add(path)
+                pending.append(path)
+    found.discard(os.path.join(SCRIPTS_DIR, os.path.basename(script_path)))
+    return sorted(found)
+
+class PipelineState:
+    """
+    Fingerprints of the last successful stage runs and a cache of file hashes.
+
+    File hashes are reused while a file's size and modification time are
+    unchanged, so large unchanged inputs are only read once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {'files': {}, 'stages': {}}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.data = json.load(file)
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """Return the SHA-256 of a file, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        key = os.path.abspath(path)
+        with self.lock:
+            cached = self.data['files'].get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+
+        with self.lock:
+            self.data['files'][key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, stage: Stage) -> Optional[str]:
+        """Fingerprint a stage, or return None if one of its inputs is missing."""
+        script_path = os.path.join(SCRIPTS_DIR, stage.script)
+        code = {path: self.file_hash(path) for path in [script_path] + local_imports(script_path)}
+        inputs = {path: self.file_hash(path) for path in stage.inputs}
+        if None in inputs.values():
+            return None
+
+        payload = json.dumps({
+            'code': {os.path.basename(path): digest for path, digest in code.items()},
+            'args': stage.args,
+            'stdout': stage.stdout,
+            'inputs': inputs,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_up_to_date(self, stage: Stage, fingerprint: str) -> bool:
+        """Check whether a stage last ran with this fingerprint and its outputs are unchanged."""
+        with self.lock:
+            record = self.data['stages'].get(stage.name)
+        if not record or record['fingerprint'] != fingerprint:
+            return False
+        return all(self.file_hash(path) == record['outputs'].get(path) for path in stage.outputs)
+
+    def record(self, stage: Stage, fingerprint: str):
+        """Record a successful stage run and save the state."""
+        outputs = {path: self.file_hash(path) for path in stage.outputs}
+        with self.lock:
+            self.data['stages'][stage.name] = {'fingerprint': fingerprint, 'outputs': outputs}
+            self.save()
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.data, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+def stage_dependencies(stages: List[Stage]) -> Dict[str, List[str]]:
+    """Map each stage name to the stages producing its inputs."""
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            producers[path] = stage.name
+
+    return {
+        stage.name: sorted({producers[path] for path in stage.inputs if path in producers and producers[path] != stage.name})
+        for stage in stages
+    }
+
+def run_stage(stage: Stage, log_dir: str) -> Tuple[bool, float]:
+    """
+    Run a stage's script with its output written to the stage log.
+
+    A stdout output is written to a temporary file first and only moved into
+    place when the script succeeds.
+
+    Returns:
+        Tuple of (whether the script succeeded, seconds taken)
+    """
+    start = time.perf_counter()
+    for path in stage.outputs:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(log_dir, f'{stage.name}.log'), 'w', encoding='utf-8') as log:
+        if stage.stdout:
+            temp_path = f"{stage.stdout}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as output:
+                result = subprocess.run(stage.command(), stdout=output, stderr=log)
+            if result.returncode == 0:
+                os.replace(temp_path, stage.stdout)
+            else:
+                os.remove(temp_path)
+        else:
+            result = subprocess.run(stage.command(), stdout=log, stderr=subprocess.STDOUT)
+
+    return result.returncode == 0, time.perf_counter() - start
+
+def execute_stage(stage: Stage, state: PipelineState, log_dir: str, force: bool, dry_run: bool) -> Tuple[str, float]:
+    """
+    Run a stage unless its outputs are still valid.
+
+    Returns:
+        Tuple of (status, seconds taken); status is one of "skipped", "ran",
+        "would run", "failed" or "missing input"
+    """
+    fingerprint = state.fingerprint(stage)
+    if fingerprint is None:
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        print(f"[{stage.name}] Missing input: {', '.join(missing)}")
+        return 'missing input', 0.0
+
+    if not (force or stage.fetch) and state.is_up_to_date(stage, fingerprint):
+        return 'skipped', 0.0
+
+    if dry_run:
+        return 'would run', 0.0
+
+    print(f"[{stage.name}] Running {stage.script}...")
+    succeeded, seconds = run_stage(stage, log_dir)
+    if not succeeded:
+        print(f"[{stage.name}] Failed, see {os.path.join(log_dir, stage.name + '.log')}")
+        return 'failed', seconds
+
+    state.record(stage, fingerprint)
+    print(f"[{stage.name}] Done in {seconds:.2f}s")
+    return 'ran', seconds
+
+def run_pipeline(stages: List[Stage], state: PipelineState, log_dir: str, jobs: int,
+                 force: List[str], dry_run: bool) -> Dict[str, Tuple[str, float]]:
+    """
+    Run the stages in dependency order with up to `jobs` stages at once.
+
+    Stages downstream of a failed stage are not run.
+
+    Returns:
+        Dictionary mapping stage names to (status, seconds taken)
+    """
+    dependencies = stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    results: Dict[str, Tuple[str, float]] = {}
+    pending = [stage.name for stage in stages]
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for name in list(pending):
+                statuses = [results.get(dependency, (None,))[0] for dependency in dependencies[name]]
+                if any(status in ('failed', 'missing input', 'blocked') for status in statuses):
+                    results[name] = ('blocked', 0.0)
+                    pending.remove(name)
+                elif dry_run and 'would run' in statuses:
+                    # Inputs would change, so the stage would run as well
+                    results[name] = ('would run', 0.0)
+                    pending.remove(name)
+                elif all(status is not None for status in statuses):
+                    stage = by_name[name]
+                    stage_force = 'all' in force or name in force
+                    running[executor.submit(execute_stage, stage, state, log_dir, stage_force, dry_run)] = name
+                    pending.remove(name)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the ETL scripts as a cached DAG of stages.')
+    parser.add_argument('--work-dir', default='.tmp', help='Directory for intermediate files (default: .tmp)')
+    parser.add_argument('--video-source', default='.tmp/video.tsv', help='Scraped video TSV (default: .tmp/video.tsv)')
+    parser.add_argument('--actress-source', default='.tmp/actress.csv', help='Actress CSV (default: .tmp/actress.csv)')
+    parser.add_argument('--genre-source', default='.tmp/genre.ndjson', help='Genre NDJSON or JSON (default: .tmp/genre.ndjson)')
+    parser.add_argument('--maker-source', default='.tmp/maker.ndjson', help='Maker fetch output (default: .tmp/maker.ndjson)')
+    parser.add_argument('--series-source', default='.tmp/series.ndjson', help='Series fetch output (default: .tmp/series.ndjson)')
+    parser.add_argument('--maker-alias', default='.tmp/maker-alias.tsv', help='Maker alias TSV, used if it exists')
+    parser.add_argument('--genre-alias', default='.tmp/genre-alias.tsv', help='Genre alias TSV, used if it exists')
+    parser.add_argument('--series-alias', default='.tmp/series-alias.tsv', help='Series alias TSV, used if it exists')
+    parser.add_argument('--fetch', action='store_true', help='Also run the maker and series fetchers')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help='Run a stage even if it is up to date; "all" runs every stage (repeatable)')
+    parser.add_argument('--jobs', type=int, default=4, help='Stages to run at once (default: 4)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for the relation stage (default: 1)')
+    parser.add_argument('--dry-run', action='store_true', help='Only show which stages would run')
+    parser.add_argument('--metrics-dir', default=None,
+                        help='Directory for per-stage metrics files (sets ETL_METRICS for every stage)')
+    args = parser.parse_args()
+
+    if args.metrics_dir:
+        os.makedirs(args.metrics_dir, exist_ok=True)
+        os.environ['ETL_METRICS'] = args.metrics_dir + os.sep
+
+    stages = build_stages(args)
+    unknown = [name for name in args.force if name != 'all' and name not in {stage.name for stage in stages}]
+    if unknown:
+        print(f"Error: Unknown stages {unknown}. Available stages: {[stage.name for stage in stages]}")
+        sys.exit(1)
+
+    log_dir = os.path.join(args.work_dir, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    state = PipelineState(os.path.join(args.work_dir, STATE_FILE))
+
+    start = time.perf_counter()
+    results = run_pipeline(stages, state, log_dir, max(1, args.jobs), args.force, args.dry_run)
+    total_seconds = time.perf_counter() - start
+    if not args.dry_run:
+        state.save()
+
+    print(f"\n{'='*60}")
+    print(f"PIPELINE RESULTS")
+    print(f"{'='*60}")
+    for stage in stages:
+        status, seconds = results[stage.name]
+        print(f"{stage.name:<24} {status:<14} {seconds:>8.2f}s")
+    print(f"Total: {total_seconds:.2f}s")
+
+    if any(status in ('failed', 'missing input', 'blocked') for status, _ in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
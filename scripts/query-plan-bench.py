@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Benchmark the query plans of the video queries on a local Postgres seeded
+from data/*.tsv at several scale factors, and compare them against a
+saved baseline.
+
+The catalogue holds sql/get-videos-by-actress-id.sql and the statements
+TypeORM issues for VideoService.findAllConnection: the four left joins
+(series, maker, genres, actresses), the IN (... GROUP BY ... HAVING
+COUNT(DISTINCT ...)) filter subqueries, and, because take() is combined
+with to-many joins, three statements per call:
+
+    ids     SELECT DISTINCT video ids of the page (ORDER BY id LIMIT n + 1)
+    rows    the joined rows of those ids
+    count   the cloned COUNT(DISTINCT video.id) query, without the cursor
+
+Each filter shape of the GraphQL videos query (actress, actress AND,
+genre AND, actressCount, maker, deep cursor) gets its own entry. The
+filter IDs are picked from the seeded tables (the actress with the most
+videos and her most frequent co-star, the most common genres, ...), so the
+queries return rows at every scale.
+
+Each scale is seeded with load-postgres.py from scaled copies of data/:
+actresses, videos and their relations are replicated with offset IDs,
+genres and makers are not. This REPLACES the contents of the tables, so
+point the DB_* variables at a development database (by default the
+docker-compose one, see .env.example).
+
+Every statement runs under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON). The
+fastest of --repeat runs is kept with its planning time, shared buffers
+and plan shape: the tree of node types with their join types and the
+relations and indexes they scan, without costs or row counts. A changed
+plan shape, or an execution time or buffer count above the baseline by
+more than the tolerance, is a regression.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from benchmark import read_tsv, write_scaled
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SQL_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'sql')
+
+DEFAULT_SCALES = '1,10'
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_PAGE_SIZE = 20
+
+# Execution times below this are mostly noise and are not compared
+MIN_COMPARED_MS = 1.0
+
+# Columns the VideoService query selects, as TypeORM aliases them
+VIDEO_SELECT = '"video".*, "series".*, "maker".*, "genre".*, "actress".*'
+
+VIDEO_JOINS = """
+FROM "video" "video"
+LEFT JOIN "series" "series" ON "series"."id" = "video"."series_id"
+LEFT JOIN "maker" "maker" ON "maker"."id" = "video"."maker_id"
+LEFT JOIN "video_genres" "video_genre" ON "video_genre"."video_id" = "video"."id"
+LEFT JOIN "genre" "genre" ON "genre"."id" = "video_genre"."genre_id"
+LEFT JOIN "video_actresses" "video_actress" ON "video_actress"."video_id" = "video"."id"
+LEFT JOIN "actress" "actress" ON "actress"."id" = "video_actress"."actress_id"
+"""
+
+# VideoQueryOptionsInput filter -> WHERE condition of findAllConnection
+VIDEO_FILTERS = {
+    'actress_ids': """"video"."id" IN (
+    SELECT "v"."id" FROM "video" "v"
+    INNER JOIN "video_actresses" "v_va" ON "v_va"."video_id" = "v"."id"
+    INNER JOIN "actress" "va" ON "va"."id" = "v_va"."actress_id"
+    WHERE "va"."id" IN %(actress_ids)s
+    GROUP BY "v"."id" HAVING COUNT(DISTINCT "va"."id") = %(actress_ids_count)s)""",
+    'genre_ids': """"video"."id" IN (
+    SELECT "v2"."id" FROM "video" "v2"
+    INNER JOIN "video_genres" "v2_vg" ON "v2_vg"."video_id" = "v2"."id"
+    INNER JOIN "genre" "vg" ON "vg"."id" = "v2_vg"."genre_id"
+    WHERE "vg"."id" IN %(genre_ids)s
+    GROUP BY "v2"."id" HAVING COUNT(DISTINCT "vg"."id") = %(genre_ids_count)s)""",
+    'actress_count': """"video"."id" IN (
+    SELECT "v3"."id" FROM "video" "v3"
+    LEFT JOIN "video_actresses" "v3_ac" ON "v3_ac"."video_id" = "v3"."id"
+    LEFT JOIN "actress" "ac" ON "ac"."id" = "v3_ac"."actress_id"
+    GROUP BY "v3"."id" HAVING COUNT("ac"."id") = %(actress_count)s)""",
+    'maker_id': '"maker"."id" = %(maker_id)s',
+}
+
+# The rows statement fetches the page found by the ids statement
+PAGE_IDS_CONDITION = '"video"."id" IN %(page_ids)s'
+
+# Query name -> (filters of the videos query, paginated after a deep cursor)
+VIDEO_QUERIES = {
+    'videos-first-page': ((), False),
+    'videos-deep-cursor': ((), True),
+    'videos-actress': (('actress_ids',), False),
+    'videos-actress-and': (('actress_ids',), False),
+    'videos-genre-and': (('genre_ids',), False),
+    'videos-actress-count': (('actress_count',), True),
+    'videos-maker': (('maker_id',), False),
+}
+
+# SQL files run as they are
+SQL_FILES = {
+    'get-videos-by-actress-id': 'get-videos-by-actress-id.sql',
+}
+
+def connect():
+    """Connect to Postgres using the DB_* environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', '55432')),
+        user=os.getenv('DB_USERNAME', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres'),
+        dbname=os.getenv('DB_NAME', 'javdb'),
+    )
+
+def generate_data(data_dir: str, work_dir: str, scale: int) -> str:
+    """
+    Write the datasets of one scale factor, reusing them if they exist.
+
+    Returns:
+        Directory with the scaled datasets
+    """
+    scale_dir = os.path.join(work_dir, f'x{scale}')
+    if os.path.exists(os.path.join(scale_dir, 'video-genres.tsv')):
+        return scale_dir
+    os.makedirs(scale_dir, exist_ok=True)
+    print(f"Generating {scale}x datasets in {scale_dir}...")
+
+    def copy_scaled(name: str, copies: int, offsets: Optional[Dict[str, int]] = None, suffixes: Tuple[str, ...] = ()):
+        header, rows = read_tsv(os.path.join(data_dir, f'{name}.tsv'))
+        write_scaled(os.path.join(scale_dir, f'{name}.tsv'), header, rows, copies,
+                     {header.index(column): offset for column, offset in (offsets or {}).items()},
+                     tuple(header.index(column) for column in suffixes))
+
+    # Copies are offset by the highest ID, so IDs stay unique where they are not dense
+    _, actress_rows = read_tsv(os.path.join(data_dir, 'actress.tsv'))
+    actress_offset = max(int(row[0]) for row in actress_rows)
+    video_header, video_rows = read_tsv(os.path.join(data_dir, 'video.tsv'))
+    video_offset = max(int(row[0]) for row in video_rows)
+
+    copy_scaled('actress', scale, {'id': actress_offset}, ('dmm_id',))
+    copy_scaled('genre', 1)
+    copy_scaled('maker', 1)
+    copy_scaled('video', scale, {'id': video_offset}, ('code', 'dmm_id'))
+    copy_scaled('video-actresses', scale, {'video_id': video_offset, 'actress_id': actress_offset})
+    copy_scaled('video-genres', scale, {'video_id': video_offset})
+
+    if os.path.exists(os.path.join(data_dir, 'series.tsv')):
+        copy_scaled('series', 1)
+    else:
+        # data/ has no series.tsv yet; name the referenced series so the foreign key holds
+        series_column = video_header.index('series_id')
+        series_ids = sorted({int(row[series_column]) for row in video_rows
+                             if len(row) > series_column and row[series_column]})
+        write_scaled(os.path.join(scale_dir, 'series.tsv'), ['id', 'name'],
+                     [[str(id), f'series {id}'] for id in series_ids], 1, {})
+    return scale_dir
+
+def seed(data_dir: str):
+    """Replace the table contents with a dataset directory using load-postgres.py."""
+    process = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'load-postgres.py'), '--data-dir', data_dir],
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if process.returncode != 0:
+        raise RuntimeError(f"load-postgres.py exited with {process.returncode}:\n"
+                           f"{process.stdout.decode('utf-8', errors='replace')[-2000:]}")
+
+def query_parameters(cursor) -> Dict[str, Any]:
+    """Pick the filter IDs of the catalogue from the seeded tables."""
+    def scalar(statement: str, params: Tuple = ()) -> Any:
+        cursor.execute(statement, params)
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    actress_id = scalar("SELECT actress_id FROM video_actresses GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT 1")
+    costar_id = scalar("""
+        SELECT b.actress_id FROM video_actresses a
+        JOIN video_actresses b ON b.video_id = a.video_id AND b.actress_id <> a.actress_id
+        WHERE a.actress_id = %s GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT 1
+    """, (actress_id,))
+    genre_id = scalar("SELECT genre_id FROM video_genres GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT 1")
+    cogenre_id = scalar("""
+        SELECT b.genre_id FROM video_genres a
+        JOIN video_genres b ON b.video_id = a.video_id AND b.genre_id <> a.genre_id
+        WHERE a.genre_id = %s GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT 1
+    """, (genre_id,))
+    if None in (actress_id, costar_id, genre_id, cogenre_id):
+        raise ValueError("the seeded tables have no co-starring actresses or genre pairs to filter on")
+
+    return {
+        'single_actress_ids': (actress_id,),
+        'actress_ids': (actress_id, costar_id),
+        'genre_ids': (genre_id, cogenre_id),
+        'actress_count': 2,
+        'maker_id': scalar("SELECT maker_id FROM video WHERE maker_id IS NOT NULL GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT 1"),
+        'after_id': scalar("SELECT PERCENTILE_DISC(0.9) WITHIN GROUP (ORDER BY id) FROM video"),
+    }
+
+def video_statements(filters: Tuple[str, ...], paginated: bool, page_size: int) -> Dict[str, str]:
+    """Return the ids, rows and count statements of one findAllConnection call."""
+    conditions = [VIDEO_FILTERS[name] for name in filters]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    page_conditions = conditions + (['"video"."id" > %(after_id)s'] if paginated else [])
+    page_where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+    rows_where = f"WHERE {' AND '.join(page_conditions + [PAGE_IDS_CONDITION])}"
+    return {
+        'ids': f"""SELECT DISTINCT "distinctAlias"."video_id" AS "ids_video_id" FROM (
+SELECT "video"."id" AS "video_id" {VIDEO_JOINS} {page_where}
+) "distinctAlias" ORDER BY "distinctAlias"."video_id" ASC LIMIT {page_size + 1}""",
+        'rows': f'SELECT {VIDEO_SELECT} {VIDEO_JOINS} {rows_where} ORDER BY "video"."id" ASC',
+        'count': f'SELECT COUNT(DISTINCT("video"."id")) AS "cnt" {VIDEO_JOINS} {where}',
+    }
+
+def catalogue(page_size: int) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    Return the benchmarked statements.
+
+    Returns:
+        Dictionary mapping statement names to (SQL, name of the ids
+        statement whose result the SQL needs as page_ids, or None)
+    """
+    statements = {}
+    for name, filename in SQL_FILES.items():
+        with open(os.path.join(SQL_DIR, filename), 'r', encoding='utf-8') as file:
+            statements[name] = (file.read().strip().rstrip(';'), None)
+    for name, (filters, paginated) in VIDEO_QUERIES.items():
+        for part, statement in video_statements(filters, paginated, page_size).items():
+            statements[f'{name}:{part}'] = (statement, f'{name}:ids' if part == 'rows' else None)
+    return statements
+
+def statement_parameters(name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """The single-actress query filters on one actress, the others on the pairs."""
+    if name.startswith('videos-actress:'):
+        parameters = {**parameters, 'actress_ids': parameters['single_actress_ids']}
+    return {
+        **parameters,
+        'actress_ids_count': len(parameters['actress_ids']),
+        'genre_ids_count': len(parameters['genre_ids']),
+    }
+
+def plan_shape(node: Dict[str, Any]) -> str:
+    """Describe a plan tree by node types, join types and scanned relations, without estimates."""
+    label = node['Node Type']
+    details = [node[key] for key in ('Join Type', 'Strategy', 'Relation Name', 'Index Name') if key in node]
+    if details:
+        label += f"[{','.join(details)}]"
+    children = node.get('Plans', [])
+    if children:
+        label += f"({', '.join(plan_shape(child) for child in children)})"
+    return label
+
+def explain(cursor, statement: str, params: Dict[str, Any], repeat: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Run a statement under EXPLAIN (ANALYZE, BUFFERS) and keep its fastest run.
+
+    Returns:
+        Tuple of (measurements, JSON plan of the fastest run)
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", params)
+        result = cursor.fetchone()[0]
+        result = result[0] if isinstance(result, list) else json.loads(result)[0]
+        if best is None or result['Execution Time'] < best['Execution Time']:
+            best = result
+    plan = best['Plan']
+    measurements = {
+        'execution_ms': round(best['Execution Time'], 3),
+        'planning_ms': round(best['Planning Time'], 3),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+        'rows': plan.get('Actual Rows', 0),
+        'plan_shape': plan_shape(plan),
+    }
+    return measurements, best
+
+def compare_to_baseline(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare results against a baseline.
+
+    Returns:
+        Descriptions of the changed plan shapes, and of the execution times
+        and shared buffers that exceed the baseline by more than the tolerance
+    """
+    baseline_results = {(result['query'], result['scale']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result['query'], result['scale']))
+        if not previous:
+            continue
+        label = f"{result['query']} at {result['scale']}x"
+        if result['plan_shape'] != previous['plan_shape']:
+            regressions.append(f"{label}: plan changed\n      was {previous['plan_shape']}\n      now {result['plan_shape']}")
+        if (previous['execution_ms'] >= MIN_COMPARED_MS
+                and result['execution_ms'] > previous['execution_ms'] * (1 + tolerance)):
+            regressions.append(f"{label}: {result['execution_ms']:.2f} ms vs {previous['execution_ms']:.2f} ms baseline")
+        blocks = result['shared_hit_blocks'] + result['shared_read_blocks']
+        previous_blocks = previous['shared_hit_blocks'] + previous['shared_read_blocks']
+        if blocks > previous_blocks * (1 + tolerance):
+            regressions.append(f"{label}: {blocks} shared buffers vs {previous_blocks} baseline")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the query plans of the video queries on a seeded local Postgres.')
+    parser.add_argument('--data-dir', default='data', help='Directory with the TSV datasets (default: data)')
+    parser.add_argument('--work-dir', default='.tmp/query-plans',
+                        help='Directory for the scaled datasets and plans (default: .tmp/query-plans)')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help=f'Comma-separated scale factors (default: {DEFAULT_SCALES})')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='Benchmark the current table contents as the only scale instead of seeding')
+    parser.add_argument('--queries', default=None, help='Comma-separated query name prefixes to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the fastest is kept (default: 3)')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help=f'first of the videos queries (default: {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--output', default='.tmp/query-plans/results.json',
+                        help='Results JSON path (default: .tmp/query-plans/results.json)')
+    parser.add_argument('--baseline', default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--save-baseline', default=None, help='Also write the results to this baseline path')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed slowdown or buffer growth over the baseline (default: {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    scales = sorted({int(scale) for scale in args.scales.split(',')})
+    if args.no_seed and len(scales) != 1:
+        parser.error("--no-seed benchmarks the loaded tables, give their scale as the only --scales value")
+
+    statements = catalogue(args.page_size)
+    if args.queries:
+        prefixes = args.queries.split(',')
+        statements = {name: value for name, value in statements.items()
+                      if any(name == prefix or name.startswith(f'{prefix}:') for prefix in prefixes)}
+        missing_ids = {needs for _, needs in statements.values() if needs and needs not in statements}
+        if not statements or missing_ids:
+            print(f"Error: Unknown queries {args.queries}. Available queries: {list(SQL_FILES) + list(VIDEO_QUERIES)}")
+            sys.exit(1)
+
+    results = []
+    server_version = None
+    for scale in scales:
+        try:
+            if not args.no_seed:
+                scale_dir = generate_data(args.data_dir, args.work_dir, scale)
+                print(f"Seeding Postgres at {scale}x...")
+                seed(scale_dir)
+            connection = connect()
+        except FileNotFoundError as e:
+            print(f"Error: Data file '{e.filename}' not found.")
+            sys.exit(1)
+        except RuntimeError as e:
+            print(f"Error seeding {scale}x: {e}")
+            sys.exit(1)
+        except psycopg2.Error as e:
+            print(f"Error connecting to Postgres: {e}")
+            sys.exit(1)
+
+        plans_dir = os.path.join(args.work_dir, 'plans', f'x{scale}')
+        os.makedirs(plans_dir, exist_ok=True)
+        try:
+            # Read-only work: one transaction per scale, rolled back at the end
+            with connection.cursor() as cursor:
+                server_version = connection.server_version
+                parameters = query_parameters(cursor)
+                page_ids = {}
+                for name, (statement, needs) in statements.items():
+                    params = statement_parameters(name, parameters)
+                    if needs:
+                        params['page_ids'] = page_ids[needs] or (0,)
+                    elif name.endswith(':ids'):
+                        cursor.execute(statement, params)
+                        page_ids[name] = tuple(row[0] for row in cursor.fetchall())
+
+                    measurements, plan = explain(cursor, statement, params, args.repeat)
+                    with open(os.path.join(plans_dir, f"{name.replace(':', '.')}.json"), 'w', encoding='utf-8') as file:
+                        json.dump(plan, file, indent=2)
+                    results.append({'query': name, 'scale': scale, **measurements})
+                    print(f"{name:<32} {scale:>4}x {measurements['execution_ms']:>10.2f} ms "
+                          f"{measurements['planning_ms']:>8.2f} ms plan "
+                          f"{measurements['shared_hit_blocks'] + measurements['shared_read_blocks']:>9} buffers "
+                          f"{measurements['rows']:>8} rows")
+            connection.rollback()
+        except (psycopg2.Error, ValueError) as e:
+            print(f"Error running the queries at {scale}x: {e}")
+            sys.exit(1)
+        finally:
+            connection.close()
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'postgres': server_version,
+        'scales': scales,
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"PLAN SHAPES")
+    print(f"{'='*60}")
+    for name in statements:
+        shapes = {result['plan_shape'] for result in results if result['query'] == name}
+        status = 'stable across scales' if len(shapes) == 1 else f'{len(shapes)} different plans across scales'
+        print(f"{name:<32} {status}")
+    print(f"Results written to {args.output}, plans to {os.path.join(args.work_dir, 'plans')}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Precompute the per-video and per-actress/genre aggregates behind the
+VideoService filters from the relation tables.
+
+VideoService.findAllConnection answers actressIds, genreIds and
+actressCount with GROUP BY ... HAVING COUNT(...) subqueries on every
+request. This job derives the same information once with vectorized NumPy
+operations and writes it as TSV tables that COPY can load directly:
+
+    video_stats.tsv    video_id, actress_count, genre_count, actress_ids, genre_ids
+    actress_stats.tsv  actress_id, video_count
+    genre_stats.tsv    genre_id, video_count
+
+actress_ids and genre_ids are sorted Postgres array literals such as
+{1,2,3}, so "all of these actresses" becomes actress_ids @> ARRAY[...]
+on a GIN index and actressCount an equality on an indexed column. See
+sql/create-video-aggregates.sql for the tables and how to load them.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from relation_graph import CSRAdjacency, read_edges
+
+def unique_edges(sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop repeated (source, target) pairs, as COUNT(DISTINCT ...) does."""
+    keys = np.unique((sources.astype(np.int64) << 32) | targets.astype(np.int64))
+    return (keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32)
+
+def read_video_ids(path: str) -> np.ndarray:
+    """Read the IDs of all videos, so videos without relations get zero counts."""
+    from dataset_schema import read_dataset
+    return np.unique(read_dataset(path, 'video', usecols=['id'])['id'].dropna().to_numpy(dtype=np.int32))
+
+def array_literals(adjacency: CSRAdjacency, video_ids: np.ndarray) -> list:
+    """Format the sorted neighbor IDs of each video as a Postgres array literal."""
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    node_count = adjacency.node_count
+    literals = []
+    for video_id in video_ids.tolist():
+        if video_id < node_count:
+            ids = targets[offsets[video_id]:offsets[video_id + 1]].tolist()
+            literals.append('{' + ','.join(map(str, ids)) + '}')
+        else:
+            literals.append('{}')
+    return literals
+
+def counts_for(counts: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Look up per-ID counts from a bincount, with zero for IDs past its end."""
+    padded = np.zeros(max(int(ids.max()) + 1 if len(ids) else 0, len(counts)), dtype=np.int64)
+    padded[:len(counts)] = counts
+    return padded[ids]
+
+def write_counts(path: str, id_column: str, ids: np.ndarray, counts: np.ndarray) -> int:
+    """Write an (ID, video_count) table for the IDs that have videos."""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter='\t', lineterminator='\n')
+        writer.writerow([id_column, 'video_count'])
+        writer.writerows(zip(ids.tolist(), counts.tolist()))
+    return len(ids)
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute relation counts and sorted ID arrays for the video filters.')
+    parser.add_argument('--videos', default='data/video.tsv', help='Video table (default: data/video.tsv)')
+    parser.add_argument('--actresses', default='data/video-actresses.tsv',
+                        help='Video-actress relation table (default: data/video-actresses.tsv)')
+    parser.add_argument('--genres', default='data/video-genres.tsv',
+                        help='Video-genre relation table (default: data/video-genres.tsv)')
+    parser.add_argument('--output-dir', default='.tmp/aggregates', help='Output directory (default: .tmp/aggregates)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    start = time.perf_counter()
+    try:
+        with METRICS.timer('read'):
+            video_ids = read_video_ids(args.videos)
+            video_actresses = unique_edges(*read_edges(args.actresses, 'video-actresses'))
+            video_genres = unique_edges(*read_edges(args.genres, 'video-genres'))
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error reading relation tables: {e}")
+        sys.exit(1)
+    for path in (args.videos, args.actresses, args.genres):
+        METRICS.add_file('read', path)
+
+    with METRICS.timer('aggregate'):
+        # Videos referenced only by the relation tables still get a row
+        video_ids = np.union1d(video_ids, np.union1d(video_actresses[0], video_genres[0]))
+        actress_counts = counts_for(np.bincount(video_actresses[0]), video_ids)
+        genre_counts = counts_for(np.bincount(video_genres[0]), video_ids)
+        actress_literals = array_literals(CSRAdjacency.from_edges(*video_actresses), video_ids)
+        genre_literals = array_literals(CSRAdjacency.from_edges(*video_genres), video_ids)
+
+        actress_ids, actress_video_counts = np.unique(video_actresses[1], return_counts=True)
+        genre_ids, genre_video_counts = np.unique(video_genres[1], return_counts=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    video_stats_path = os.path.join(args.output_dir, 'video_stats.tsv')
+    actress_stats_path = os.path.join(args.output_dir, 'actress_stats.tsv')
+    genre_stats_path = os.path.join(args.output_dir, 'genre_stats.tsv')
+
+    with METRICS.timer('write'):
+        with open(video_stats_path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter='\t', lineterminator='\n')
+            writer.writerow(['video_id', 'actress_count', 'genre_count', 'actress_ids', 'genre_ids'])
+            writer.writerows(zip(video_ids.tolist(), actress_counts.tolist(), genre_counts.tolist(),
+                                 actress_literals, genre_literals))
+        write_counts(actress_stats_path, 'actress_id', actress_ids, actress_video_counts)
+        write_counts(genre_stats_path, 'genre_id', genre_ids, genre_video_counts)
+
+    for path in (video_stats_path, actress_stats_path, genre_stats_path):
+        METRICS.add_file('written', path)
+    METRICS.count('rows_written', len(video_ids), table='video_stats')
+    METRICS.count('rows_written', len(actress_ids), table='actress_stats')
+    METRICS.count('rows_written', len(genre_ids), table='genre_stats')
+
+    print('=' * 60)
+    print('AGGREGATE RESULTS')
+    print('=' * 60)
+    print(f"Videos: {len(video_ids)} ({int((actress_counts == 0).sum())} without actresses, "
+          f"{int((genre_counts == 0).sum())} without genres)")
+    print(f"Actresses with videos: {len(actress_ids)}")
+    print(f"Genres with videos: {len(genre_ids)}")
+    print(f"Tables written to {args.output_dir} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Build the CSR adjacency store of the video relations and query it offline.
+
+The store is rebuilt only when a relation table changed since the last
+build (or with --rebuild). Queries read the memory-mapped arrays, e.g.:
+
+    python relation-index.py --videos-of-actress 300
+    python relation-index.py --co-stars 300 --top 10
+
+--videos-of-actress prints the same rows as sql/get-videos-by-actress-id.sql
+(video ID and the IDs of all its actresses) without Postgres.
+"""
+
+import argparse
+import sys
+import time
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from relation_graph import RelationStore
+from table_stream import exit_on_broken_pipe
+
+def load_store(args) -> RelationStore:
+    """Load the saved store, rebuilding it first if it is missing or stale."""
+    sources = {'video-actresses': args.actresses, 'video-genres': args.genres}
+
+    if not args.rebuild:
+        try:
+            store = RelationStore.load(args.output)
+        except (FileNotFoundError, KeyError, ValueError):
+            store = None
+        if store is not None and store.is_current(sources):
+            return store
+
+    start = time.perf_counter()
+    try:
+        with METRICS.timer('build'):
+            store = RelationStore.build(sources)
+            store.save(args.output)
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error building relation store: {e}")
+        sys.exit(1)
+
+    for relation, meta in store.meta.items():
+        METRICS.count('edges', meta['edges'], relation=relation)
+        print(f"Indexed {meta['edges']} {relation} pairs from {meta['source']}")
+    print(f"Relation store written to {args.output} in {time.perf_counter() - start:.2f}s")
+    return RelationStore.load(args.output)
+
+def print_ids(label: str, ids):
+    print(f"{label} ({len(ids)}): {','.join(str(item_id) for item_id in ids)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the CSR adjacency store of the video relations.')
+    parser.add_argument('--actresses', default='data/video-actresses.tsv',
+                        help='Video-actress relation table (default: data/video-actresses.tsv)')
+    parser.add_argument('--genres', default='data/video-genres.tsv',
+                        help='Video-genre relation table (default: data/video-genres.tsv)')
+    parser.add_argument('--output', default='.tmp/relation-csr', help='Store directory (default: .tmp/relation-csr)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the store even if it is current')
+    parser.add_argument('--videos-of-actress', type=int, metavar='ID', help='Print the videos of an actress with all their actresses')
+    parser.add_argument('--actresses-of-video', type=int, metavar='ID', help='Print the actresses of a video')
+    parser.add_argument('--co-stars', type=int, metavar='ID', help='Print the actresses who share videos with an actress')
+    parser.add_argument('--videos-of-genre', type=int, metavar='ID', help='Print the videos of a genre')
+    parser.add_argument('--genres-of-video', type=int, metavar='ID', help='Print the genres of a video')
+    parser.add_argument('--top', type=int, default=20, help='Co-stars to print (default: 20)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    store = load_store(args)
+
+    start = time.perf_counter()
+    try:
+        with METRICS.timer('query'):
+            if args.videos_of_actress is not None:
+                print("id\tactress_ids")
+                for video_id in store.videos_of_actress(args.videos_of_actress):
+                    print(f"{video_id}\t{','.join(str(actress_id) for actress_id in store.actresses_of_video(video_id))}")
+            if args.actresses_of_video is not None:
+                print_ids(f"Actresses of video {args.actresses_of_video}", store.actresses_of_video(args.actresses_of_video))
+            if args.co_stars is not None:
+                co_stars = store.co_stars(args.co_stars)
+                print(f"Co-stars of actress {args.co_stars} ({len(co_stars)}):")
+                for actress_id, shared in co_stars[:args.top]:
+                    print(f"  {actress_id}\t{shared} videos")
+            if args.videos_of_genre is not None:
+                print_ids(f"Videos of genre {args.videos_of_genre}", store.videos_of_genre(args.videos_of_genre))
+            if args.genres_of_video is not None:
+                print_ids(f"Genres of video {args.genres_of_video}", store.genres_of_video(args.genres_of_video))
+        # Flush here rather than at exit, so a closed pipe is caught below
+        sys.stdout.flush()
+    except BrokenPipeError:
+        exit_on_broken_pipe()
+
+    queried = any(value is not None for value in (args.videos_of_actress, args.actresses_of_video, args.co_stars,
+                                                  args.videos_of_genre, args.genres_of_video))
+    if queried:
+        print(f"Query took {(time.perf_counter() - start) * 1000:.2f} ms", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Compressed sparse row (CSR) adjacency arrays for the video relation tables.
+
+Each relation (video-actresses, video-genres) is stored twice: forward from
+video to actress/genre and reverse from actress/genre to video. A CSR is
+two int32 arrays, offsets indexed by node ID and the concatenated sorted
+neighbor lists, so the neighbors of a node are the slice
+targets[offsets[id]:offsets[id + 1]] and every lookup is O(degree).
+
+The arrays are saved as .npy files and loaded memory-mapped, so offline
+analytics and validation scripts can answer questions such as
+sql/get-videos-by-actress-id.sql without Postgres or reparsing the TSVs.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Relation dataset -> (source column, target column)
+RELATIONS: Dict[str, Tuple[str, str]] = {
+    'video-actresses': ('video_id', 'actress_id'),
+    'video-genres': ('video_id', 'genre_id'),
+}
+
+META_FILE = 'meta.json'
+
+ARRAY_NAMES = ('forward_offsets', 'forward_targets', 'reverse_offsets', 'reverse_targets')
+
+INT32_MAX = np.iinfo(np.int32).max
+
+class CSRAdjacency:
+    """
+    Adjacency lists of one direction of a relation in CSR layout.
+
+    Node IDs index the offsets array directly, so IDs without edges cost
+    one offset each and have no neighbors.
+    """
+
+    def __init__(self, offsets: np.ndarray, targets: np.ndarray):
+        """
+        Args:
+            offsets: int32 array of length node count + 1
+            targets: int32 array of neighbor IDs, sorted within each node
+        """
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def from_edges(cls, sources: np.ndarray, targets: np.ndarray) -> 'CSRAdjacency':
+        """
+        Build the adjacency lists from parallel arrays of edge endpoints.
+
+        Raises:
+            ValueError: If an ID is negative or there are too many edges for int32 offsets
+        """
+        if len(sources) > INT32_MAX:
+            raise ValueError(f"{len(sources)} edges do not fit int32 offsets")
+        if len(sources) and (sources.min() < 0 or targets.min() < 0):
+            raise ValueError("IDs must not be negative")
+
+        node_count = int(sources.max()) + 1 if len(sources) else 0
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(node_count + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+        return cls(offsets, targets[order].astype(np.int32))
+
+    @property
+    def node_count(self) -> int:
+        """Number of node IDs covered, including IDs without edges."""
+        return max(len(self.offsets) - 1, 0)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """Return the sorted neighbor IDs of a node, or an empty array for unknown IDs."""
+        if node < 0 or node >= self.node_count:
+            return self.targets[:0]
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def degree(self, node: int) -> int:
+        """Return the number of neighbors of a node."""
+        if node < 0 or node >= self.node_count:
+            return 0
+        return int(self.offsets[node + 1] - self.offsets[node])
+
+    def degrees(self) -> np.ndarray:
+        """Return the degree of every node ID."""
+        return np.diff(self.offsets)
+
+class RelationGraph:
+    """Forward (video -> target) and reverse (target -> video) CSR of one relation."""
+
+    def __init__(self, name: str, forward: CSRAdjacency, reverse: CSRAdjacency):
+        self.name = name
+        self.forward = forward
+        self.reverse = reverse
+
+    @classmethod
+    def from_edges(cls, name: str, sources: np.ndarray, targets: np.ndarray) -> 'RelationGraph':
+        return cls(name, CSRAdjacency.from_edges(sources, targets), CSRAdjacency.from_edges(targets, sources))
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.forward.targets)
+
+    def targets_of(self, video_id: int) -> np.ndarray:
+        """Return the actress/genre IDs of a video."""
+        return self.forward.neighbors(video_id)
+
+    def videos_of(self, target_id: int) -> np.ndarray:
+        """Return the IDs of the videos related to an actress/genre."""
+        return self.reverse.neighbors(target_id)
+
+    def co_occurring(self, target_id: int) -> List[Tuple[int, int]]:
+        """
+        Find the targets that share videos with a target, e.g. the co-stars of an actress.
+
+        Runs in O(sum of the degrees of the target's videos).
+
+        Returns:
+            (target ID, shared videos) pairs by descending shared videos, then ID
+        """
+        videos = self.videos_of(target_id)
+        if not len(videos):
+            return []
+
+        offsets = self.forward.offsets
+        neighbors = np.concatenate([self.forward.targets[offsets[video]:offsets[video + 1]] for video in videos])
+        ids, counts = np.unique(neighbors, return_counts=True)
+        keep = ids != target_id
+        ids, counts = ids[keep], counts[keep]
+        order = np.lexsort((ids, -counts))
+        return [(int(ids[index]), int(counts[index])) for index in order]
+
+    def save(self, directory: str):
+        """Write the four CSR arrays as <directory>/<relation>/<array>.npy."""
+        relation_dir = os.path.join(directory, self.name)
+        os.makedirs(relation_dir, exist_ok=True)
+        arrays = (self.forward.offsets, self.forward.targets, self.reverse.offsets, self.reverse.targets)
+        for array_name, array in zip(ARRAY_NAMES, arrays):
+            np.save(os.path.join(relation_dir, f"{array_name}.npy"), array)
+
+    @classmethod
+    def load(cls, directory: str, name: str, mmap: bool = True) -> 'RelationGraph':
+        """Load a saved relation, memory-mapped unless mmap is False."""
+        relation_dir = os.path.join(directory, name)
+        arrays = [np.load(os.path.join(relation_dir, f"{array_name}.npy"), mmap_mode='r' if mmap else None)
+                  for array_name in ARRAY_NAMES]
+        return cls(name, CSRAdjacency(arrays[0], arrays[1]), CSRAdjacency(arrays[2], arrays[3]))
+
+def read_edges(path: str, relation: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read the two ID columns of a relation table as int32 arrays.
+
+    Rows with an empty ID are skipped. .parquet/.arrow tables are read with
+    pyarrow, anything else as TSV.
+
+    Raises:
+        KeyError: If the table lacks the relation's columns
+    """
+    source_column, target_column = RELATIONS[relation]
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.arrow', '.feather', '.ipc'):
+        import pandas as pd
+        reader = pd.read_parquet if extension == '.parquet' else pd.read_feather
+        frame = reader(path, columns=[source_column, target_column])
+    else:
+        from dataset_schema import read_dataset
+        frame = read_dataset(path, relation, usecols=[source_column, target_column])
+
+    frame = frame.dropna()
+    return (frame[source_column].to_numpy(dtype=np.int32),
+            frame[target_column].to_numpy(dtype=np.int32))
+
+def source_signature(path: str) -> Dict[str, int]:
+    """Size and modification time of a source table, to detect stale stores."""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+class RelationStore:
+    """
+    The saved CSR arrays of the video relations, with the named lookups.
+
+    Relations missing from the store raise KeyError when used.
+    """
+
+    def __init__(self, graphs: Dict[str, RelationGraph], meta: Optional[Dict] = None):
+        self.graphs = graphs
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, sources: Dict[str, str]) -> 'RelationStore':
+        """
+        Build the store from relation tables.
+
+        Args:
+            sources: Relation name -> table path, e.g. {'video-actresses': 'data/video-actresses.tsv'}
+        """
+        graphs = {}
+        meta = {}
+        for relation, path in sources.items():
+            graph = RelationGraph.from_edges(relation, *read_edges(path, relation))
+            graphs[relation] = graph
+            meta[relation] = dict(source_signature(path), source=os.path.abspath(path), edges=graph.edge_count,
+                                  columns=list(RELATIONS[relation]))
+        return cls(graphs, meta)
+
+    def save(self, directory: str):
+        """Write every relation and the metadata file."""
+        os.makedirs(directory, exist_ok=True)
+        for graph in self.graphs.values():
+            graph.save(directory)
+        temp_path = os.path.join(directory, f"{META_FILE}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.meta, file, indent=2)
+        os.replace(temp_path, os.path.join(directory, META_FILE))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'RelationStore':
+        """
+        Load a saved store, memory-mapping the arrays unless mmap is False.
+
+        Raises:
+            FileNotFoundError: If the directory holds no saved store
+        """
+        with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        return cls({relation: RelationGraph.load(directory, relation, mmap) for relation in meta}, meta)
+
+    def is_current(self, sources: Dict[str, str]) -> bool:
+        """Whether the store was built from these tables in their current state."""
+        for relation, path in sources.items():
+            recorded = self.meta.get(relation)
+            if recorded is None or recorded['source'] != os.path.abspath(path):
+                return False
+            try:
+                if source_signature(path) != {'size': recorded['size'], 'mtime_ns': recorded['mtime_ns']}:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def relation(self, name: str) -> RelationGraph:
+        if name not in self.graphs:
+            raise KeyError(f"Relation '{name}' is not in the store. Available relations: {sorted(self.graphs)}")
+        return self.graphs[name]
+
+    def videos_of_actress(self, actress_id: int) -> np.ndarray:
+        return self.relation('video-actresses').videos_of(actress_id)
+
+    def actresses_of_video(self, video_id: int) -> np.ndarray:
+        return self.relation('video-actresses').targets_of(video_id)
+
+    def co_stars(self, actress_id: int) -> List[Tuple[int, int]]:
+        """Return (actress ID, shared videos) pairs of the actresses who appear with an actress."""
+        return self.relation('video-actresses').co_occurring(actress_id)
+
+    def videos_of_genre(self, genre_id: int) -> np.ndarray:
+        return self.relation('video-genres').videos_of(genre_id)
+
+    def genres_of_video(self, video_id: int) -> np.ndarray:
+        return self.relation('video-genres').targets_of(video_id)
@@ -1,48 +1,61 @@
-import requests
-import os 
+import argparse
 import sys
-import json
 
-series = []
+from dmm_fetch import DEFAULT_CONCURRENCY, DEFAULT_HITS, DEFAULT_RATE, DmmFetcher, FetchError, credentials_from_env
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from http_cache import add_cache_arguments, cache_from_args
+from ndjson_io import NdjsonCheckpointWriter
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python series-fetch.py <output_json_path>")
+    parser = argparse.ArgumentParser(description="Fetch all series entries from the DMM SeriesSearch API as NDJSON.")
+    parser.add_argument('output_path', help='Output NDJSON path (one series per line)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an interrupted fetch')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f'Pages in flight at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help=f'Maximum requests per second (default: {DEFAULT_RATE})')
+    parser.add_argument('--hits', type=int, default=DEFAULT_HITS, help=f'Page size (default: {DEFAULT_HITS})')
+    parser.add_argument('--base-url', default=None, help='API base URL (default: DMM_API_BASE_URL or the public API)')
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    try:
+        cache = cache_from_args(args)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
+    app_id, affiliate_id = credentials_from_env(required=not args.offline)
 
-    output_path = sys.argv[1]
-    app_id = os.getenv("APP_ID")
-    affiliate_id = os.getenv("AFFILIATE_ID")
-    
-    if not app_id or not affiliate_id:
-        print("Please set the APP_ID and AFFILIATE_ID environment variables.")
+    try:
+        writer = NdjsonCheckpointWriter(args.output_path, args.hits, resume=args.resume)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
-        
-    base_url = f"https://api.dmm.com/affiliate/v3/SeriesSearch?api_id={app_id}&affiliate_id={affiliate_id}&floor_id=43&output=json"
-    page = 1
-    hits = 500
-    
-    while True:
-        url = f"{base_url}&hits={hits}&offset={((page - 1) * hits) + 1}"
-        print(f"Fetching page {page}...")
-        response = requests.get(url)
-        
-        if response.status_code != 200:
-            print(f"Error fetching data: {response.status_code}")
-            break
-        
-        data = response.json()
-        series_list = data.get("result", {}).get("series", [])
-        
-        if not series_list:
-            print("No more series found.")
-            break
-        
-        series.extend(series_list)
-        page += 1
-        
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump({"series": series}, f, ensure_ascii=False, indent=4)  
+
+    if writer.complete:
+        writer.close()
+        print(f"Fetch already complete with {writer.records} series in {args.output_path}")
+        return
+
+    if writer.next_offset > 1:
+        print(f"Resuming from offset {writer.next_offset} ({writer.records} series already fetched)...")
+
+    with DmmFetcher(app_id, affiliate_id, base_url=args.base_url, concurrency=args.concurrency, rate=args.rate,
+                    cache=cache) as fetcher:
+        try:
+            pages = fetcher.fetch_pages("SeriesSearch", "series", {"floor_id": 43}, hits=args.hits, start_offset=writer.next_offset)
+            for offset, series_list in pages:
+                print(f"Fetched page {(offset - 1) // args.hits + 1} ({len(series_list)} series)...")
+                writer.write_page(offset, series_list)
+                METRICS.count("records_written", len(series_list))
+        except FetchError as e:
+            writer.close()
+            print(e)
+            print(f"Rerun with --resume to continue from offset {writer.next_offset}.")
+            sys.exit(1)
+
+    writer.finish()
+    print(f"Fetched {writer.records} series to {args.output_path}")
 
 if __name__ == "__main__":
     main()
@@ -1,29 +1,31 @@
 """Generate CSV from a series CSV file with only id and name
 """
 
-import csv
 import sys
 
+from etl_metrics import METRICS, start_instrumentation
+from table_stream import assign_ids
+
 
 if len(sys.argv) != 3:
     print("Usage: python series-nameonly.py <input_csv_path> <output_csv_path>")
+    print("Equivalent to: python assign-ids.py --from '|' --no-ids --columns id,series_id,name <input_csv_path> <output_csv_path>")
     sys.exit(1)
 
 input_path = sys.argv[1]
 output_path = sys.argv[2]
 
-with open(input_path, "r", encoding="utf-8") as f:
-    reader = csv.DictReader(f, delimiter="|")
-    series = [row for row in reader]
+start_instrumentation()  # Configured with ETL_METRICS and ETL_PROFILE
+METRICS.add_file("read", input_path)
+
+row_count = assign_ids(input_path, output_path, from_delim="|", id_column=None,
+                       columns=["id", "series_id", "name"], lineterminator="\r\n")
 
-if not series:
+if not row_count:
     print("No series found in the input CSV.")
     sys.exit(0)
 
-with open(output_path, "w", encoding="utf-8", newline="") as f:
-    writer = csv.DictWriter(f, fieldnames=["id", "series_id", "name"], delimiter="|")
-    writer.writeheader()
-    for serie in series:
-        writer.writerow({"id": serie["id"], "series_id": serie["series_id"], "name": serie["name"]})
+METRICS.count("rows_written", row_count)
+METRICS.add_file("written", output_path)
 
 print(f"CSV written to {output_path}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Suggest known items for the names that video-actress-relation.py could not
+resolve, and draft an alias table from the best matches.
+
+Every name, ruby and display_name of the known items is indexed with a
+character n-gram inverted index (see name_index.py). For each name in a
+.tmp/video_*_not_found.tsv report the top-k candidate IDs are written with
+their scores, and the best candidate above --alias-min-score goes into a
+draft alias TSV with the name/alias/alias_id columns that the
+load_*_alias_table functions read. Review the draft before merging it into
+the alias table.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from name_index import DEFAULT_NGRAM, NgramIndex
+from tabular_io import TableReader
+
+# Per entity: known names table as written by the pipeline, its delimiter,
+# and the not-found report of video-actress-relation.py
+ENTITY_SOURCES = {
+    'actress': {'names': '.tmp/actress.csv', 'delimiter': ',', 'not_found': '.tmp/video_actresses_not_found.tsv'},
+    'genre': {'names': '.tmp/genre.csv', 'delimiter': ',', 'not_found': '.tmp/video_genres_not_found.tsv'},
+    'maker': {'names': '.tmp/maker.csv', 'delimiter': ',', 'not_found': '.tmp/video_makers_not_found.tsv'},
+    'series': {'names': '.tmp/series.csv', 'delimiter': '|', 'not_found': '.tmp/video_series_not_found.tsv'},
+}
+
+NAME_FIELDS = ('name', 'display_name', 'ruby')
+
+def build_index(names_path: str, delimiter: str, n: int) -> NgramIndex:
+    """Index the name variants of every item in a names table."""
+    index = NgramIndex(n)
+    try:
+        reader = TableReader(names_path, delimiter=delimiter)
+        fields = [field for field in NAME_FIELDS if field in reader.fieldnames]
+        for row in reader:
+            if not row.get('id'):
+                continue
+            item_id = int(row['id'])
+            for field in fields:
+                if row.get(field):
+                    index.add(item_id, row[field], field)
+    except FileNotFoundError:
+        print(f"Error: Names file '{names_path}' not found.")
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error reading names file '{names_path}': {e}")
+        sys.exit(1)
+    return index
+
+def load_not_found(not_found_path: str):
+    """
+    Load (name, number of videos) pairs from a not-found report.
+
+    Sampled reports (--not-found-samples) carry the exact number in their
+    count column; otherwise the listed videos are counted.
+    """
+    try:
+        with open(not_found_path, 'r', encoding='utf-8', newline='') as file:
+            return [
+                (row['name'], int(row['count']) if row.get('count') else
+                 len([video for video in row.get('not_found_videos', '').split(',') if video]))
+                for row in csv.DictReader(file, delimiter='\t')
+                if row['name'].strip()
+            ]
+    except FileNotFoundError:
+        print(f"Error: Not-found report '{not_found_path}' not found.")
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Suggest alias table entries for unresolved names with an n-gram index.')
+    parser.add_argument('--entity', required=True, choices=sorted(ENTITY_SOURCES), help='Entity type of the names')
+    parser.add_argument('--names', default=None, help='Known names table (default: the pipeline output in .tmp/)')
+    parser.add_argument('--delimiter', default=None, help='Delimiter of the names table (default: per entity)')
+    parser.add_argument('--not-found', default=None, help='Not-found report of video-actress-relation.py (default: per entity)')
+    parser.add_argument('--output', default=None, help='Suggestions TSV (default: .tmp/<entity>-alias-suggestions.tsv)')
+    parser.add_argument('--alias-output', default=None, help='Draft alias TSV (default: .tmp/<entity>-alias.draft.tsv)')
+    parser.add_argument('--top-k', type=int, default=5, help='Candidates per unresolved name (default: 5)')
+    parser.add_argument('--min-score', type=float, default=0.3, help='Minimum score of a candidate (default: 0.3)')
+    parser.add_argument('--alias-min-score', type=float, default=0.6,
+                        help='Minimum score for the draft alias table (default: 0.6)')
+    parser.add_argument('--ngram', type=int, default=DEFAULT_NGRAM, help=f'N-gram length (default: {DEFAULT_NGRAM})')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    source = ENTITY_SOURCES[args.entity]
+    names_path = args.names or source['names']
+    delimiter = (args.delimiter or source['delimiter']).encode().decode('unicode_escape')  # handle '\t'
+    not_found_path = args.not_found or source['not_found']
+    output_path = args.output or os.path.join('.tmp', f'{args.entity}-alias-suggestions.tsv')
+    alias_output_path = args.alias_output or os.path.join('.tmp', f'{args.entity}-alias.draft.tsv')
+
+    start = time.perf_counter()
+    with METRICS.timer('index'):
+        index = build_index(names_path, delimiter, args.ngram)
+    print(f"Indexed {len(index)} name variants of {len(index.canonical_names)} {args.entity} items "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    unresolved = load_not_found(not_found_path)
+    print(f"Loaded {len(unresolved)} unresolved names from {not_found_path}")
+
+    for path in (output_path, alias_output_path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    aliases = 0
+    with open(output_path, 'w', encoding='utf-8', newline='') as output_file, \
+         open(alias_output_path, 'w', encoding='utf-8', newline='') as alias_file:
+        writer = csv.writer(output_file, delimiter='\t', lineterminator='\n')
+        writer.writerow(['name', 'videos', 'rank', 'candidate_id', 'candidate_name', 'matched_field', 'score'])
+        alias_writer = csv.writer(alias_file, delimiter='\t', lineterminator='\n')
+        alias_writer.writerow(['name', 'alias', 'alias_id'])
+
+        with METRICS.timer('search'):
+            for name, videos in unresolved:
+                candidates = index.search(name, args.top_k, args.min_score)
+                for rank, candidate in enumerate(candidates, 1):
+                    writer.writerow([name, videos, rank, candidate.item_id, candidate.name, candidate.field, f"{candidate.score:.3f}"])
+
+                if candidates and candidates[0].score >= args.alias_min_score:
+                    best = candidates[0]
+                    alias_writer.writerow([index.canonical_name(best.item_id) or best.name, name, best.item_id])
+                    aliases += 1
+
+    seconds = time.perf_counter() - start
+    METRICS.count('names_searched', len(unresolved))
+    METRICS.count('aliases_drafted', aliases)
+
+    print(f"Searched {len(unresolved)} names in {seconds:.2f}s "
+          f"({seconds * 1000 / max(len(unresolved), 1):.2f} ms per name)")
+    print(f"Suggestions written to {output_path}")
+    print(f"Draft alias table with {aliases} entries written to {alias_output_path}")
+    if args.entity == 'actress':
+        print("Note: video-actress-relation.py has no actress alias option yet, the draft is for reference")
+
+if __name__ == '__main__':
+    main()
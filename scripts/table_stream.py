@@ -0,0 +1,173 @@
+"""
+Streaming ID assignment and column projection for delimited tables.
+
+Rows are read, numbered, projected and written one batch at a time, so
+memory use does not depend on the table size. Used by assign-ids.py and the
+*-addid.py / series-nameonly.py wrappers.
+"""
+
+import csv
+import itertools
+import os
+import signal
+import sys
+from typing import Iterator, List, Optional, Sequence
+
+from tabular_io import TableReader, TableWriter, format_for_path
+
+BATCH_ROWS = 10000
+
+def open_text(path: str, mode: str):
+    """Open a file, or stdin/stdout for "-", as UTF-8 text."""
+    if path == '-':
+        stream = sys.stdin if mode == 'r' else sys.stdout
+        return open(stream.fileno(), mode, encoding='utf-8', newline='', closefd=False)
+    return open(path, mode, encoding='utf-8', newline='')
+
+def exit_on_broken_pipe():
+    """
+    Exit quietly after the reader of stdout went away, e.g. with `- | head`.
+
+    stdout is pointed at /dev/null first, so the interpreter's final flush
+    does not raise again. The exit status is that of a process killed by
+    SIGPIPE, as the shell reports for `cat`.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(128 + signal.SIGPIPE)
+
+def max_id(path: str, id_column: str = 'id', delimiter: str = '\t') -> int:
+    """
+    Return the highest ID in an existing table, or 0 if it has no rows.
+
+    The table is streamed, so only the ID column is held at a time.
+
+    Raises:
+        KeyError: If the table has no such column
+    """
+    reader = TableReader(path, delimiter=delimiter)
+    if id_column not in reader.fieldnames:
+        raise KeyError(f"Column '{id_column}' not found in {path}. Available columns: {reader.fieldnames}")
+    return max((int(row[id_column]) for row in reader if row[id_column]), default=0)
+
+def read_rows(input_path: str, delimiter: str):
+    """
+    Open a table as (header, row iterator) with rows as lists.
+
+    Blank lines are skipped, as csv.DictReader does, and short rows are
+    padded with empty fields up to the header width.
+    """
+    if input_path != '-' and format_for_path(input_path) != 'tsv':
+        reader = TableReader(input_path)
+        header = list(reader.fieldnames)
+        return header, ([row[column] for column in header] for row in reader), None
+
+    file = open_text(input_path, 'r')
+    reader = csv.reader(file, delimiter=delimiter)
+    header = next((row for row in reader if row), [])
+    width = len(header)
+    rows = (row + [''] * (width - len(row)) if len(row) < width else row for row in reader if row)
+    return header, rows, file
+
+def output_columns(header: List[str], id_column: Optional[str], columns: Optional[Sequence[str]],
+                   drop: Sequence[str]) -> List[str]:
+    """
+    Work out the output columns.
+
+    Args:
+        header: Input columns
+        id_column: Column receiving the sequential IDs, or None to keep IDs
+        columns: Columns to keep, in output order (default: all)
+        drop: Columns to leave out
+
+    Returns:
+        Output column names; a new ID column goes first
+
+    Raises:
+        KeyError: If a requested column does not exist
+    """
+    selected = list(columns) if columns else list(header)
+    missing = [column for column in list(selected) + list(drop) if column not in header and column != id_column]
+    if missing:
+        raise KeyError(f"Columns {missing} not found. Available columns: {header}")
+
+    selected = [column for column in selected if column not in drop]
+    if id_column and id_column not in selected:
+        selected.insert(0, id_column)
+    return selected
+
+def assign_ids(
+    input_path: str,
+    output_path: str,
+    from_delim: str = ',',
+    to_delim: Optional[str] = None,
+    id_column: Optional[str] = 'id',
+    start_id: int = 1,
+    columns: Optional[Sequence[str]] = None,
+    drop: Sequence[str] = (),
+    append: bool = False,
+    schema: Optional[str] = None,
+    lineterminator: str = '\n'
+) -> int:
+    """
+    Copy a table in one pass, numbering rows, projecting columns and changing the delimiter.
+
+    An existing ID column is overwritten in place; otherwise the new ID
+    column is added first.
+
+    Args:
+        input_path: Input table, or "-" for stdin
+        output_path: Output table, or "-" for stdout
+        from_delim: Delimiter of a text input
+        to_delim: Delimiter of a text output (default: from_delim)
+        id_column: Column receiving sequential IDs, or None to keep the rows' IDs
+        start_id: First ID to assign
+        columns: Columns to keep, in output order (default: all)
+        drop: Columns to leave out
+        append: Append rows to an existing text output without a header
+        schema: Dataset schema for the column types of .parquet/.arrow output
+        lineterminator: Line terminator of a text output
+
+    Returns:
+        Number of rows written
+    """
+    to_delim = to_delim or from_delim
+    header, rows, file = read_rows(input_path, from_delim)
+    try:
+        selected = output_columns(header, id_column, columns, drop)
+        positions = {column: index for index, column in enumerate(header)}
+        indexes = [positions.get(column, -1) for column in selected]
+        id_position = selected.index(id_column) if id_column else -1
+
+        def project(numbered_rows) -> Iterator[list]:
+            for item_id, row in numbered_rows:
+                values = [row[index] if index >= 0 else '' for index in indexes]
+                if id_position >= 0:
+                    values[id_position] = item_id
+                yield values
+
+        numbered = zip(itertools.count(start_id), rows)
+
+        if output_path != '-' and format_for_path(output_path) != 'tsv':
+            if append:
+                raise ValueError("--append only works with text output")
+            with TableWriter(output_path, selected, schema=schema) as writer:
+                writer.writerows(project(numbered))
+            return writer.rows_written
+
+        write_header = not (append and output_path != '-' and os.path.exists(output_path) and os.path.getsize(output_path))
+        row_count = 0
+        with open_text(output_path, 'a' if append else 'w') as out:
+            writer = csv.writer(out, delimiter=to_delim, lineterminator=lineterminator)
+            if write_header:
+                writer.writerow(selected)
+            projected = project(numbered)
+            while True:
+                batch = list(itertools.islice(projected, BATCH_ROWS))
+                if not batch:
+                    return row_count
+                writer.writerows(batch)
+                row_count += len(batch)
+    finally:
+        if file is not None:
+            file.close()
@@ -0,0 +1,233 @@
+"""
+Table readers and writers for the pipeline scripts, in delimited text
+(TSV/CSV), Parquet or Arrow IPC format.
+
+Parquet files are zstd-compressed and typed with the column dtypes from
+dataset_schema. Arrow IPC files are written uncompressed so they can be
+memory-mapped, which suits the two int32 columns of the relation files.
+pyarrow is only needed for the Parquet and Arrow formats.
+"""
+
+import csv
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from dataset_schema import CATEGORY, ID, MEASUREMENT, SCHEMAS
+
+FORMATS = ('tsv', 'parquet', 'arrow')
+
+FORMAT_EXTENSIONS = {
+    'tsv': '.tsv',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+BATCH_SIZE = 65536
+
+def format_for_path(path: str) -> str:
+    """Pick the table format from a file extension; anything else is delimited text."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return 'parquet'
+    if extension in ('.arrow', '.feather', '.ipc'):
+        return 'arrow'
+    return 'tsv'
+
+def with_format_extension(path: str, table_format: str) -> str:
+    """Replace the extension of a text output path to match the table format."""
+    if table_format == 'tsv':
+        return path
+    return os.path.splitext(path)[0] + FORMAT_EXTENSIONS[table_format]
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet and Arrow files (pip install pyarrow)")
+    return pyarrow
+
+def arrow_schema(columns: List[str], schema: Optional[str] = None):
+    """
+    Build the Arrow schema for a table from its dataset schema.
+
+    Columns that the dataset schema does not declare are stored as strings.
+    """
+    pa = _import_pyarrow()
+    dtypes = SCHEMAS.get(schema, {}) if schema else {}
+    types = {
+        ID: pa.int32(),
+        MEASUREMENT: pa.float32(),
+        CATEGORY: pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema([(column, types.get(dtypes.get(column), pa.string())) for column in columns])
+
+def _converter(arrow_type):
+    """Return a function converting text or Python values to an Arrow column type; empty values become null."""
+    pa = _import_pyarrow()
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_integer(arrow_type):
+        cast = int
+    elif pa.types.is_floating(arrow_type):
+        cast = float
+    else:
+        cast = str
+    return lambda value: None if value is None or value == '' else cast(value)
+
+class TableWriter:
+    """
+    Write rows to a table file, with the csv.writer interface.
+
+    Rows can be lists in column order or dictionaries keyed by column name.
+    """
+
+    def __init__(self, path: str, columns: List[str], table_format: Optional[str] = None,
+                 schema: Optional[str] = None, write_header: bool = True, **csv_kwargs):
+        """
+        Args:
+            path: Output file path
+            columns: Column names
+            table_format: 'tsv', 'parquet' or 'arrow' (default: from the extension)
+            schema: Dataset schema name for the column types of binary formats
+            write_header: Whether to write the header row of text files
+            **csv_kwargs: csv.writer arguments for text files, e.g. delimiter
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.format = table_format or format_for_path(path)
+        self.rows_written = 0
+
+        if self.format == 'tsv':
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file, **csv_kwargs)
+            if write_header:
+                self.writer.writerow(self.columns)
+            return
+
+        pa = _import_pyarrow()
+        self.schema = arrow_schema(self.columns, schema)
+        self.converters = [_converter(field.type) for field in self.schema]
+        self.batch: List[List[Any]] = [[] for _ in self.columns]
+        if self.format == 'parquet':
+            self.writer = pa.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def writerow(self, row):
+        """Write one row."""
+        if isinstance(row, dict):
+            row = [row.get(column, '') for column in self.columns]
+        self.rows_written += 1
+
+        if self.format == 'tsv':
+            self.writer.writerow(row)
+            return
+
+        for values, value, convert in zip(self.batch, row, self.converters):
+            values.append(convert(value))
+        if len(self.batch[0]) >= BATCH_SIZE:
+            self._flush()
+
+    def writerows(self, rows):
+        """Write several rows."""
+        for row in rows:
+            self.writerow(row)
+
+    def _flush(self):
+        if not self.batch[0]:
+            return
+        pa = _import_pyarrow()
+        arrays = [pa.array(values, type=field.type) for values, field in zip(self.batch, self.schema)]
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.batch = [[] for _ in self.columns]
+
+    def close(self):
+        """Flush buffered rows and close the file."""
+        if self.format == 'tsv':
+            self.file.close()
+            return
+        self._flush()
+        self.writer.close()
+
+def _to_text(value: Any) -> str:
+    """Convert a value read from a binary table back to its text form."""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+class TableReader:
+    """
+    Read rows from a table file as dictionaries of strings, like csv.DictReader.
+
+    Values from Parquet and Arrow files are converted to text, with nulls as
+    empty strings, so callers handle every format the same way.
+    """
+
+    def __init__(self, path: str, delimiter: str = '\t', table_format: Optional[str] = None):
+        """
+        Args:
+            path: Input file path
+            delimiter: Delimiter of text files
+            table_format: 'tsv', 'parquet' or 'arrow' (default: from the extension)
+        """
+        self.path = path
+        self.delimiter = delimiter
+        self.format = table_format or format_for_path(path)
+        self.fieldnames = read_columns(path, self.format, delimiter)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        if self.format == 'tsv':
+            with open(self.path, 'r', encoding='utf-8', newline='') as file:
+                yield from csv.DictReader(file, delimiter=self.delimiter)
+            return
+
+        for batch in iter_record_batches(self.path, self.format):
+            for row in batch.to_pylist():
+                yield {key: _to_text(value) for key, value in row.items()}
+
+def read_columns(path: str, table_format: Optional[str] = None, delimiter: str = '\t') -> List[str]:
+    """Read the column names of a table file."""
+    table_format = table_format or format_for_path(path)
+    if table_format == 'tsv':
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            return next(csv.reader(file, delimiter=delimiter), [])
+
+    pa = _import_pyarrow()
+    if table_format == 'parquet':
+        return pa.parquet.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+def iter_record_batches(path: str, table_format: Optional[str] = None):
+    """Iterate over the record batches of a Parquet or Arrow file."""
+    pa = _import_pyarrow()
+    table_format = table_format or format_for_path(path)
+    if table_format == 'parquet':
+        yield from pa.parquet.ParquetFile(path).iter_batches(batch_size=BATCH_SIZE)
+        return
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+def read_table(path: str):
+    """
+    Read a whole Parquet or Arrow file as a pyarrow Table.
+
+    Arrow files are memory-mapped, so their columns are not copied into memory.
+    """
+    pa = _import_pyarrow()
+    if format_for_path(path) == 'parquet':
+        return pa.parquet.read_table(path)
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
@@ -0,0 +1,26 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts import their helper modules (dmm_fetch, etl_metrics, ...) by name
+sys.path.insert(0, SCRIPTS_DIR)
+
+@pytest.fixture(scope='session')
+def load_script():
+    """Import a hyphenated CLI script, e.g. video-fetch.py, as a module."""
+    modules = {}
+
+    def load(filename):
+        if filename not in modules:
+            name = os.path.splitext(filename)[0].replace('-', '_')
+            spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            modules[filename] = module
+        return modules[filename]
+
+    return load
@@ -0,0 +1,186 @@
+"""
+Tests for the DmmFetcher pagination, retries and rate limit, against a stub
+HTTP server that plays back scripted responses.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import dmm_fetch
+from dmm_fetch import DmmFetcher, FetchError, RateLimiter
+
+class StubApi:
+    """
+    Stub DMM API on a local port.
+
+    Every request is recorded with its time. The response comes from the
+    `responses` queue while it has entries, and from `handler` otherwise.
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler or (lambda path, query: (200, {'result': {}}))
+        self.responses = []
+        self.requests = []
+        self.lock = threading.Lock()
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                with api.lock:
+                    api.requests.append((time.monotonic(), parts.path, query))
+                    scripted = api.responses.pop(0) if api.responses else None
+                status, body = scripted or api.handler(parts.path, query)
+                data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def offsets(self):
+        return [int(query['offset']) for _, _, query in self.requests]
+
+def maker_pages(total, with_total_count=True):
+    """Return a handler serving `total` makers in pages of the requested size."""
+    def handler(path, query):
+        offset, hits = int(query['offset']), int(query['hits'])
+        makers = [{'maker_id': i, 'name': f"maker{i}"} for i in range(offset, min(offset + hits, total + 1))]
+        result = {'result_count': len(makers), 'first_position': offset, 'maker': makers}
+        if with_total_count:
+            result['total_count'] = total
+        return 200, {'request': {'parameters': query}, 'result': result}
+    return handler
+
+def make_fetcher(api, **kwargs):
+    options = {'concurrency': 3, 'rate': 0, 'retries': 3, 'backoff': 0.001, 'timeout': 5}
+    options.update(kwargs)
+    return DmmFetcher('app', 'affiliate', base_url=api.base_url, **options)
+
+def test_fetch_pages_walks_the_offsets_in_order():
+    with StubApi(maker_pages(250)) as api, make_fetcher(api) as fetcher:
+        pages = list(fetcher.fetch_pages('MakerSearch', 'maker', {'floor_id': 43}, hits=100))
+
+    assert [offset for offset, _ in pages] == [1, 101, 201]
+    assert [maker['maker_id'] for _, makers in pages for maker in makers] == list(range(1, 251))
+    assert sorted(api.offsets()) == [1, 101, 201]
+    for _, path, query in api.requests:
+        assert path == '/MakerSearch'
+        assert query['floor_id'] == '43'
+        assert query['api_id'] == 'app' and query['affiliate_id'] == 'affiliate'
+
+def test_fetch_pages_resumes_from_start_offset():
+    with StubApi(maker_pages(250)) as api, make_fetcher(api) as fetcher:
+        pages = list(fetcher.fetch_pages('MakerSearch', 'maker', hits=100, start_offset=101))
+
+    assert [offset for offset, _ in pages] == [101, 201]
+    assert sorted(api.offsets()) == [101, 201]
+
+def test_fetch_pages_without_total_count_stops_at_the_empty_page():
+    with StubApi(maker_pages(250, with_total_count=False)) as api, make_fetcher(api) as fetcher:
+        pages = list(fetcher.fetch_pages('MakerSearch', 'maker', hits=100))
+
+    assert [offset for offset, _ in pages] == [1, 101, 201]
+    assert sum(len(makers) for _, makers in pages) == 250
+
+def test_fetch_pages_with_no_results_yields_nothing():
+    with StubApi(maker_pages(0)) as api, make_fetcher(api) as fetcher:
+        assert list(fetcher.fetch_pages('MakerSearch', 'maker', hits=100)) == []
+    assert api.offsets() == [1]
+
+def test_request_retries_429_and_503():
+    with StubApi(maker_pages(5)) as api, make_fetcher(api) as fetcher:
+        api.responses = [(429, {}), (503, {})]
+        result = fetcher.request('MakerSearch', {'hits': 10, 'offset': 1})
+
+    assert len(result['maker']) == 5
+    assert len(api.requests) == 3
+
+def test_request_backs_off_exponentially(monkeypatch):
+    # Take the top of the full-jitter range so the delays are deterministic
+    bounds = []
+    monkeypatch.setattr(dmm_fetch.random, 'uniform', lambda low, high: bounds.append((low, high)) or high)
+    with StubApi(maker_pages(5)) as api, make_fetcher(api, backoff=0.05) as fetcher:
+        api.responses = [(503, {}), (429, {}), (503, {})]
+        fetcher.request('MakerSearch', {'hits': 10, 'offset': 1})
+
+    assert bounds == [(0, 0.05), (0, 0.1), (0, 0.2)]
+    times = [request_time for request_time, _, _ in api.requests]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert all(gap >= high for gap, (_, high) in zip(gaps, bounds))
+
+def test_request_gives_up_after_the_retries():
+    with StubApi(lambda path, query: (503, {})) as api, make_fetcher(api, retries=2) as fetcher:
+        with pytest.raises(FetchError, match='HTTP 503'):
+            fetcher.request('MakerSearch', {'hits': 10, 'offset': 1})
+
+    assert len(api.requests) == 3
+
+def test_request_does_not_retry_a_client_error():
+    with StubApi(lambda path, query: (404, {})) as api, make_fetcher(api) as fetcher:
+        with pytest.raises(FetchError, match='HTTP 404'):
+            fetcher.request('MakerSearch', {'hits': 10, 'offset': 1})
+
+    assert len(api.requests) == 1
+
+@pytest.mark.parametrize('body', [b'{"result": {"maker": [', b'<html><body>Service Unavailable</body></html>'])
+def test_request_raises_fetch_error_on_invalid_json(body):
+    with StubApi(lambda path, query: (200, body)) as api, make_fetcher(api, retries=1) as fetcher:
+        with pytest.raises(FetchError, match='invalid JSON'):
+            fetcher.request('MakerSearch', {'hits': 10, 'offset': 1})
+
+    assert len(api.requests) == 2
+
+def test_request_retries_invalid_json():
+    with StubApi(maker_pages(5)) as api, make_fetcher(api) as fetcher:
+        api.responses = [(200, b'{"result": ')]
+        result = fetcher.request('MakerSearch', {'hits': 10, 'offset': 1})
+
+    assert len(result['maker']) == 5
+    assert len(api.requests) == 2
+
+def test_fetch_pages_keeps_to_the_rate_limit():
+    rate = 20.0
+    with StubApi(maker_pages(60)) as api, make_fetcher(api, concurrency=4, rate=rate) as fetcher:
+        pages = list(fetcher.fetch_pages('MakerSearch', 'maker', hits=10))
+
+    assert len(pages) == 6
+    times = sorted(request_time for request_time, _, _ in api.requests)
+    # Requests are spaced 1/rate apart when they leave; allow for scheduling jitter
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.9
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(50.0)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+    assert time.monotonic() - start >= 5 / 50.0 * 0.9
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter(0)
+    start = time.monotonic()
+    for _ in range(100):
+        limiter.wait()
+    assert time.monotonic() - start < 0.1
@@ -0,0 +1,65 @@
+"""Tests for the not found name tracking of not_found_report.py."""
+
+import random
+from collections import Counter
+
+from not_found_report import NotFoundTracker, SpaceSaving
+
+def zipf_stream(seed, length, names=500):
+    generator = random.Random(seed)
+    weights = [1 / rank for rank in range(1, names + 1)]
+    return generator.choices([f"name{rank}" for rank in range(names)], weights, k=length)
+
+def sketch_of(stream, capacity):
+    sketch = SpaceSaving(capacity)
+    for item in stream:
+        sketch.add(item)
+    return sketch
+
+def assert_bounds(sketch, counts, total):
+    for item, (count, error) in sketch.counters.items():
+        # Every count overestimates, by at most its error
+        assert count - error <= counts[item] <= count, item
+    tracked = set(sketch.counters)
+    for item, count in counts.items():
+        if count > total / sketch.capacity:
+            assert item in tracked, item
+
+def test_space_saving_bounds():
+    stream = zipf_stream(1, 5000)
+    assert_bounds(sketch_of(stream, 20), Counter(stream), len(stream))
+
+def test_space_saving_merge_keeps_the_bounds():
+    # Shards see different name mixes, so items evicted from one are tracked by the other
+    first = zipf_stream(2, 4000)
+    second = list(reversed(zipf_stream(3, 3000, names=300)))
+    second = [f"{name}b" if index % 3 else name for index, name in enumerate(second)]
+
+    merged = sketch_of(first, 20)
+    merged.merge(sketch_of(second, 20))
+
+    assert len(merged.counters) == 20
+    assert_bounds(merged, Counter(first) + Counter(second), len(first) + len(second))
+
+def test_space_saving_merge_into_empty_sketch_is_a_copy():
+    stream = zipf_stream(4, 2000)
+    shard = sketch_of(stream, 15)
+    merged = SpaceSaving(15)
+    merged.merge(shard)
+    assert merged.counters == shard.counters
+
+def test_sharded_tracker_matches_serial_counts():
+    stream = zipf_stream(5, 3000)
+    serial = NotFoundTracker(sample_size=3, max_names=1000, top_k=5)
+    shards = [serial.empty_copy() for _ in range(3)]
+    for index, name in enumerate(stream):
+        serial.add(name, f"video{index}")
+        shards[index % 3].add(name, f"video{index}")
+
+    merged = serial.empty_copy()
+    for shard in shards:
+        merged.merge(shard)
+
+    # Ties are ordered by first appearance, which differs between shards
+    assert sorted(merged.rows()) == sorted(serial.rows())
+    assert merged.top_offenders() == serial.top_offenders()
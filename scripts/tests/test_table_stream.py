@@ -0,0 +1,39 @@
+"""Tests for the streaming ID assignment of table_stream.py."""
+
+import csv
+
+from table_stream import assign_ids
+
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write(text)
+
+def read_table(path, delimiter=','):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return list(csv.reader(file, delimiter=delimiter))
+
+def test_assign_ids_numbers_rows_in_order(tmp_path):
+    write_text(tmp_path / 'genre.csv', 'name,genre_id\nDrama,10\nComedy,11\n')
+
+    row_count = assign_ids(str(tmp_path / 'genre.csv'), str(tmp_path / 'out.csv'), ',')
+
+    assert row_count == 2
+    assert read_table(tmp_path / 'out.csv') == [['id', 'name', 'genre_id'], ['1', 'Drama', '10'], ['2', 'Comedy', '11']]
+
+def test_assign_ids_skips_blank_lines(tmp_path):
+    # csv.DictReader, which the *-addid.py scripts used, skips blank lines too
+    write_text(tmp_path / 'genre.csv', '\nname,genre_id\nDrama,10\n\n\nComedy,11\n\r\nAction,12\n\n')
+
+    row_count = assign_ids(str(tmp_path / 'genre.csv'), str(tmp_path / 'out.csv'), ',', start_id=5)
+
+    assert row_count == 3
+    assert read_table(tmp_path / 'out.csv') == [
+        ['id', 'name', 'genre_id'], ['5', 'Drama', '10'], ['6', 'Comedy', '11'], ['7', 'Action', '12'],
+    ]
+
+def test_assign_ids_pads_short_rows(tmp_path):
+    write_text(tmp_path / 'series.tsv', 'series_id\tname\tnote\n1\tFirst\n2\tSecond\tx\n')
+
+    assign_ids(str(tmp_path / 'series.tsv'), str(tmp_path / 'out.tsv'), '\t', id_column=None, columns=['name', 'note'])
+
+    assert read_table(tmp_path / 'out.tsv', '\t') == [['name', 'note'], ['First', ''], ['Second', 'x']]
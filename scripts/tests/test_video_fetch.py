@@ -0,0 +1,131 @@
+"""
+Tests for the release-date windows of video-fetch.py against the catalogue
+of dmm-stub-server.py.
+"""
+
+import csv
+import os
+import threading
+from argparse import Namespace
+from datetime import date, datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from dmm_fetch import DmmFetcher
+
+START = date(2024, 1, 1)
+END = date(2024, 12, 31)
+VIDEOS = 600
+MAX_OFFSET = 200
+HITS = 100
+
+@pytest.fixture(scope='module')
+def video_fetch(load_script):
+    return load_script('video-fetch.py')
+
+@pytest.fixture(scope='module')
+def stub(load_script):
+    """The stub API serving VIDEOS items released in 2024, with offsets up to MAX_OFFSET."""
+    server_module = load_script('dmm-stub-server.py')
+    catalogue = server_module.Catalogue(VIDEOS, 10, 1, datetime.combine(START, datetime.min.time()),
+                                        datetime.combine(END, datetime.min.time()) + timedelta(days=1))
+    args = Namespace(max_offset=MAX_OFFSET, error_rate=0.0, latency=0.0)
+    handler, _ = server_module.make_handler(catalogue, args)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield Namespace(base_url=f"http://127.0.0.1:{server.server_address[1]}/affiliate/v3", catalogue=catalogue)
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fetcher(stub):
+    with DmmFetcher('app', 'affiliate', base_url=stub.base_url, concurrency=2, rate=0, backoff=0.001) as fetcher:
+        yield fetcher
+
+def record_requests(fetcher, monkeypatch):
+    """Record the query parameters of every request the fetcher makes."""
+    requests = []
+    request = fetcher.request
+
+    def recording_request(endpoint, params):
+        requests.append(dict(params))
+        return request(endpoint, params)
+
+    monkeypatch.setattr(fetcher, 'request', recording_request)
+    return requests
+
+def read_rows(path):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return list(csv.reader(file, delimiter='\t'))
+
+def test_window_over_the_offset_cap_is_split(video_fetch, stub, fetcher, tmp_path):
+    window_fetcher = video_fetch.WindowFetcher(fetcher, str(tmp_path), HITS, MAX_OFFSET)
+    year = video_fetch.initial_windows(START, END, 366)
+    assert len(year) == 1
+
+    # 600 items do not fit the 300 reachable with offsets up to 200
+    assert window_fetcher.process(year[0]) == year[0].split()
+    assert not os.listdir(tmp_path)
+
+    done = window_fetcher.run(year, jobs=2)
+
+    assert len(done) > 1
+    covered = sorted(done)
+    assert covered[0].start == year[0].start and covered[-1].end == year[0].end
+    for earlier, later in zip(covered, covered[1:]):
+        assert later.start == earlier.end + timedelta(seconds=1)
+    for window in done:
+        assert len(read_rows(window_fetcher.part_path(window))) <= window_fetcher.capacity
+
+    output_path = str(tmp_path / 'video.tsv')
+    result = video_fetch.merge_parts([window_fetcher.part_path(window) for window in sorted(done, reverse=True)],
+                                     output_path)
+    assert result == {'rows': VIDEOS, 'duplicates': 0}
+    rows = read_rows(output_path)
+    assert rows[0] == video_fetch.VIDEO_COLUMNS
+    assert [row[3] for row in rows[1:]] == [item['content_id'] for item in stub.catalogue.items]
+    assert [row[0] for row in rows[1:]] == [str(i) for i in range(1, VIDEOS + 1)]
+
+def test_resume_skips_finished_windows(video_fetch, fetcher, tmp_path, monkeypatch):
+    windows = video_fetch.initial_windows(START, date(2024, 3, 31), 31)
+    window_fetcher = video_fetch.WindowFetcher(fetcher, str(tmp_path), HITS, MAX_OFFSET)
+    assert sorted(window_fetcher.run(windows, jobs=2)) == windows
+
+    # An interrupted run leaves some part files behind, and maybe a partial .tmp
+    missing = windows[1]
+    os.remove(window_fetcher.part_path(missing))
+    with open(window_fetcher.part_path(missing) + '.tmp', 'w', encoding='utf-8') as file:
+        file.write('partial\n')
+
+    requests = record_requests(fetcher, monkeypatch)
+    assert sorted(window_fetcher.run(windows, jobs=2)) == windows
+
+    assert requests
+    assert {(params['gte_date'], params['lte_date']) for params in requests} == {
+        (missing.params()['gte_date'], missing.params()['lte_date'])
+    }
+    assert read_rows(window_fetcher.part_path(missing)) and ['partial'] not in read_rows(window_fetcher.part_path(missing))
+
+def test_overlapping_windows_are_deduplicated(video_fetch, stub, fetcher, tmp_path):
+    window_fetcher = video_fetch.WindowFetcher(fetcher, str(tmp_path), HITS, MAX_OFFSET)
+    first = video_fetch.Window(datetime(2024, 1, 1), datetime(2024, 2, 29, 23, 59, 59))
+    second = video_fetch.Window(datetime(2024, 2, 1), datetime(2024, 3, 31, 23, 59, 59))
+    window_fetcher.run([first, second], jobs=2)
+
+    def content_ids(window):
+        return [item['content_id'] for item in stub.catalogue.items
+                if window.start <= datetime.fromisoformat(item['date']) <= window.end]
+
+    overlap = set(content_ids(first)) & set(content_ids(second))
+    assert overlap
+
+    output_path = str(tmp_path / 'video.tsv')
+    result = video_fetch.merge_parts([window_fetcher.part_path(second), window_fetcher.part_path(first)], output_path)
+
+    union = content_ids(second) + [content_id for content_id in content_ids(first) if content_id not in overlap]
+    assert result == {'rows': len(union), 'duplicates': len(overlap)}
+    rows = read_rows(output_path)[1:]
+    assert [row[3] for row in rows] == union
+    assert [row[0] for row in rows] == [str(i) for i in range(1, len(union) + 1)]
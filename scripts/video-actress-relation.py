@@ -5,10 +5,20 @@ and optionally create a new video TSV dataset.
 """
 
 import csv
+import json
+import os
 import sys
 import re
+import shutil
 import argparse
-from typing import Dict, List, Tuple, Optional
+import tempfile
+import multiprocessing
+from contextlib import ExitStack
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Optional
+
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from not_found_report import DEFAULT_MAX_NAMES, DEFAULT_TOP_K, NotFoundTracker
+from tabular_io import FORMATS, TableReader, TableWriter, format_for_path, with_format_extension
 
 def load_actress_data(actress_csv_path: str) -> Dict[str, int]:
     """
@@ -23,18 +33,18 @@ def load_actress_data(actress_csv_path: str) -> Dict[str, int]:
     actress_name_to_id = {}
 
     try:
-        with open(actress_csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                actress_id = int(row['id'])
-                name = row['name'].strip()
-                display_name = row['display_name'].strip()
-
-                # Add both name and display_name to the mapping
-                if name:
-                    actress_name_to_id[name] = actress_id
-                if display_name and display_name != name:
-                    actress_name_to_id[display_name] = actress_id
+        # actress-fetch.py writes TSV, the scraped actress data is CSV
+        delimiter = '\t' if actress_csv_path.endswith('.tsv') else ','
+        for row in TableReader(actress_csv_path, delimiter=delimiter):
+            actress_id = int(row['id'])
+            name = row['name'].strip()
+            display_name = row['display_name'].strip()
+
+            # Add both name and display_name to the mapping
+            if name:
+                actress_name_to_id[name] = actress_id
+            if display_name and display_name != name:
+                actress_name_to_id[display_name] = actress_id
 
     except FileNotFoundError:
         print(f"Error: Actress CSV file '{actress_csv_path}' not found.")
@@ -59,18 +69,16 @@ def load_genre_data(genre_csv_path: str) -> Dict[str, int]:
     genre_name_to_id = {}
 
     try:
-        with open(genre_csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                genre_id = int(row['id'])
-                name = row['name'].strip()
-                display_name = row.get('display_name', '').strip()
+        for row in TableReader(genre_csv_path, delimiter=','):
+            genre_id = int(row['id'])
+            name = row['name'].strip()
+            display_name = row.get('display_name', '').strip()
 
-                # Add both name and display_name to the mapping
-                if name:
-                    genre_name_to_id[name] = genre_id
-                if display_name and display_name != name:
-                    genre_name_to_id[display_name] = genre_id
+            # Add both name and display_name to the mapping
+            if name:
+                genre_name_to_id[name] = genre_id
+            if display_name and display_name != name:
+                genre_name_to_id[display_name] = genre_id
 
     except FileNotFoundError:
         print(f"Error: Genre CSV file '{genre_csv_path}' not found.")
@@ -95,17 +103,15 @@ def load_maker_data(maker_csv_path: str) -> Dict[str, int]:
     maker_name_to_id = {}
 
     try:
-        with open(maker_csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                maker_id = int(row['id'])
-                name = row['name'].strip()
-                display_name = row.get('display_name', '').strip()
+        for row in TableReader(maker_csv_path, delimiter=','):
+            maker_id = int(row['id'])
+            name = row['name'].strip()
+            display_name = row.get('display_name', '').strip()
 
-                if name:
-                    maker_name_to_id[name] = maker_id
-                if display_name and display_name != name:
-                    maker_name_to_id[display_name] = maker_id
+            if name:
+                maker_name_to_id[name] = maker_id
+            if display_name and display_name != name:
+                maker_name_to_id[display_name] = maker_id
 
     except FileNotFoundError:
         print(f"Error: Maker CSV file '{maker_csv_path}' not found.")
@@ -204,237 +210,579 @@ def parse_comma_separated_string(input_string: str) -> List[str]:
 
     return items
 
-def find_item_id(item_name: str, item_mapping: Dict[str, int]) -> Optional[int]:
+MATCH_TIERS = ('exact', 'case_insensitive', 'paren_stripped', 'alias')
+
+class NameResolver:
+    """
+    Resolve item names to IDs through precomputed lookup tables.
+
+    The tables are built once per entity type, so every tier is a dictionary
+    lookup instead of a scan over the whole mapping. Tiers are tried in order:
+    exact name, case-insensitive name, name with parenthesized parts removed,
+    and finally the alias table.
+    """
+
+    def __init__(self, item_type: str, item_mapping: Dict[str, int],
+                 alias_map: Optional[Dict[str, Tuple[str, int]]] = None):
+        """
+        Args:
+            item_type: Type of items (for reporting)
+            item_mapping: Dictionary mapping names to IDs
+            alias_map: Optional mapping from alias name to (canonical name, id)
+        """
+        self.item_type = item_type
+        self.exact = dict(item_mapping)
+
+        # Keep the first name for each casefolded key, like the old scan did
+        self.casefolded: Dict[str, int] = {}
+        for name, item_id in item_mapping.items():
+            self.casefolded.setdefault(name.casefold(), item_id)
+
+        self.aliases: Dict[str, int] = {}
+        for alias, (_, alias_id) in (alias_map or {}).items():
+            self.aliases[alias] = alias_id
+
+        self.tier_hits: Dict[str, int] = {tier: 0 for tier in MATCH_TIERS}
+        self.misses = 0
+        self._cache: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+
+    def _lookup(self, item_name: str) -> Tuple[Optional[int], Optional[str]]:
+        if item_name in self.exact:
+            return self.exact[item_name], 'exact'
+
+        item_id = self.casefolded.get(item_name.casefold())
+        if item_id is not None:
+            return item_id, 'case_insensitive'
+
+        # Names with parentheses or variations, e.g. "Name (Old Name)"
+        item_name_clean = re.sub(r'\([^)]*\)', '', item_name).strip()
+        if item_name_clean != item_name and item_name_clean in self.exact:
+            return self.exact[item_name_clean], 'paren_stripped'
+
+        if item_name in self.aliases:
+            return self.aliases[item_name], 'alias'
+
+        return None, None
+
+    def resolve(self, item_name: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Find item ID by name and report which match tier it came from.
+
+        Args:
+            item_name: Name to search for
+
+        Returns:
+            Tuple of (item ID, match tier), or (None, None) if not found
+        """
+        result = self._cache.get(item_name)
+        if result is None:
+            result = self._lookup(item_name)
+            self._cache[item_name] = result
+
+        if result[1] is None:
+            self.misses += 1
+        else:
+            self.tier_hits[result[1]] += 1
+        return result
+
+    def reset_stats(self):
+        """Reset the per-tier hit and miss counters."""
+        self.tier_hits = {tier: 0 for tier in MATCH_TIERS}
+        self.misses = 0
+
+    def find(self, item_name: str) -> Optional[int]:
+        """Find item ID by name, returning None if no tier matches."""
+        return self.resolve(item_name)[0]
+
+    def print_summary(self):
+        """Print lookup hits per match tier."""
+        hits = ', '.join(f"{tier}={count}" for tier, count in self.tier_hits.items())
+        print(f"{self.item_type} lookups: {hits}, not_found={self.misses}")
+
+RELATION_TYPES = ('actress', 'genre', 'maker', 'series')
+
+# Dataset schema of each relation file, for typed Parquet/Arrow output
+RELATION_SCHEMAS = {
+    'actress': 'video-actresses',
+    'genre': 'video-genres',
+    'maker': 'video-maker',
+    'series': 'video-series',
+}
+
+RELATION_OUTPUTS = {
+    'actress': '.tmp/video-actress.tsv',
+    'genre': '.tmp/video-genre.tsv',
+    'maker': '.tmp/video-maker.tsv',
+    'series': '.tmp/video-series.tsv',
+}
+
+NOT_FOUND_OUTPUTS = {
+    'actress': ('.tmp/video_actresses_not_found.tsv', 'Actresses'),
+    'genre': ('.tmp/video_genres_not_found.tsv', 'Genres'),
+    'maker': ('.tmp/video_makers_not_found.tsv', 'Makers'),
+    'series': ('.tmp/video_series_not_found.tsv', 'Series'),
+}
+
+# Output columns of the new video dataset, based on the Video entity structure
+VIDEO_OUTPUT_COLUMNS = [
+    'id',           # PrimaryGeneratedColumn
+    'code',         # display_id from input
+    'dmm_id',       # dmm_id from input
+    'title',        # title from input
+    'label',        # label (not in input, will be null)
+    'release_date', # release_date from input
+    'length',       # length (not in input, will be null)
+    'description',  # description from input
+    'maker_id',     # maker_id
+    'series_id',    # series_id
+]
+
+def resolve_video_row(
+    row: Dict[str, str],
+    resolvers: Dict[str, NameResolver],
+    not_found: Dict[str, NotFoundTracker]
+) -> Dict[str, List[int]]:
     """
-    Find item ID by name, trying different variations if exact match fails.
+    Resolve the actresses, genres, maker and series of a single video row.
 
     Args:
-        item_name: Name to search for
-        item_mapping: Dictionary mapping names to IDs
+        row: Video row from the input TSV
+        resolvers: Resolver for each relation type
+        not_found: Not found name tracker for each relation type, updated
+            in place
 
     Returns:
-        Item ID if found, None otherwise
+        Dictionary mapping each relation type to the resolved item IDs
     """
-    # Try exact match first
-    if item_name in item_mapping:
-        return item_mapping[item_name]
+    display_id = row.get('display_id', '').strip()
+    names = {
+        'actress': parse_comma_separated_string(row.get('actress', '').strip()),
+        'genre': parse_comma_separated_string(row.get('genre', '').strip()),
+        # Only one maker and one series per video
+        'maker': [row.get('makers', '').strip()],
+        'series': [row.get('series', '').strip()],
+    }
+
+    related = {}
+    for relation_type in RELATION_TYPES:
+        resolver = resolvers[relation_type]
+        item_ids = []
+        for item_name in names[relation_type]:
+            if not item_name:
+                continue
+            item_id = resolver.find(item_name)
+            if item_id is not None:
+                item_ids.append(item_id)
+            else:
+                not_found[relation_type].add(item_name, display_id)
+        related[relation_type] = item_ids
+
+    return related
+
+def build_video_row(video_count: int, row: Dict[str, str], related: Dict[str, List[int]]) -> list:
+    """
+    Map an input video row to the columns of the new video dataset.
 
-    # Try case-insensitive match
-    for name, item_id in item_mapping.items():
-        if name.lower() == item_name.lower():
-            return item_id
+    Args:
+        video_count: Sequential ID of the video in the new dataset
+        row: Video row from the input TSV
+        related: Resolved item IDs for each relation type
 
-    # Try partial match (for names with parentheses or variations)
-    item_name_clean = re.sub(r'\([^)]*\)', '', item_name).strip()
-    if item_name_clean != item_name and item_name_clean in item_mapping:
-        return item_mapping[item_name_clean]
+    Returns:
+        List of values in VIDEO_OUTPUT_COLUMNS order
+    """
+    maker_ids = related['maker']
+    series_ids = related['series']
+    return [
+        video_count,  # Auto-increment ID
+        row.get('display_id', '').strip() or None,  # code (display_id)
+        row.get('dmm_id', '').strip() or None,      # dmm_id
+        row.get('title', '').strip() or '',         # title (required)
+        row.get('label', '').strip() or None,       # label
+        row.get('release_date', '').strip() or None, # release_date
+        row.get('length', '').strip() or None,      # length
+        row.get('description', '').strip() or None, # description
+        maker_ids[0] if maker_ids else None,        # maker_id
+        series_ids[0] if series_ids else None,      # series_id
+    ]
 
-    return None
+def open_output_writers(
+    stack: ExitStack,
+    relation_paths: Dict[str, str],
+    video_output_path: Optional[str] = None,
+    write_headers: bool = True
+) -> Tuple[Dict[str, Any], Optional[Any]]:
+    """
+    Open the relation writers and the optional video dataset writer.
 
-def create_video_dataset(
+    Args:
+        stack: ExitStack that owns the opened files
+        relation_paths: Output path for each relation type; the extension
+            picks the format (see tabular_io)
+        video_output_path: Optional output path for the new video dataset
+        write_headers: Whether to write the header rows of text files
+
+    Returns:
+        Tuple of (relation writers by type, video dataset writer or None)
+    """
+    relation_writers = {}
+    for relation_type in RELATION_TYPES:
+        relation_writers[relation_type] = stack.enter_context(TableWriter(
+            relation_paths[relation_type], ['video_id', f'{relation_type}_id'],
+            schema=RELATION_SCHEMAS[relation_type], write_header=write_headers, delimiter='\t'
+        ))
+
+    video_writer = None
+    if video_output_path:
+        video_writer = stack.enter_context(TableWriter(
+            video_output_path, VIDEO_OUTPUT_COLUMNS, schema='video', write_header=write_headers, delimiter='\t'
+        ))
+
+    return relation_writers, video_writer
+
+def write_video_rows(
+    rows: Iterable[Dict[str, str]],
+    resolvers: Dict[str, NameResolver],
+    relation_writers: Dict[str, Any],
+    video_writer: Optional[Any],
+    counts: Dict[str, int],
+    not_found: Dict[str, NotFoundTracker],
+    with_video_ids: bool = True
+) -> int:
+    """
+    Resolve video rows and write their relationships as each row is read.
+
+    Args:
+        rows: Video rows from the input TSV
+        resolvers: Resolver for each relation type
+        relation_writers: Relation writer for each relation type
+        video_writer: Optional video dataset writer
+        counts: Relationship counts by type, updated in place
+        not_found: Not found items by type, updated in place
+        with_video_ids: Whether to write the sequential ID of each video row
+
+    Returns:
+        Number of video rows processed
+    """
+    video_count = 0
+    for row in rows:
+        video_count += 1
+        video_id = int(row['id'])
+        related = resolve_video_row(row, resolvers, not_found)
+
+        for relation_type, item_ids in related.items():
+            relation_writers[relation_type].writerows((video_id, item_id) for item_id in item_ids)
+            counts[relation_type] += len(item_ids)
+
+        if video_writer:
+            video_row = build_video_row(video_count, row, related)
+            video_writer.writerow(video_row if with_video_ids else video_row[1:])
+
+    return video_count
+
+def process_video_data(
     video_tsv_path: str,
-    output_path: str,
-    maker_mapping: Dict[str, int],
-    series_mapping: Dict[str, int],
-    maker_alias_map: Dict[str, Tuple[str, int]],
-    series_alias_map: Dict[str, Tuple[str, int]]
-):
-    """
-    Create a new video TSV dataset based on the Video entity structure,
-    including maker_id and series_id columns.
-    """
-    print("Creating new video dataset...")
-
-    # Add maker_id and series_id to the output columns
-    output_columns = [
-        'id',           # PrimaryGeneratedColumn
-        'code',         # display_id from input
-        'dmm_id',       # dmm_id from input
-        'title',        # title from input
-        'label',        # label (not in input, will be null)
-        'release_date', # release_date from input
-        'length',       # length (not in input, will be null)
-        'description',  # description from input
-        'maker_id',     # NEW: maker_id
-        'series_id',    # NEW: series_id
-    ]
+    resolvers: Dict[str, NameResolver],
+    relation_paths: Dict[str, str],
+    video_output_path: Optional[str] = None,
+    workers: int = 1,
+    not_found: Optional[Dict[str, NotFoundTracker]] = None
+) -> Tuple[Dict[str, int], Dict[str, NotFoundTracker]]:
+    """
+    Stream the video TSV file once, writing relationships as each row is read.
 
-    try:
-        with open(video_tsv_path, 'r', encoding='utf-8') as input_file, \
-             open(output_path, 'w', encoding='utf-8', newline='') as output_file:
+    Every row is resolved once and sent to the relation writers and, when
+    video_output_path is set, to the new video dataset writer. Memory use
+    does not grow with the number of relationships.
 
-            reader = csv.DictReader(input_file, delimiter='\t')
-            writer = csv.writer(output_file, delimiter='\t')
+    Args:
+        video_tsv_path: Path to the video TSV file
+        resolvers: Resolver for each relation type
+        relation_paths: Output TSV path for each relation type
+        video_output_path: Optional output path for the new video dataset
+        workers: Number of worker processes (see process_video_data_parallel)
+        not_found: Empty not found tracker for each relation type (default:
+            trackers that keep every video)
 
-            # Write header
-            writer.writerow(output_columns)
+    Returns:
+        Tuple of (relationship counts by type, not found items by type)
+    """
+    if not_found is None:
+        not_found = {relation_type: NotFoundTracker() for relation_type in RELATION_TYPES}
+
+    if workers > 1:
+        if format_for_path(video_tsv_path) != 'tsv':
+            print("Warning: only TSV input can be sharded, processing with a single worker")
+        elif 'fork' not in multiprocessing.get_all_start_methods():
+            print("Warning: fork is not available on this platform, processing with a single worker")
+        else:
+            return process_video_data_parallel(video_tsv_path, resolvers, relation_paths, video_output_path, workers, not_found)
 
-            video_count = 0
-            for row in reader:
-                video_count += 1
-
-                # Lookup maker_id
-                maker_name = row.get('makers', '').strip()
-                maker_id = None
-                if maker_name:
-                    maker_id = find_item_id(maker_name, maker_mapping)
-                    if maker_id is None and maker_alias_map:
-                        alias_result = maker_alias_map.get(maker_name)
-                        if alias_result:
-                            _, maker_id = alias_result
-
-                # Lookup series_id
-                series_name = row.get('series', '').strip()
-                series_id = None
-                if series_name:
-                    series_id = find_item_id(series_name, series_mapping)
-                    if series_id is None and series_alias_map:
-                        alias_result = series_alias_map.get(series_name)
-                        if alias_result:
-                            _, series_id = alias_result
-
-                # Map input columns to output columns
-                output_row = [
-                    video_count,  # Auto-increment ID
-                    row.get('display_id', '').strip() or None,  # code (display_id)
-                    row.get('dmm_id', '').strip() or None,      # dmm_id
-                    row.get('title', '').strip() or '',         # title (required)
-                    row.get('label', '').strip() or None,       # label
-                    row.get('release_date', '').strip() or None, # release_date
-                    row.get('length', '').strip() or None,      # length
-                    row.get('description', '').strip() or None, # description
-                    maker_id,                                   # NEW: maker_id
-                    series_id,                                  # NEW: series_id
-                ]
-
-                writer.writerow(output_row)
-
-        print(f"✅ Successfully created video dataset with {video_count} videos at: {output_path}")
+    counts = {relation_type: 0 for relation_type in RELATION_TYPES}
 
-    except FileNotFoundError:
-        print(f"Error: Video TSV file '{video_tsv_path}' not found.")
+    try:
+        with ExitStack() as stack:
+            reader = TableReader(video_tsv_path, delimiter='\t')
+            relation_writers, video_writer = open_output_writers(stack, relation_paths, video_output_path)
+            video_count = write_video_rows(reader, resolvers, relation_writers, video_writer, counts, not_found)
+        METRICS.count('video_rows', video_count)
+
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
         sys.exit(1)
     except Exception as e:
-        print(f"Error creating video dataset: {e}")
+        print(f"Error processing video TSV file: {e}")
         sys.exit(1)
 
-def process_video_data(video_tsv_path: str, actress_mapping: Dict[str, int], genre_mapping: Dict[str, int], maker_mapping: Dict[str, int], series_mapping: Dict[str, int], maker_alias_map: Dict[str, Tuple[str, int]], genre_alias_map: Dict[str, Tuple[str, int]], series_alias_map: Dict[str, Tuple[str, int]]) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], List[Tuple[int, int]], List[Tuple[int, int]]]:
+    for relation_type in RELATION_TYPES:
+        print(f"Successfully wrote {counts[relation_type]} {relation_type} relationships to '{relation_paths[relation_type]}'")
+    if video_output_path:
+        print(f"✅ Successfully created video dataset with {video_count} videos at: {video_output_path}")
+
+    return counts, not_found
+
+# Resolvers and empty not found trackers shared with shard workers. They are
+# set before the pool is created, so forked workers inherit them without
+# pickling.
+_shard_resolvers: Dict[str, NameResolver] = {}
+_shard_not_found: Dict[str, NotFoundTracker] = {}
+
+def plan_shards(video_tsv_path: str, shard_count: int) -> Tuple[List[str], List[Tuple[int, int]]]:
     """
-    Process video TSV file and extract video relationships.
+    Split the video TSV file into byte ranges aligned to line boundaries.
+
+    Each video row must fit on a single line, which holds for the scraped
+    video TSV since its fields never contain newlines.
 
     Args:
         video_tsv_path: Path to the video TSV file
-        actress_mapping: Dictionary mapping actress names to IDs
-        genre_mapping: Dictionary mapping genre names to IDs
-        maker_mapping: Dictionary mapping maker names to IDs
-        series_mapping: Dictionary mapping series names to IDs
+        shard_count: Desired number of shards
 
     Returns:
-        Tuple of (video-actress relationships, video-genre relationships, video-maker relationships, video-series relationships)
-    """
-    actress_relationships = []
-    genre_relationships = []
-    maker_relationships = []
-    series_relationships = []
-    not_found_actresses = {}
-    not_found_genres = {}
-    not_found_makers = {}
-    not_found_series = {}
-    total_actresses_processed = 0
-    total_genres_processed = 0
+        Tuple of (header field names, list of (start, end) byte offsets)
+    """
+    file_size = os.path.getsize(video_tsv_path)
+
+    with open(video_tsv_path, 'rb') as file:
+        header_line = file.readline()
+        fieldnames = next(csv.reader([header_line.decode('utf-8')], delimiter='\t'))
+        body_start = file.tell()
+
+        boundaries = [body_start]
+        step = max((file_size - body_start) // shard_count, 1)
+        for i in range(1, shard_count):
+            target = body_start + i * step
+            if target <= boundaries[-1]:
+                continue
+            file.seek(target - 1)
+            file.readline()  # Move to the start of the next line
+            offset = file.tell()
+            if offset >= file_size:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+        boundaries.append(file_size)
+
+    return fieldnames, list(zip(boundaries[:-1], boundaries[1:]))
+
+def iter_shard_lines(video_tsv_path: str, start: int, end: int) -> Iterator[str]:
+    """Yield the decoded lines of the video TSV file between two byte offsets."""
+    with open(video_tsv_path, 'rb') as file:
+        file.seek(start)
+        position = start
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line.decode('utf-8')
+
+def process_shard(task: Tuple[str, List[str], int, int, str, bool]) -> Dict[str, Any]:
+    """
+    Resolve one shard of the video TSV file in a worker process.
 
-    try:
-        with open(video_tsv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter='\t')
-            for row_num, row in enumerate(reader, start=1):
-                video_id = int(row['id'])
-                display_id = row.get('display_id', '').strip()
-                actress_string = row.get('actress', '').strip()
-                genre_string = row.get('genre', '').strip()
-                maker_name = row.get('makers', '').strip()
-                series_name = row.get('series', '').strip()
-
-                # Actress processing (same as before)
-                actresses = parse_comma_separated_string(actress_string)
-                total_actresses_processed += len(actresses)
-                for actress_name in actresses:
-                    actress_id = find_item_id(actress_name, actress_mapping)
-                    if actress_id is not None:
-                        actress_relationships.append((video_id, actress_id))
-                    else:
-                        if actress_name not in not_found_actresses:
-                            not_found_actresses[actress_name] = []
-                        not_found_actresses[actress_name].append(display_id)
-
-                # Genre processing (same as before)
-                genres = parse_comma_separated_string(genre_string)
-                total_genres_processed += len(genres)
-                for genre_name in genres:
-                    genre_id = find_item_id(genre_name, genre_mapping)
-                    # Try alias table if not found
-                    if genre_id is None and genre_alias_map:
-                        alias_result = genre_alias_map.get(genre_name)
-                        if alias_result:
-                            _, genre_id = alias_result
-                    if genre_id is not None:
-                        genre_relationships.append((video_id, genre_id))
-                    else:
-                        if genre_name not in not_found_genres:
-                            not_found_genres[genre_name] = []
-                        not_found_genres[genre_name].append(display_id)
-
-                # Maker processing (same as before)
-                if maker_name:
-                    maker_id = find_item_id(maker_name, maker_mapping)
-                    # Try alias table if not found
-                    if maker_id is None and maker_alias_map:
-                        alias_result = maker_alias_map.get(maker_name)
-                        if alias_result:
-                            _, maker_id = alias_result
-                    if maker_id is not None:
-                        maker_relationships.append((video_id, maker_id))
-                    else:
-                        if maker_name not in not_found_makers:
-                            not_found_makers[maker_name] = []
-                        not_found_makers[maker_name].append(display_id)
-
-                # Series processing (one-to-many, only one series per video)
-                if series_name:
-                    series_id = find_item_id(series_name, series_mapping)
-                    # Try alias table if not found
-                    if series_id is None and series_alias_map:
-                        alias_result = series_alias_map.get(series_name)
-                        if alias_result:
-                            _, series_id = alias_result
-                    if series_id is not None:
-                        series_relationships.append((video_id, series_id))
-                    else:
-                        if series_name not in not_found_series:
-                            not_found_series[series_name] = []
-                        not_found_series[series_name].append(display_id)
+    Relationships and video rows are written without headers to files in
+    the shard directory; video rows are written without their sequential ID,
+    which is only known once the shards are merged.
 
-    except Exception as e:
-        print(f"Error reading video TSV file: {e}")
-        sys.exit(1)
+    Args:
+        task: Tuple of (video TSV path, field names, start offset, end offset,
+            shard output prefix, whether to write video rows)
 
-    # Save not found items
-    save_not_found_items(not_found_actresses, ".tmp/video_actresses_not_found.tsv", "Actresses")
-    save_not_found_items(not_found_genres, ".tmp/video_genres_not_found.tsv", "Genres")
-    save_not_found_items(not_found_makers, ".tmp/video_makers_not_found.tsv", "Makers")
-    save_not_found_items(not_found_series, ".tmp/video_series_not_found.tsv", "Series")
+    Returns:
+        Dictionary with the shard's counts, not found items and lookup stats
+    """
+    video_tsv_path, fieldnames, start, end, prefix, with_videos = task
+    counts = {relation_type: 0 for relation_type in RELATION_TYPES}
+    not_found = {relation_type: tracker.empty_copy() for relation_type, tracker in _shard_not_found.items()}
+
+    for resolver in _shard_resolvers.values():
+        resolver.reset_stats()
+
+    relation_paths = {relation_type: f"{prefix}.{relation_type}.tsv" for relation_type in RELATION_TYPES}
+    video_output_path = f"{prefix}.video.tsv" if with_videos else None
+
+    with ExitStack() as stack:
+        reader = csv.DictReader(iter_shard_lines(video_tsv_path, start, end), fieldnames=fieldnames, delimiter='\t')
+        relation_writers, video_writer = open_output_writers(stack, relation_paths, video_output_path, write_headers=False)
+        video_count = write_video_rows(reader, _shard_resolvers, relation_writers, video_writer, counts, not_found, with_video_ids=False)
+
+    return {
+        'video_count': video_count,
+        'counts': counts,
+        'not_found': not_found,
+        'tier_hits': {relation_type: dict(resolver.tier_hits) for relation_type, resolver in _shard_resolvers.items()},
+        'misses': {relation_type: resolver.misses for relation_type, resolver in _shard_resolvers.items()},
+    }
+
+def merge_shard_files(shard_paths: List[str], output_path: str, columns: List[str],
+                      schema: str, number_rows: bool = False) -> int:
+    """
+    Concatenate headerless shard TSV files into one output file.
 
-    return actress_relationships, genre_relationships, maker_relationships, series_relationships
+    Args:
+        shard_paths: Shard files in file order
+        output_path: Output path; the extension picks the format
+        columns: Output column names
+        schema: Dataset schema name for typed Parquet/Arrow output
+        number_rows: Whether to prepend a sequential ID to every row
 
-def save_not_found_items(not_found_items: Dict[str, List[str]], output_path: str, item_type: str):
+    Returns:
+        Number of rows written
+    """
+    row_count = 0
+
+    if format_for_path(output_path) == 'tsv':
+        with open(output_path, 'w', encoding='utf-8', newline='') as output_file:
+            csv.writer(output_file, delimiter='\t').writerow(columns)
+            output_file.flush()
+            # Binary lines, so a stray carriage return in a field never splits a row
+            for shard_path in shard_paths:
+                with open(shard_path, 'rb') as shard_file:
+                    if not number_rows:
+                        shutil.copyfileobj(shard_file, output_file.buffer)
+                        continue
+                    for line in shard_file:
+                        row_count += 1
+                        output_file.buffer.write(b"%d\t%s" % (row_count, line))
+        return row_count
+
+    with TableWriter(output_path, columns, schema=schema) as writer:
+        for shard_path in shard_paths:
+            with open(shard_path, 'r', encoding='utf-8', newline='') as shard_file:
+                for row in csv.reader(shard_file, delimiter='\t'):
+                    row_count += 1
+                    writer.writerow([row_count] + row if number_rows else row)
+    return row_count
+
+def process_video_data_parallel(
+    video_tsv_path: str,
+    resolvers: Dict[str, NameResolver],
+    relation_paths: Dict[str, str],
+    video_output_path: Optional[str],
+    workers: int,
+    not_found: Dict[str, NotFoundTracker]
+) -> Tuple[Dict[str, int], Dict[str, NotFoundTracker]]:
+    """
+    Resolve the video TSV file in shards across a pool of forked workers.
+
+    Shard outputs are concatenated in file order and not found items are
+    merged in shard order, so every output matches a serial run.
+
+    Args:
+        video_tsv_path: Path to the video TSV file
+        resolvers: Resolver for each relation type
+        relation_paths: Output TSV path for each relation type
+        video_output_path: Optional output path for the new video dataset
+        workers: Number of worker processes
+        not_found: Empty not found tracker for each relation type, filled
+            in place
+
+    Returns:
+        Tuple of (relationship counts by type, not found items by type)
+    """
+    global _shard_resolvers, _shard_not_found
+
+    counts = {relation_type: 0 for relation_type in RELATION_TYPES}
+    video_count = 0
+
+    try:
+        # A few shards per worker keeps the pool busy when rows are uneven
+        fieldnames, shards = plan_shards(video_tsv_path, workers * 4)
+        print(f"Processing {len(shards)} shards with {workers} workers...")
+
+        shard_dir = os.path.dirname(relation_paths['actress']) or '.'
+        with tempfile.TemporaryDirectory(prefix='video-shards-', dir=shard_dir) as temp_dir:
+            tasks = [
+                (video_tsv_path, fieldnames, start, end, os.path.join(temp_dir, f"shard-{i:05d}"), bool(video_output_path))
+                for i, (start, end) in enumerate(shards)
+            ]
+
+            _shard_resolvers = resolvers
+            _shard_not_found = not_found
+            try:
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    results = pool.map(process_shard, tasks, chunksize=1)
+            finally:
+                _shard_resolvers = {}
+                _shard_not_found = {}
+
+            # Merge shard outputs in file order
+            with METRICS.timer('merge'):
+                for relation_type in RELATION_TYPES:
+                    merge_shard_files(
+                        [f"{task[4]}.{relation_type}.tsv" for task in tasks], relation_paths[relation_type],
+                        ['video_id', f'{relation_type}_id'], RELATION_SCHEMAS[relation_type]
+                    )
+
+                if video_output_path:
+                    video_count = merge_shard_files(
+                        [f"{task[4]}.video.tsv" for task in tasks], video_output_path,
+                        VIDEO_OUTPUT_COLUMNS, 'video', number_rows=True
+                    )
+
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error processing video TSV file: {e}")
+        sys.exit(1)
+
+    for result in results:
+        if not video_output_path:
+            video_count += result['video_count']
+        for relation_type in RELATION_TYPES:
+            counts[relation_type] += result['counts'][relation_type]
+            not_found[relation_type].merge(result['not_found'][relation_type])
+            resolver = resolvers[relation_type]
+            for tier, hits in result['tier_hits'][relation_type].items():
+                resolver.tier_hits[tier] += hits
+            resolver.misses += result['misses'][relation_type]
+    METRICS.count('video_rows', video_count)
+
+    for relation_type in RELATION_TYPES:
+        print(f"Successfully wrote {counts[relation_type]} {relation_type} relationships to '{relation_paths[relation_type]}'")
+    if video_output_path:
+        print(f"✅ Successfully created video dataset with {video_count} videos at: {video_output_path}")
+
+    return counts, not_found
+
+def save_not_found_items(not_found: NotFoundTracker, output_path: str, item_type: str):
     """
     Save not found items to TSV file.
 
+    With a sampled tracker the TSV gets a count column next to the sampled
+    videos, and a JSON summary with the heavy hitters is written next to it.
+    Once more names than max_names are unresolved, the TSV only lists the
+    first max_names names seen, by count; names first seen past the cap are
+    only in the summary's top offenders.
+
     Args:
-        not_found_items: Dictionary of not found items and their videos
+        not_found: Not found items and their videos
         output_path: Path to output TSV file
         item_type: Type of items (for reporting)
     """
-    if not not_found_items:
+    if not not_found.occurrences:
         return
 
     print(f"\n{'='*60}")
@@ -442,78 +790,52 @@ def save_not_found_items(not_found_items: Dict[str, List[str]], output_path: str
     print(f"{'='*60}")
 
     # Sort by frequency (most common first)
-    sorted_not_found = sorted(not_found_items.items(),
-                            key=lambda x: len(x[1]), reverse=True)
+    sorted_not_found = not_found.rows()
 
-    for i, (item_name, video_ids) in enumerate(sorted_not_found[:20]):  # Show top 20
-        print(f"{i+1:2d}. '{item_name}' (appears in {len(video_ids)} video{'s' if len(video_ids) > 1 else ''})")
-        if len(video_ids) <= 3:
+    for i, (item_name, count, video_ids) in enumerate(sorted_not_found[:20]):  # Show top 20
+        print(f"{i+1:2d}. '{item_name}' (appears in {count} video{'s' if count > 1 else ''})")
+        if count <= 3:
             print(f"    Videos: {', '.join(video_ids)}")
+        elif not_found.sampled:
+            print(f"    Sampled videos: {', '.join(video_ids[:3])}... and {count - len(video_ids[:3])} more")
         else:
             print(f"    Videos: {', '.join(video_ids[:3])}... and {len(video_ids)-3} more")
 
-    if len(not_found_items) > 20:
-        print(f"    ... and {len(not_found_items) - 20} more {item_type.lower()} not shown")
+    if len(sorted_not_found) > 20:
+        print(f"    ... and {len(sorted_not_found) - 20} more {item_type.lower()} not shown")
+    if not_found.overflow_occurrences:
+        print(f"    ... and {not_found.overflow_occurrences} occurrences of names past the "
+              f"{not_found.max_names} tracked, see the top offenders in the JSON summary")
 
     try:
         with open(output_path, 'w', encoding='utf-8', newline='') as f:
             writer = csv.writer(f, delimiter='\t')
-            writer.writerow(['name', 'not_found_videos'])
+            if not_found.sampled:
+                writer.writerow(['name', 'not_found_videos', 'count'])
+            else:
+                writer.writerow(['name', 'not_found_videos'])
 
-            for item_name, video_ids in sorted_not_found:
+            for item_name, count, video_ids in sorted_not_found:
                 # Join video IDs without spaces after commas
                 videos_str = ','.join(video_ids)
-                writer.writerow([item_name, videos_str])
-
-        print(f"\n📄 Complete {item_type.lower()} list saved to: {output_path}")
-
-    except Exception as e:
-        print(f"Error saving not found {item_type.lower()} TSV: {e}")
-
-def write_relationships(relationships: List[Tuple[int, int]], output_path: str, relationship_type: str):
-    """
-    Write relationships to TSV file.
-
-    Args:
-        relationships: List of (video_id, item_id) tuples
-        output_path: Path to output TSV file
-        relationship_type: Type of relationship (for column naming)
-    """
-    try:
-        with open(output_path, 'w', encoding='utf-8', newline='') as file:
-            writer = csv.writer(file, delimiter='\t')
+                writer.writerow([item_name, videos_str, count] if not_found.sampled else [item_name, videos_str])
 
-            # Write header
-            writer.writerow(['video_id', f'{relationship_type}_id'])
-
-            # Write relationships
-            for video_id, item_id in relationships:
-                writer.writerow([video_id, item_id])
+        if not not_found.sampled:
+            print(f"\n📄 Complete {item_type.lower()} list saved to: {output_path}")
+        elif not_found.overflow_occurrences:
+            print(f"\n📄 Sampled {item_type.lower()} list of the first {not_found.max_names} names seen "
+                  f"saved to: {output_path}")
+        else:
+            print(f"\n📄 Sampled {item_type.lower()} list saved to: {output_path}")
 
-        print(f"\nSuccessfully wrote {len(relationships)} {relationship_type} relationships to '{output_path}'")
+        if not_found.sampled:
+            summary_path = os.path.splitext(output_path)[0] + '.json'
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump(not_found.summary(item_type.lower()), f, indent=2, ensure_ascii=False)
+            print(f"📄 Summary with the top {not_found.top_k} {item_type.lower()} saved to: {summary_path}")
 
     except Exception as e:
-        print(f"Error writing {relationship_type} output file: {e}")
-        sys.exit(1)
-
-def write_video_maker_relationships(relationships: List[Tuple[int, int]], output_path: str):
-    """
-    Write video-maker relationships to TSV file.
-
-    Args:
-        relationships: List of (video_id, maker_id) tuples
-        output_path: Path to output TSV file
-    """
-    try:
-        with open(output_path, 'w', encoding='utf-8', newline='') as file:
-            writer = csv.writer(file, delimiter='\t')
-            writer.writerow(['video_id', 'maker_id'])
-            for video_id, maker_id in relationships:
-                writer.writerow([video_id, maker_id])
-        print(f"\nSuccessfully wrote {len(relationships)} maker relationships to '{output_path}'")
-    except Exception as e:
-        print(f"Error writing maker output file: {e}")
-        sys.exit(1)
+        print(f"Error saving not found {item_type.lower()} TSV: {e}")
 
 def load_series_data(series_csv_path: str) -> Dict[str, int]:
     """
@@ -528,18 +850,16 @@ def load_series_data(series_csv_path: str) -> Dict[str, int]:
     series_name_to_id = {}
 
     try:
-        with open(series_csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter='|')  # Note: series.csv uses | delimiter
-            for row in reader:
-                series_id = int(row['id'])
-                name = row['name'].strip()
-                ruby = row.get('ruby', '').strip()
+        for row in TableReader(series_csv_path, delimiter='|'):  # Note: series.csv uses | delimiter
+            series_id = int(row['id'])
+            name = row['name'].strip()
+            ruby = row.get('ruby', '').strip()
 
-                # Add both name and ruby to the mapping
-                if name:
-                    series_name_to_id[name] = series_id
-                if ruby and ruby != name:
-                    series_name_to_id[ruby] = series_id
+            # Add both name and ruby to the mapping
+            if name:
+                series_name_to_id[name] = series_id
+            if ruby and ruby != name:
+                series_name_to_id[ruby] = series_id
 
     except FileNotFoundError:
         print(f"Error: Series CSV file '{series_csv_path}' not found.")
@@ -566,72 +886,119 @@ def main():
     parser.add_argument('--maker-alias', dest='maker_alias', default=None, help='Optional path to maker alias TSV file')
     parser.add_argument('--genre-alias', dest='genre_alias', default=None, help='Optional path to genre alias TSV file')
     parser.add_argument('--series-alias', dest='series_alias', default=None, help='Optional path to series alias TSV file')
+    parser.add_argument('--format', dest='output_format', default='tsv', choices=FORMATS,
+                       help='Output format of the relation files and video dataset (default: tsv)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of worker processes for resolving video rows (default: 1)')
+    parser.add_argument('--not-found-samples', type=int, default=None,
+                       help='Keep only a sample of this many videos per not found name, with exact counts, '
+                            'and write a JSON summary of the top offenders (default: keep all videos)')
+    parser.add_argument('--not-found-max-names', type=int, default=DEFAULT_MAX_NAMES,
+                       help=f'Not found names tracked with exact counts when sampling; the TSV lists the first ones '
+                            f'seen (default: {DEFAULT_MAX_NAMES})')
+    parser.add_argument('--not-found-top', type=int, default=DEFAULT_TOP_K,
+                       help=f'Top offenders in the JSON summary when sampling (default: {DEFAULT_TOP_K})')
+
+    add_metrics_arguments(parser)
 
     args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
 
+    if args.not_found_samples is not None and args.not_found_samples < 1:
+        parser.error("--not-found-samples must be at least 1")
+
+    for path in filter(None, (args.video_tsv, args.actress_csv, args.genre_csv, args.maker_csv, args.series_csv,
+                              args.maker_alias, args.genre_alias, args.series_alias)):
+        METRICS.add_file('read', path)
 
     print("Loading actress data...")
-    actress_mapping = load_actress_data(args.actress_csv)
+    with METRICS.timer('load', entity='actress'):
+        actress_mapping = load_actress_data(args.actress_csv)
 
     print("Loading genre data...")
-    genre_mapping = load_genre_data(args.genre_csv)
+    with METRICS.timer('load', entity='genre'):
+        genre_mapping = load_genre_data(args.genre_csv)
 
     print("Loading maker data...")
-    maker_mapping = load_maker_data(args.maker_csv)
+    with METRICS.timer('load', entity='maker'):
+        maker_mapping = load_maker_data(args.maker_csv)
 
     print("Loading series data...")
-    series_mapping = load_series_data(args.series_csv)
+    with METRICS.timer('load', entity='series'):
+        series_mapping = load_series_data(args.series_csv)
 
     maker_alias_map = {}
     if args.maker_alias:
         print("Loading maker alias table...")
-        maker_alias_map = load_maker_alias_table(args.maker_alias)
+        with METRICS.timer('load', entity='maker_alias'):
+            maker_alias_map = load_maker_alias_table(args.maker_alias)
 
     genre_alias_map = {}
     if args.genre_alias:
         print("Loading genre alias table...")
-        genre_alias_map = load_genre_alias_table(args.genre_alias)
+        with METRICS.timer('load', entity='genre_alias'):
+            genre_alias_map = load_genre_alias_table(args.genre_alias)
 
     series_alias_map = {}
     if args.series_alias:
         print("Loading series alias table...")
-        series_alias_map = load_series_alias_table(args.series_alias)
-
+        with METRICS.timer('load', entity='series_alias'):
+            series_alias_map = load_series_alias_table(args.series_alias)
 
-    # Create video dataset if requested
-    if args.create_video_dataset:
-        create_video_dataset(
-            args.video_tsv,
-            args.video_output,
-            maker_mapping,
-            series_mapping,
-            maker_alias_map,
-            series_alias_map
-        )
+    resolvers = {
+        'actress': NameResolver("Actress", actress_mapping),
+        'genre': NameResolver("Genre", genre_mapping, genre_alias_map),
+        'maker': NameResolver("Maker", maker_mapping, maker_alias_map),
+        'series': NameResolver("Series", series_mapping, series_alias_map),
+    }
 
     print("Processing video data...")
-    actress_relationships, genre_relationships, maker_relationships, series_relationships = process_video_data(
-        args.video_tsv, actress_mapping, genre_mapping, maker_mapping, series_mapping, maker_alias_map, genre_alias_map, series_alias_map
-    )
+    relation_paths = {
+        relation_type: with_format_extension(path, args.output_format)
+        for relation_type, path in RELATION_OUTPUTS.items()
+    }
+    video_output_path = None
+    if args.create_video_dataset:
+        video_output_path = with_format_extension(args.video_output, args.output_format)
+    # Rows are resolved and written in one streaming pass, so both are timed together
+    not_found = {
+        relation_type: NotFoundTracker(args.not_found_samples, args.not_found_max_names, args.not_found_top)
+        for relation_type in RELATION_TYPES
+    }
+    with METRICS.timer('resolve_and_write', workers=args.workers):
+        counts, not_found = process_video_data(args.video_tsv, resolvers, relation_paths, video_output_path,
+                                               args.workers, not_found)
 
-    print("Writing relationships...")
-    write_relationships(actress_relationships, ".tmp/video-actress.tsv", "actress")
-    write_relationships(genre_relationships, ".tmp/video-genre.tsv", "genre")
-    write_relationships(maker_relationships, ".tmp/video-maker.tsv", "maker")
-    write_relationships(series_relationships, ".tmp/video-series.tsv", "series")
+    # Save not found items
+    with METRICS.timer('report_not_found'):
+        for relation_type in RELATION_TYPES:
+            output_path, item_type = NOT_FOUND_OUTPUTS[relation_type]
+            save_not_found_items(not_found[relation_type], output_path, item_type)
+
+    for relation_type, resolver in resolvers.items():
+        for tier, hits in resolver.tier_hits.items():
+            METRICS.count('lookups', hits, entity=relation_type, tier=tier)
+        METRICS.count('lookups', resolver.misses, entity=relation_type, tier='not_found')
+        METRICS.count('relations_written', counts[relation_type], entity=relation_type)
+    for path in list(relation_paths.values()) + [path for path, _ in NOT_FOUND_OUTPUTS.values()] + [video_output_path]:
+        if path:
+            METRICS.add_file('written', path)
 
     print(f"\n{'='*60}")
     print(f"FINAL RESULTS")
     print(f"{'='*60}")
-    print(f"Actress relationships created: {len(actress_relationships)}")
-    print(f"Genre relationships created: {len(genre_relationships)}")
-    print(f"Maker relationships created: {len(maker_relationships)}")
-    print(f"Series relationships created: {len(series_relationships)}")
-    print(f"Total relationships created: {len(actress_relationships) + len(genre_relationships) + len(maker_relationships) + len(series_relationships)}")
-    print(f"Output files: .tmp/video-actress.tsv, .tmp/video-genre.tsv, .tmp/video-maker.tsv, .tmp/video-series.tsv")
-
-    if args.create_video_dataset:
-        print(f"Video dataset: {args.video_output}")
+    print(f"Actress relationships created: {counts['actress']}")
+    print(f"Genre relationships created: {counts['genre']}")
+    print(f"Maker relationships created: {counts['maker']}")
+    print(f"Series relationships created: {counts['series']}")
+    print(f"Total relationships created: {sum(counts.values())}")
+    print()
+    for resolver in resolvers.values():
+        resolver.print_summary()
+    print(f"Output files: {', '.join(relation_paths.values())}")
+
+    if video_output_path:
+        print(f"Video dataset: {video_output_path}")
 
 if __name__ == "__main__":
     main()
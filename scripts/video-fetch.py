@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Fetch the video catalogue from the DMM ItemList API into the video TSV that
+video-actress-relation.py reads.
+
+ItemList only serves offsets up to 50000, so the catalogue is split into
+release-date windows (gte_date/lte_date). Each window is probed with its
+first page; a window with more items than the offset cap can reach is
+halved, recursively, until every window fits. Windows are fetched
+concurrently through one session under a shared requests-per-second
+budget.
+
+Every finished window is written to <output>.parts/ so --resume only
+fetches the windows that are missing. The parts are then merged newest
+first, deduplicated by dmm_id and numbered, with the columns id,
+display_id, title, dmm_id, actress, genre, makers, series, release_date,
+description, label and length.
+
+The stub server in dmm-stub-server.py serves the same API for testing.
+"""
+
+import argparse
+import csv
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from dmm_fetch import DEFAULT_CONCURRENCY, DEFAULT_RATE, DmmFetcher, FetchError, credentials_from_env
+from etl_metrics import METRICS, add_metrics_arguments, start_instrumentation
+from http_cache import add_cache_arguments, cache_from_args
+
+VIDEO_COLUMNS = ['id', 'display_id', 'title', 'dmm_id', 'actress', 'genre', 'makers', 'series',
+                 'release_date', 'description', 'label', 'length']
+
+ITEM_PARAMS = {'site': 'FANZA', 'service': 'digital', 'floor': 'videoa', 'sort': 'date'}
+
+DEFAULT_ITEM_HITS = 100
+DEFAULT_MAX_OFFSET = 50000
+DEFAULT_WINDOW_DAYS = 365
+DEFAULT_JOBS = 4
+
+API_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Windows shorter than this are fetched up to the offset cap instead of split
+MIN_WINDOW = timedelta(minutes=1)
+
+CONTENT_ID_PATTERN = re.compile(r'^(?:h_\d+)?\d*([a-z]+)(\d+)([a-z]*)$')
+
+def display_id(content_id: str) -> str:
+    """Derive the product code from a content ID, e.g. "1start00123" -> "START-123"."""
+    match = CONTENT_ID_PATTERN.match(content_id)
+    if not match:
+        return content_id.upper()
+    letters, number, suffix = match.groups()
+    return f"{letters.upper()}-{int(number):03d}{suffix.upper()}"
+
+def names(iteminfo: Dict[str, Any], key: str) -> List[str]:
+    return [entry['name'] for entry in iteminfo.get(key, []) if entry.get('name')]
+
+def item_to_row(item: Dict[str, Any]) -> list:
+    """Map an ItemList item to VIDEO_COLUMNS, without the id."""
+    iteminfo = item.get('iteminfo', {})
+    content_id = item.get('content_id', '')
+    length = re.match(r'\d+', item.get('volume', '') or '')
+    return [
+        display_id(content_id),
+        item.get('title', ''),
+        content_id,
+        ','.join(names(iteminfo, 'actress')),
+        ','.join(names(iteminfo, 'genre')),
+        next(iter(names(iteminfo, 'maker')), ''),
+        next(iter(names(iteminfo, 'series')), ''),
+        (item.get('date') or '')[:10],
+        '',  # ItemList has no description
+        next(iter(names(iteminfo, 'label')), ''),
+        length.group() if length else '',
+    ]
+
+class Window(NamedTuple):
+    """Release-date window with inclusive bounds, to the second."""
+    start: datetime
+    end: datetime
+
+    def params(self) -> Dict[str, str]:
+        return {'gte_date': self.start.strftime(API_DATE_FORMAT), 'lte_date': self.end.strftime(API_DATE_FORMAT)}
+
+    def split(self) -> Optional[List['Window']]:
+        """Halve the window, or None if it is too short to split."""
+        if self.end - self.start < MIN_WINDOW:
+            return None
+        middle = self.start + (self.end - self.start) // 2
+        middle = middle.replace(microsecond=0)
+        return [Window(self.start, middle), Window(middle + timedelta(seconds=1), self.end)]
+
+    @property
+    def part_name(self) -> str:
+        return f"{self.start:%Y%m%d%H%M%S}-{self.end:%Y%m%d%H%M%S}.tsv"
+
+    def __str__(self) -> str:
+        return f"{self.start:%Y-%m-%d %H:%M:%S}..{self.end:%Y-%m-%d %H:%M:%S}"
+
+def initial_windows(start_date: date, end_date: date, window_days: int) -> List[Window]:
+    """Cover the date range with windows of window_days days."""
+    windows = []
+    start = datetime.combine(start_date, datetime.min.time())
+    last = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1) - timedelta(seconds=1)
+    while start <= last:
+        end = min(start + timedelta(days=window_days) - timedelta(seconds=1), last)
+        windows.append(Window(start, end))
+        start = end + timedelta(seconds=1)
+    return windows
+
+class WindowFetcher:
+    """Probe, split and fetch release-date windows into part files."""
+
+    def __init__(self, fetcher: DmmFetcher, parts_dir: str, hits: int, max_offset: int):
+        """
+        Args:
+            fetcher: Shared fetcher; its rate limit covers every window
+            parts_dir: Directory for the per-window part files
+            hits: Page size
+            max_offset: Highest offset the API serves
+        """
+        self.fetcher = fetcher
+        self.parts_dir = parts_dir
+        self.hits = hits
+        # Items reachable with pages starting at 1, 1 + hits, ... up to max_offset
+        self.capacity = (max_offset - 1) // hits * hits + hits
+
+    def part_path(self, window: Window) -> str:
+        return os.path.join(self.parts_dir, window.part_name)
+
+    def process(self, window: Window) -> List[Window]:
+        """
+        Fetch a window into its part file, or split it.
+
+        Returns:
+            The halves of the window if it has to be split, otherwise []
+        """
+        if os.path.exists(self.part_path(window)):
+            METRICS.count('windows', state='resumed')
+            return []
+
+        params = {**ITEM_PARAMS, **window.params()}
+        first = self.fetcher.request('ItemList', {**params, 'hits': self.hits, 'offset': 1})
+        total = int(first.get('total_count') or 0)
+
+        if total > self.capacity:
+            halves = window.split()
+            if halves:
+                METRICS.count('windows', state='split')
+                print(f"Window {window}: {total} items, splitting")
+                return halves
+            print(f"Warning: window {window} has {total} items, only the first {self.capacity} can be fetched")
+            first = {**first, 'total_count': self.capacity}
+
+        temp_path = self.part_path(window) + '.tmp'
+        rows = 0
+        with open(temp_path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter='\t', lineterminator='\n')
+            for _, items in self.fetcher.fetch_pages('ItemList', 'items', params, hits=self.hits, first_result=first):
+                writer.writerows(item_to_row(item) for item in items)
+                rows += len(items)
+        os.replace(temp_path, self.part_path(window))
+
+        METRICS.count('windows', state='fetched')
+        METRICS.count('items_fetched', rows)
+        print(f"Window {window}: fetched {rows} items")
+        return []
+
+    def run(self, windows: List[Window], jobs: int) -> List[Window]:
+        """
+        Process windows concurrently, splitting until every window is fetched.
+
+        Returns:
+            The fetched windows
+        """
+        done = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            running = {executor.submit(self.process, window): window for window in windows}
+            try:
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        window = running.pop(future)
+                        halves = future.result()
+                        if halves:
+                            running.update({executor.submit(self.process, half): half for half in halves})
+                        else:
+                            done.append(window)
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+        return done
+
+def merge_parts(part_paths: List[str], output_path: str) -> Dict[str, int]:
+    """
+    Concatenate part files into the numbered video TSV, dropping repeated dmm_ids.
+
+    Returns:
+        Dictionary with the rows written and duplicates dropped
+    """
+    seen = set()
+    rows = duplicates = 0
+    dmm_id_index = VIDEO_COLUMNS.index('dmm_id') - 1
+    with open(output_path, 'w', encoding='utf-8', newline='') as output_file:
+        writer = csv.writer(output_file, delimiter='\t', lineterminator='\n')
+        writer.writerow(VIDEO_COLUMNS)
+        for part_path in part_paths:
+            with open(part_path, 'r', encoding='utf-8', newline='') as part_file:
+                for row in csv.reader(part_file, delimiter='\t'):
+                    if row[dmm_id_index] in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(row[dmm_id_index])
+                    rows += 1
+                    writer.writerow([rows] + row)
+    return {'rows': rows, 'duplicates': duplicates}
+
+def parse_date(value: str) -> date:
+    return date.today() if value == 'today' else date.fromisoformat(value)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch the DMM video catalogue by release-date windows into a video TSV.')
+    parser.add_argument('output_path', help='Output video TSV path')
+    parser.add_argument('--start-date', default='2000-01-01', help='Earliest release date to fetch (default: 2000-01-01)')
+    parser.add_argument('--end-date', default='today', help='Latest release date to fetch (default: today)')
+    parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS,
+                        help=f'Length of the initial windows in days, split further as needed (default: {DEFAULT_WINDOW_DAYS})')
+    parser.add_argument('--max-offset', type=int, default=DEFAULT_MAX_OFFSET,
+                        help=f'Highest offset the API serves (default: {DEFAULT_MAX_OFFSET})')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help=f'Windows fetched at once (default: {DEFAULT_JOBS})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Pages in flight at once per window (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Maximum requests per second across all windows (default: {DEFAULT_RATE})')
+    parser.add_argument('--hits', type=int, default=DEFAULT_ITEM_HITS, help=f'Page size (default: {DEFAULT_ITEM_HITS})')
+    parser.add_argument('--base-url', default=None, help='API base URL (default: DMM_API_BASE_URL or the public API)')
+    parser.add_argument('--resume', action='store_true', help='Keep the windows fetched by an interrupted run')
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_instrumentation(args.metrics, args.profile)
+
+    try:
+        start_date, end_date = parse_date(args.start_date), parse_date(args.end_date)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if start_date > end_date or args.window_days < 1 or args.max_offset < 1 or args.hits < 1:
+        parser.error("expected --start-date <= --end-date and positive --window-days, --max-offset and --hits")
+
+    try:
+        cache = cache_from_args(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    app_id, affiliate_id = credentials_from_env(required=not args.offline)
+
+    parts_dir = f"{args.output_path}.parts"
+    if not args.resume and os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    windows = initial_windows(start_date, end_date, args.window_days)
+    print(f"Fetching {start_date}..{end_date} in {len(windows)} windows, {args.jobs} at a time...")
+
+    start = time.perf_counter()
+    with DmmFetcher(app_id, affiliate_id, base_url=args.base_url, concurrency=args.concurrency, rate=args.rate,
+                    pool_size=args.jobs * args.concurrency, cache=cache) as fetcher:
+        window_fetcher = WindowFetcher(fetcher, parts_dir, args.hits, args.max_offset)
+        try:
+            with METRICS.timer('fetch'):
+                done = window_fetcher.run(windows, args.jobs)
+        except FetchError as e:
+            print(e)
+            print("Rerun with --resume to keep the windows fetched so far.")
+            sys.exit(1)
+
+    # Newest first, as ItemList sorts within each window
+    done.sort(key=lambda window: window.start, reverse=True)
+    with METRICS.timer('merge'):
+        result = merge_parts([window_fetcher.part_path(window) for window in done], args.output_path)
+    shutil.rmtree(parts_dir)
+
+    METRICS.count('records_written', result['rows'])
+    METRICS.count('duplicates_dropped', result['duplicates'])
+    METRICS.add_file('written', args.output_path)
+
+    print(f"\n{'='*60}")
+    print(f"FETCH RESULTS")
+    print(f"{'='*60}")
+    print(f"Windows fetched: {len(done)}")
+    print(f"Videos written: {result['rows']} ({result['duplicates']} duplicates dropped)")
+    print(f"Output: {args.output_path} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+-- Tables for the precomputed relation aggregates written by scripts/relation-aggregates.py
+--
+-- Load them after the relation tables, from the repository root:
+--   psql -f sql/create-video-aggregates.sql
+--   \copy video_stats FROM '.tmp/aggregates/video_stats.tsv' WITH (FORMAT text, HEADER true)
+--   \copy actress_stats FROM '.tmp/aggregates/actress_stats.tsv' WITH (FORMAT text, HEADER true)
+--   \copy genre_stats FROM '.tmp/aggregates/genre_stats.tsv' WITH (FORMAT text, HEADER true)
+DROP TABLE IF EXISTS video_stats, actress_stats, genre_stats;
+
+CREATE TABLE video_stats (
+  video_id integer PRIMARY KEY,
+  actress_count integer NOT NULL,
+  genre_count integer NOT NULL,
+  actress_ids integer[] NOT NULL,
+  genre_ids integer[] NOT NULL
+);
+
+CREATE INDEX idx_video_stats_actress_count ON video_stats (actress_count, video_id);
+CREATE INDEX idx_video_stats_actress_ids ON video_stats USING GIN (actress_ids);
+CREATE INDEX idx_video_stats_genre_ids ON video_stats USING GIN (genre_ids);
+
+CREATE TABLE actress_stats (
+  actress_id integer PRIMARY KEY,
+  video_count integer NOT NULL
+);
+
+CREATE TABLE genre_stats (
+  genre_id integer PRIMARY KEY,
+  video_count integer NOT NULL
+);
+
+-- The actressIds/genreIds/actressCount filters of VideoService.findAllConnection
+-- then become, e.g. for videos with actresses 1 and 2, genre 26 and two actresses:
+--   SELECT video_id FROM video_stats
+--   WHERE actress_ids @> ARRAY[1, 2] AND genre_ids @> ARRAY[26] AND actress_count = 2
+--   ORDER BY video_id;